@@ -14,6 +14,8 @@ import base64
 import re
 import unicodedata
 import uuid
+import asyncio
+import random
 from adapters.whatsapp.cloudapi.message_index import MESSAGE_INDEX
 
 load_dotenv(".venv/.env")
@@ -49,6 +51,113 @@ def sanitize_param(value) -> str:
     return value.strip()
 
 
+# ===== Shared Graph API HTTP client =====
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# a POST (message send) that timed out or got a 5xx may already have been
+# delivered: only retry what certainly never reached / was refused by Meta
+NON_IDEMPOTENT_RETRY_STATUSES = {429}
+CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+TRANSPORT_ERRORS = CONNECT_ERRORS + (httpx.ReadTimeout, httpx.RemoteProtocolError)
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+class GraphHTTPClient:
+    """
+    One long-lived, pooled HTTP/2 client for all Graph API calls of the process
+    (keep-alive, so the ack + the reply reuse one connection). Bounded
+    concurrency, and retry with exponential backoff + jitter (honours
+    Retry-After): idempotent requests on 429/5xx and transport errors, POSTs
+    (message sends) only on 429 and connect errors, so a send that may have
+    been delivered is never sent twice. The concurrency slot is released
+    while backing off.
+
+    Lifecycle is tied to the FastAPI lifespan via start()/aclose(); if used
+    without start() (scripts), the client is created lazily on first use.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 20,
+        max_keepalive: int = 10,
+        max_concurrency: int = 32,
+        timeout: float = 15.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=60.0,
+        )
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._client: httpx.AsyncClient | None = None
+        self._sem: asyncio.Semaphore | None = None
+
+    async def start(self) -> None:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(http2=True, limits=self.limits, timeout=self.timeout)
+            self._sem = asyncio.Semaphore(self.max_concurrency)
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+        self._client = None
+        self._sem = None
+
+    def _delay(self, attempt: int, response: httpx.Response | None) -> float:
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        delay = min(self.backoff_base * (2 ** attempt), self.backoff_max)
+        return random.uniform(0, delay)  # full jitter
+
+    async def request(self, method: str, url: str, idempotent: bool | None = None, **kwargs) -> httpx.Response:
+        """`idempotent` defaults to the method's semantics (POST: not idempotent)."""
+        await self.start()
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        retry_errors = TRANSPORT_ERRORS if idempotent else CONNECT_ERRORS
+        retry_statuses = RETRY_STATUSES if idempotent else NON_IDEMPOTENT_RETRY_STATUSES
+        for attempt in range(self.max_retries + 1):
+            last = attempt == self.max_retries
+            async with self._sem:
+                try:
+                    response = await self._client.request(method, url, **kwargs)
+                    error = None
+                except retry_errors as e:
+                    if last:
+                        raise
+                    response, error = None, e
+            # back off outside the semaphore: a sleeping retry holds no slot
+            if error is not None:
+                logger.warning("Graph API %s %s -> %s, retrying", method, url, type(error).__name__)
+                await asyncio.sleep(self._delay(attempt, None))
+                continue
+            if response.status_code in retry_statuses and not last:
+                logger.warning("Graph API %s %s -> %s, retrying", method, url, response.status_code)
+                await asyncio.sleep(self._delay(attempt, response))
+                continue
+            return response
+        raise RuntimeError("unreachable")
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, idempotent: bool = False, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, idempotent=idempotent, **kwargs)
+
+
+graph_http = GraphHTTPClient()
+
+
 class CloudAPIAdapter(WhatsAppAdapter):
     def __init__(self):
         self.phone_number_id = os.getenv("WHATSAPP_PHONE_NUMBER_ID")
@@ -61,10 +170,9 @@ class CloudAPIAdapter(WhatsAppAdapter):
             return None
         try:
             meta_url = f"https://graph.facebook.com/v16.0/{media_id}"
-            async with httpx.AsyncClient(timeout=15) as client:
-                r = await client.get(meta_url, headers={"Authorization": f"Bearer {token}"})
-                r.raise_for_status()
-                return r.json().get("url")
+            r = await graph_http.get(meta_url, headers={"Authorization": f"Bearer {token}"})
+            r.raise_for_status()
+            return r.json().get("url")
         except Exception:
             logger.exception("Failed to resolve media URL (media_id=%s)", media_id)
             return None
@@ -273,12 +381,6 @@ class CloudAPIAdapter(WhatsAppAdapter):
         - `to_phone` must be in international format digits (no '+' or spaces).
         - Uses X-Idempotency-Key with a stable confirmation_id to avoid duplicate sends.
         """
-        import uuid
-        import httpx
-        import logging
-
-        logger = logging.getLogger(__name__)
-
         # ---- Required config on `self` ----
         phone_number_id = getattr(self, "phone_number_id", None)
         access_token = getattr(self, "access_token", None)
@@ -320,18 +422,17 @@ class CloudAPIAdapter(WhatsAppAdapter):
             # Optional: "recipient_type": "individual"
         }
 
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            try:
-                r = await client.post(url, headers=headers, json=payload)
-                data = r.json() if r.headers.get("content-type", "").startswith("application/json") else {"raw": r.text}
-                if r.status_code >= 400:
-                    logger.error("❌ Cloud API error %s: %s", r.status_code, data)
-                    return {"status": "failed", "error": data}
-                # Typical success returns: {"messages":[{"id":"wamid.HBgM..."}]}
-                return {"status": "sent", "response": data}
-            except httpx.RequestError as e:
-                logger.exception("🌐 HTTPX request failed")
-                return {"status": "failed", "error": str(e)}
+        try:
+            r = await graph_http.post(url, headers=headers, json=payload)
+            data = r.json() if r.headers.get("content-type", "").startswith("application/json") else {"raw": r.text}
+            if r.status_code >= 400:
+                logger.error("❌ Cloud API error %s: %s", r.status_code, data)
+                return {"status": "failed", "error": data}
+            # Typical success returns: {"messages":[{"id":"wamid.HBgM..."}]}
+            return {"status": "sent", "response": data}
+        except httpx.RequestError as e:
+            logger.exception("🌐 HTTPX request failed")
+            return {"status": "failed", "error": str(e)}
 
 
     async def send_message(self, recipient: str, message: str, reply_to: str | None = None) -> dict:
@@ -362,8 +463,7 @@ class CloudAPIAdapter(WhatsAppAdapter):
         if reply_to:
             payload["context"] = {"message_id": reply_to}   
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, json=payload, headers=headers)
+        response = await graph_http.post(url, json=payload, headers=headers)
 
         if response.status_code == 200:
             return {"status": "sent", "response": response.json()}
@@ -419,14 +519,13 @@ class CloudAPIAdapter(WhatsAppAdapter):
             }
         }
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, json=payload, headers=headers)
+        response = await graph_http.post(url, json=payload, headers=headers)
 
-            if response.status_code == 200:
-                return {"status": "sent", "response": response.json()}
-            else:
-                logger.error(f"Failed to send template message: {response.status_code} - {response.text}")
-                return {"status": "failed", "error": response.text}
+        if response.status_code == 200:
+            return {"status": "sent", "response": response.json()}
+        else:
+            logger.error(f"Failed to send template message: {response.status_code} - {response.text}")
+            return {"status": "failed", "error": response.text}
 
     def get_identity(self, webhook_uid: str) -> dict:
         return {
@@ -468,8 +567,7 @@ class CloudAPIAdapter(WhatsAppAdapter):
         if caption:
             payload["image"]["caption"] = caption
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, json=payload, headers=headers)
+        response = await graph_http.post(url, json=payload, headers=headers)
 
         if response.status_code == 200:
             return {"status": "sent", "response": response.json()}
@@ -489,8 +587,7 @@ class CloudAPIAdapter(WhatsAppAdapter):
             "messaging_product": (None, "whatsapp")
         }
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, headers=headers, files=files)
+        response = await graph_http.post(url, headers=headers, files=files)
 
         if response.status_code == 200:
             return response.json().get("id")
@@ -4,19 +4,15 @@ from __future__ import annotations
 import time
 from typing import TYPE_CHECKING, Dict, Any
 
-from openai import OpenAI, APIError, BadRequestError, APITimeoutError
+from openai import APIError, BadRequestError, APITimeoutError
 
 from observability.obs import span_step, safe_update_current_span_io, mark_error
+from shared.llm_gateway import gateway, json_schema_format
 from agent.confirmation_flow.models import ConfirmationInitialResult
 
 if TYPE_CHECKING:
     from agent.confirmation_flow.state import ConfirmationState
 
-client = OpenAI(
-    timeout=10,
-    max_retries=1,
-)
-
 model = "gpt-4o"
 
 
@@ -64,20 +60,11 @@ def resolve_final_llm(state: "ConfirmationState") -> "ConfirmationState":
 
             start = time.time()
             try:
-                schema = ConfirmationInitialResult.model_json_schema()
-
-                resp = client.chat.completions.create(
+                resp = gateway.chat(
                     model=model,
+                    tag="confirmation.final",
                     messages=messages,
-                    response_format={
-                        "type": "json_schema",
-                        "json_schema": {
-                            "name": "ConfirmationInitialResult",
-                            "schema": schema,
-                            # keep non-strict if you allow extra keys from the model
-                            "strict": False,
-                        },
-                    },
+                    response_format=json_schema_format(ConfirmationInitialResult, "ConfirmationInitialResult", strict=False),
                 )
 
                 elapsed = time.time() - start
@@ -4,18 +4,14 @@ from __future__ import annotations
 import time
 from typing import Any
 
-from openai import OpenAI, APIError, BadRequestError, APITimeoutError
+from openai import APIError, BadRequestError, APITimeoutError
 
 from observability.obs import span_step, safe_update_current_span_io, mark_error
+from shared.llm_gateway import gateway, json_schema_format
 from agent.confirmation_flow.state import ConfirmationState
 from agent.confirmation_flow.models import ConfirmationInitialResult
 from agent.linear_flow.utils import add_message
 
-client = OpenAI(
-    timeout=10,
-    max_retries=1,
-)
-
 model = "gpt-4o"
 
 
@@ -45,19 +41,11 @@ def resolve_initial_llm(state: ConfirmationState) -> ConfirmationState:
 
             start = time.time()
             try:
-                schema = ConfirmationInitialResult.model_json_schema()
-
-                resp = client.chat.completions.create(
+                resp = gateway.chat(
                     model=model,
+                    tag="confirmation.initial",
                     messages=messages,
-                    response_format={
-                        "type": "json_schema",
-                        "json_schema": {
-                            "name": "ConfirmationInitialResult",
-                            "schema": schema,
-                            "strict": False,
-                        },
-                    },
+                    response_format=json_schema_format(ConfirmationInitialResult, "ConfirmationInitialResult", strict=False),
                 )
 
                 elapsed = time.time() - start
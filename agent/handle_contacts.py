@@ -27,6 +27,7 @@ def handle_contacts(message: dict) -> str:
 from shared.user import get_user
 from store.user import UserStore
 from shared.user import userContextDict, normalize_recipient_id
+from tools.contact_index import invalidate_contact_index
 
 def format_shared_contact(contact: SharedContactInfo, user_id: str) -> str:
     if not contact:
@@ -46,8 +47,8 @@ def format_shared_contact(contact: SharedContactInfo, user_id: str) -> str:
     contact1["phone"] = chat_id.split("@")[0]
     user.runtime.contacts[name] = contact1
 
-    UserStore(user_id).save(user)
-    userContextDict[user_id] = user
+    userContextDict.save(user, ("runtime", "contacts", name))
+    invalidate_contact_index(user_id)
 
     if contact.phone:
         parts.append(f"מספר: {contact.phone}")
@@ -0,0 +1,199 @@
+# agent/linear_flow/context_projection.py
+"""
+Token-budgeted projection of the RUNTIME CONTEXT sent to the responder LLM.
+
+The full `context` grows with the session (per-tool history, calendar window,
+attachments, ingress metadata). The responder mostly needs the turn metadata
+and the latest tool results, so each agent gets a ContextProfile:
+
+- meta:       whitelisted turn fields (drop ids / ingress bookkeeping)
+- tools:      per tool `latest`, `last_error`, `meta`, plus only the newest
+              `history_keep` history records
+- tool_results / extras: everything else the profile keeps
+
+Every section has a token budget; over budget, tool history is dropped first,
+then long strings are cut and finally lists are capped (with a `_truncated`
+marker so the model knows there is more) until it fits.
+
+`project_responder_context` returns the projected payload plus a small report
+(tokens before/after) that prepare_responder_messages logs.
+"""
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Optional, Tuple
+
+from shared.token_counter import count_json
+
+RESPONDER_MODEL = "gpt-4o"
+
+
+def estimate_tokens(payload: Any) -> int:
+    """Tokens of `payload` serialized as JSON (responder model's tokenizer, memoized)."""
+    return count_json(payload, RESPONDER_MODEL)
+
+
+@dataclass(frozen=True)
+class ContextProfile:
+    meta_fields: FrozenSet[str] = frozenset({
+        "user_name", "source", "category", "text", "reply", "locale", "tz",
+        "current_datetime", "resolved_person", "runtime",
+    })
+    # context keys dropped entirely (never useful to the responder)
+    drop_fields: FrozenSet[str] = frozenset({
+        "user_id", "thread_id", "chat_id", "input_id", "idempotency_key",
+        "source_ids", "metadata", "received_at", "redacted", "calendar_window",
+        "last_planner_actions",
+    })
+    history_keep: int = 2
+    budgets: Dict[str, int] = field(default_factory=lambda: {
+        "meta": 600,
+        "tools": 3000,
+        "tool_results": 1500,
+        "extras": 600,
+    })
+
+
+DEFAULT_PROFILE = ContextProfile()
+
+RESPONDER_PROFILES: Dict[str, ContextProfile] = {
+    "tasks": DEFAULT_PROFILE,
+    # events replies name weekdays/dates, keep the calendar window
+    "events": ContextProfile(
+        drop_fields=DEFAULT_PROFILE.drop_fields - {"calendar_window"},
+        meta_fields=DEFAULT_PROFILE.meta_fields | {"calendar_window"},
+        budgets={"meta": 900, "tools": 3000, "tool_results": 1500, "extras": 600},
+    ),
+    # comms summarizes chat history search results: bigger tools budget
+    "comms": ContextProfile(
+        budgets={"meta": 600, "tools": 4000, "tool_results": 1500, "extras": 600},
+    ),
+}
+
+
+# ----------------------------------------------------------------------
+# shrinking
+# ----------------------------------------------------------------------
+_NO_LIMIT = 1 << 30
+
+
+def _cap(value: Any, max_list: int, max_str: int) -> Any:
+    if isinstance(value, str):
+        if len(value) <= max_str:
+            return value
+        return value[:max_str] + f"… [truncated {len(value) - max_str} chars]"
+    if isinstance(value, dict):
+        return {k: _cap(v, max_list, max_str) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        items = [_cap(v, max_list, max_str) for v in value[:max_list]]
+        if len(value) > max_list:
+            items.append({"_truncated": len(value) - max_list})
+        return items
+    return value
+
+
+def fit_to_budget(value: Any, budget: int) -> Any:
+    """
+    Shrink `value` until its estimate fits `budget`: long strings first (keeps
+    every list item, e.g. the full tasks listing), list lengths only as a last resort.
+    """
+    if budget <= 0 or estimate_tokens(value) <= budget:
+        return value
+    shrunk = value
+    for max_str in (2000, 1000, 500, 250, 120):
+        shrunk = _cap(value, _NO_LIMIT, max_str)
+        if estimate_tokens(shrunk) <= budget:
+            return shrunk
+    for max_list in (50, 25, 12, 6, 3, 1):
+        shrunk = _cap(value, max_list, 120)
+        if estimate_tokens(shrunk) <= budget:
+            return shrunk
+    return shrunk
+
+
+def _attachment_summary(att: Any) -> Dict[str, Any]:
+    if hasattr(att, "model_dump"):
+        att = att.model_dump()
+    if not isinstance(att, dict):
+        return {"kind": str(att)[:80]}
+    return {k: att[k] for k in ("kind", "name", "mime") if att.get(k)}
+
+
+def _project_tools(tools: Dict[str, Any], history_keep: int) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    for name, ns in (tools or {}).items():
+        if not isinstance(ns, dict):
+            out[name] = ns
+            continue
+        projected = {
+            "latest": ns.get("latest"),
+            "last_error": ns.get("last_error"),
+            "meta": ns.get("meta"),
+        }
+        # latest is history[0]; keep only older records beyond it
+        older = (ns.get("history") or [])[1:1 + history_keep] if history_keep else []
+        if older:
+            projected["history"] = older
+        out[name] = projected
+    return out
+
+
+# ----------------------------------------------------------------------
+# public API
+# ----------------------------------------------------------------------
+_stats_lock = threading.Lock()
+_stats: Dict[str, Dict[str, int]] = {}
+
+
+def project_responder_context(
+    context: Dict[str, Any],
+    tool_results: Any,
+    target_agent: Optional[str],
+) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    """
+    (payload, report) for the responder. `context`/`tool_results` must already
+    be JSON-safe. payload keeps the {"context": ..., "tool_results": ...} shape.
+    """
+    profile = RESPONDER_PROFILES.get(target_agent or "", DEFAULT_PROFILE)
+    budgets = profile.budgets
+
+    meta: Dict[str, Any] = {}
+    extras: Dict[str, Any] = {}
+    for key, value in (context or {}).items():
+        if key == "tools" or key in profile.drop_fields:
+            continue
+        if key == "attachments":
+            # the responder only needs to know what was attached
+            value = [_attachment_summary(a) for a in (value or [])]
+        (meta if key in profile.meta_fields else extras)[key] = value
+
+    projected_ctx: Dict[str, Any] = fit_to_budget(meta, budgets["meta"])
+    if extras:
+        projected_ctx.update(fit_to_budget(extras, budgets["extras"]))
+    if context.get("tools"):
+        tools = _project_tools(context["tools"], profile.history_keep)
+        if estimate_tokens(tools) > budgets["tools"]:
+            # older history goes first, before latest results get shrunk
+            tools = _project_tools(context["tools"], 0)
+        projected_ctx["tools"] = fit_to_budget(tools, budgets["tools"])
+    payload = {
+        "context": projected_ctx,
+        "tool_results": fit_to_budget(tool_results, budgets["tool_results"]),
+    }
+
+    before = estimate_tokens({"context": context, "tool_results": tool_results})
+    after = estimate_tokens(payload)
+    report = {"tokens_before": before, "tokens_after": after, "tokens_saved": max(0, before - after)}
+
+    with _stats_lock:
+        st = _stats.setdefault(target_agent or "unknown", {"calls": 0, "tokens_before": 0, "tokens_after": 0})
+        st["calls"] += 1
+        st["tokens_before"] += before
+        st["tokens_after"] += after
+    return payload, report
+
+
+def projection_stats() -> Dict[str, Dict[str, int]]:
+    with _stats_lock:
+        return {agent: dict(st) for agent, st in _stats.items()}
@@ -2,12 +2,16 @@ from langgraph.graph import StateGraph, END
 from agent.linear_flow.state import LinearAgentState
 from agent.linear_flow.tools import ToolRegistry
 from agent.linear_flow.nodes.ingest_node import make_ingest_node
-from agent.linear_flow.nodes.planner_llm_node import planner_llm
+from agent.linear_flow.nodes.planner_llm_node import planner_llm, aplanner_llm
 from agent.linear_flow.nodes.execute_tools_node import make_execute_tools_node
 from agent.linear_flow.nodes.prepare_responder_messages import make_prepare_responder_messages_node
-from agent.linear_flow.nodes.responder_llm_node import responder_llm
+from agent.linear_flow.nodes.responder_llm_node import responder_llm, aresponder_llm
 from agent.linear_flow.nodes.handle_planner_followup_node import handle_planner_followup
+from agent.linear_flow.nodes.template_responder_node import make_template_responder_node
+from agent.linear_flow.templates import ResponseTemplates
+from typing import Optional
 from langgraph.checkpoint.memory import MemorySaver
+from langchain_core.runnables import RunnableLambda
 
 # -------------------------------
 # Routing logic
@@ -22,6 +26,13 @@ def route_from_planner(state: LinearAgentState) -> str:
     # no followup, no actions → go to prepare_responder_messages
     return "prepare_responder_messages"
 
+
+def route_from_template_responder(state: LinearAgentState) -> str:
+    # deterministic outcome already answered → skip the responder LLM
+    if state.get("template_rendered"):
+        return "end"
+    return "prepare_responder_messages"
+
 # -------------------------------
 # Build the graph
 # -------------------------------
@@ -30,19 +41,24 @@ def build_agent_app(
     planner_system_prompt: str,  # must include tools schema
     tools: ToolRegistry,
     responder_system_prompt: str,
+    response_templates: Optional[ResponseTemplates] = None,  # per-tool template replies (opt-in)
 ) -> StateGraph:
     builder = StateGraph(LinearAgentState)
 
     # Nodes
     builder.add_node("ingest", make_ingest_node(planner_system_prompt))
-    builder.add_node("planner_llm", planner_llm)
+    # LLM nodes carry a sync and an async implementation: app.invoke uses the
+    # former, app.ainvoke awaits the latter (AsyncOpenAI, no thread per call)
+    builder.add_node("planner_llm", RunnableLambda(planner_llm, afunc=aplanner_llm, name="planner_llm"))
     builder.add_node("execute_tools", make_execute_tools_node(tools))
     builder.add_node(
         "prepare_responder_messages",
         make_prepare_responder_messages_node(responder_system_prompt),
     )
-    builder.add_node("responder_llm", responder_llm)
+    builder.add_node("responder_llm", RunnableLambda(responder_llm, afunc=aresponder_llm, name="responder_llm"))
     builder.add_node("handle_planner_followup", handle_planner_followup)
+    if response_templates is not None:
+        builder.add_node("template_responder", make_template_responder_node(response_templates))
 
     # Entry
     builder.set_entry_point("ingest")
@@ -64,7 +80,18 @@ def build_agent_app(
     # planner followup loop
     builder.add_edge("handle_planner_followup", "planner_llm")
 
-    builder.add_edge("execute_tools", "prepare_responder_messages")
+    if response_templates is not None:
+        builder.add_edge("execute_tools", "template_responder")
+        builder.add_conditional_edges(
+            "template_responder",
+            route_from_template_responder,
+            {
+                "end": END,
+                "prepare_responder_messages": "prepare_responder_messages",
+            },
+        )
+    else:
+        builder.add_edge("execute_tools", "prepare_responder_messages")
     builder.add_edge("prepare_responder_messages", "responder_llm")
     builder.add_edge("responder_llm", END)
     
@@ -0,0 +1,144 @@
+# agent/linear_flow/history.py
+"""
+Bounded per-agent conversation history kept in the graph state.
+
+    state["agent_memory"] = {
+        "<agent>": {"summary": <summary item> | None, "recent": [msg, ...]},
+        ...
+    }
+
+`recent` holds the agent's raw user/assistant messages ({role, content,
+target_agent}), as add_message used to append to state["messages"]. When it
+outgrows HISTORY_POLICY, agent.mini_memory.MiniMemoryManager compacts it
+(same summary policy as the Agents SDK sessions) into a rolling summary
+checkpoint plus the last few raw messages. The previous summary is folded
+into the next one, so nothing older than the window is lost outright.
+
+Every turn therefore reads and checkpoints O(window) messages instead of
+the whole lifetime of the thread. Old flat state["messages"] lists (threads
+checkpointed before this) are moved into the buffers on first use.
+"""
+from __future__ import annotations
+
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+from agent.mini_memory import MemoryPolicy, MiniMemoryManager
+from shared.llm_gateway import gateway
+
+logger = logging.getLogger(__name__)
+
+HISTORY_WINDOW = int(os.getenv("TAMI_HISTORY_WINDOW", "20"))  # raw messages per agent before summarizing
+SUMMARY_MODEL = os.getenv("TAMI_SUMMARY_MODEL", "gpt-4o-mini")
+
+HISTORY_POLICY = MemoryPolicy(
+    hard_token_budget=3000,
+    max_recent_turns=HISTORY_WINDOW,
+    summary_every_n_turns=HISTORY_WINDOW,
+    min_gap_between_summaries_sec=60,
+)
+# bound even while summarizing is throttled or failing: oldest messages are dropped
+HARD_CAP = 3 * HISTORY_WINDOW
+
+SUMMARY_SYSTEM_PROMPT = (
+    "You maintain a running summary of a chat between a user and an assistant. "
+    "Merge the PREVIOUS SUMMARY with the NEW MESSAGES into one updated summary, "
+    "in the language of the conversation, at most 150 words. Keep names, dates, "
+    "times, items created or changed, decisions and open questions; drop small talk."
+)
+
+
+class _BufferSession:
+    """MiniMemoryManager session (get_items / add_items / clear_session) over one agent's buffer."""
+
+    def __init__(self, memory: Dict[str, Any], summary_tag: str):
+        self.memory = memory
+        self.summary_tag = summary_tag
+
+    def get_items(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        items = ([self.memory["summary"]] if self.memory.get("summary") else []) + self.memory["recent"]
+        return items if limit is None else items[-limit:]
+
+    def add_items(self, items: List[Dict[str, Any]]) -> None:
+        for item in items:
+            if item.get("role") == "system" and (item.get("meta") or {}).get("kind") == self.summary_tag:
+                self.memory["summary"] = item
+            else:
+                self.memory["recent"].append(item)
+
+    def clear_session(self) -> None:
+        self.memory["summary"] = None
+        self.memory["recent"] = []
+
+
+def agent_memory(state: Dict[str, Any], target_agent: str) -> Dict[str, Any]:
+    memories = state.setdefault("agent_memory", {})
+    legacy = state.get("messages")
+    if legacy:
+        # threads checkpointed with the old unbounded flat list
+        for msg in legacy:
+            agent = msg.get("target_agent")
+            if agent and msg.get("role") in ("user", "assistant"):
+                memories.setdefault(agent, {"summary": None, "recent": []})["recent"].append(msg)
+        state["messages"] = []
+    return memories.setdefault(target_agent, {"summary": None, "recent": []})
+
+
+def append_message(state: Dict[str, Any], msg: Dict[str, Any]) -> None:
+    memory = agent_memory(state, msg["target_agent"])
+    memory["recent"].append(msg)
+    if len(memory["recent"]) > HARD_CAP:
+        memory["recent"] = memory["recent"][-HARD_CAP:]
+
+
+def _llm_summarizer(target_agent: str, previous: Optional[str]):
+    def summarize(raw_text: str) -> str:
+        resp = gateway.chat(
+            model=SUMMARY_MODEL,
+            tag=f"{target_agent}.summary",
+            messages=[
+                {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+                {
+                    "role": "user",
+                    "content": f"PREVIOUS SUMMARY:\n{previous or '(none)'}\n\nNEW MESSAGES:\n{raw_text}",
+                },
+            ],
+        )
+        return resp.choices[0].message.content or ""
+
+    return summarize
+
+
+def needs_compaction(state: Dict[str, Any], target_agent: str) -> bool:
+    return len(agent_memory(state, target_agent)["recent"]) >= HISTORY_POLICY.summary_every_n_turns
+
+
+def compact(state: Dict[str, Any], target_agent: str, summarizer=None) -> None:
+    """Roll the agent's buffer into its summary when it outgrew HISTORY_POLICY."""
+    if not needs_compaction(state, target_agent):
+        return
+    memory = agent_memory(state, target_agent)
+    previous = (memory.get("summary") or {}).get("content")
+    manager = MiniMemoryManager(
+        _BufferSession(memory, HISTORY_POLICY.summary_tag),
+        policy=HISTORY_POLICY,
+        summarizer=summarizer or _llm_summarizer(target_agent, previous),
+    )
+    try:
+        manager.maybe_checkpoint()
+    except Exception:
+        logger.exception("history: summarizing %s failed; keeping the raw window", target_agent)
+
+
+def history_messages(state: Dict[str, Any], target_agent: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """[summary as a system message] + the agent's last `limit` raw messages, for LLM prompts."""
+    memory = agent_memory(state, target_agent)
+    recent = memory["recent"][-limit:] if limit else list(memory["recent"])
+    summary = memory.get("summary")
+    if not summary:
+        return recent
+    return [
+        {"role": "system", "content": "CONVERSATION SUMMARY (earlier messages):\n" + summary["content"]},
+        *recent,
+    ]
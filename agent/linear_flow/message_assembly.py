@@ -0,0 +1,54 @@
+# agent/linear_flow/message_assembly.py
+"""
+Prompt-cache-friendly message assembly for the linear-flow LLM nodes.
+
+OpenAI reuses the longest previously seen prompt prefix (>= 1024 tokens), so
+every request of one agent node is laid out as
+
+    [static system prompt] [agent chat history] | [runtime context, selections, current input]
+    ------- byte-stable, cacheable prefix ------ | ------- volatile tail (changes every turn) ------
+
+The static prompt (planner prompt + tools_reference) never changes and the
+history (agent/linear_flow/history.py: summary + the whole bounded `recent`
+buffer) only grows at its end, so turn N+1 re-uses turn N's prefix. The
+history part changes only when the buffer is compacted into a new summary. Anything
+that changes per turn (current_datetime, calendar_window, tool history and
+results) goes after it.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Any, Dict, List
+
+
+def stable_json(payload: Any) -> str:
+    """Deterministic JSON (sorted keys): equal payloads give equal bytes."""
+    return json.dumps(payload, ensure_ascii=False, sort_keys=True)
+
+
+def fingerprint(messages: List[Dict[str, Any]]) -> str:
+    """Stable hash of a message list (e.g. to check a plan was made for exactly these messages)."""
+    return hashlib.sha256(
+        json.dumps(messages, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+def json_block(header: str, payload: Any) -> Dict[str, Any]:
+    return {
+        "role": "system",
+        "content": f"{header}:\n```json\n" + stable_json(payload) + "\n```",
+    }
+
+
+def assemble(
+    static_prompt: str,
+    history: List[Dict[str, Any]],
+    tail: List[Dict[str, Any]],
+) -> List[Dict[str, Any]]:
+    messages: List[Dict[str, Any]] = []
+    if static_prompt:
+        messages.append({"role": "system", "content": static_prompt})
+    messages.extend(history)
+    messages.extend(tail)
+    return messages
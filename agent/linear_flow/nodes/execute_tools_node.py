@@ -1,7 +1,12 @@
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from agent.linear_flow.state import LinearAgentState
 from agent.linear_flow.tools import ToolRegistry, ToolCallPlan
 from agent.linear_flow.tools import ToolSpec  # or wherever you put it
-from typing import Callable
+from typing import Any, Callable, Dict, List, Optional
 from observability.obs import span_step, safe_update_current_span_io
 from datetime import datetime
 from agent.linear_flow.utils import update_context_with_tool_result
@@ -17,6 +22,7 @@ def _maybe_resolve_task_id_from_index(state: dict, tool_name: str, args: dict) -
         return args
 
     ctx = state.get("context", {})
+    last_listing = None
     user = get_user(ctx.get("user_id"))
     if user and getattr(user, "runtime", None):
         last_listing = user.runtime.last_tasks_listing
@@ -40,11 +46,148 @@ def _maybe_resolve_task_id_from_index(state: dict, tool_name: str, args: dict) -
     return new_args
 
 
+# Independent tool plans of one turn run concurrently on this pool (tools do
+# blocking Firestore / Google Calendar / Green API I/O).
+TOOL_CONCURRENCY = int(os.getenv("TOOL_CONCURRENCY", "8"))
+_tool_pool = ThreadPoolExecutor(max_workers=TOOL_CONCURRENCY, thread_name_prefix="tool")
+
+# tools that only read: they must not overtake a write planned before them
+_READ_TOOL_PREFIXES = ("get_", "search_")
+
+
+# get_items is a read of the stores but writes the cached user's
+# runtime.last_tasks_listing, which process_task reads to resolve "item 2"
+_LISTING_WRITERS = {"get_items"}
+_LISTING_READERS = {"process_task"}
+
+
+def _is_read(tool_name: str) -> bool:
+    return tool_name.startswith(_READ_TOOL_PREFIXES)
+
+
+def _listing_conflict(a: str, b: str) -> bool:
+    return (a in _LISTING_WRITERS and (b in _LISTING_WRITERS or b in _LISTING_READERS)) or (
+        b in _LISTING_WRITERS and a in _LISTING_READERS
+    )
+
+
+def _item_key(args: Any) -> Optional[str]:
+    if hasattr(args, "model_dump"):
+        args = args.model_dump()
+    if isinstance(args, dict) and args.get("item_id"):
+        return str(args["item_id"])
+    return None
+
+
+def plan_waves(calls: List[Dict[str, Any]]) -> List[List[int]]:
+    """
+    Group plan indices into waves that may run concurrently.
+
+    Plan j depends on an earlier plan i when both touch the same item_id, or
+    when one of them is a read and the other a write (a listing after a create
+    must see the create), or when both touch the last tasks listing and one
+    of them writes it (two get_items must not race for it). Each plan runs in the wave after its latest
+    dependency, so dependent plans keep their plan order.
+    """
+    wave_of: List[int] = []
+    for j, call in enumerate(calls):
+        wave = 0
+        for i in range(j):
+            other = calls[i]
+            same_item = call["item_key"] is not None and call["item_key"] == other["item_key"]
+            read_write = _is_read(call["tool"]) != _is_read(other["tool"])
+            if same_item or read_write or _listing_conflict(call["tool"], other["tool"]):
+                wave = max(wave, wave_of[i] + 1)
+        wave_of.append(wave)
+    waves: List[List[int]] = [[] for _ in range(max(wave_of, default=-1) + 1)]
+    for idx, wave in enumerate(wave_of):
+        waves[wave].append(idx)
+    return waves
+
+
+# ----------------------------------------------------------------------
+# per-tool timings
+# ----------------------------------------------------------------------
+_stats_lock = threading.Lock()
+_tool_stats: Dict[str, Dict[str, float]] = {}
+_turn_stats: Dict[str, float] = {"turns": 0, "plans": 0, "waves": 0, "tool_ms_total": 0.0, "wall_ms_total": 0.0}
+
+
+def _record_timings(timings: List[Dict[str, Any]], wall_ms: float, waves: int) -> None:
+    with _stats_lock:
+        for t in timings:
+            st = _tool_stats.setdefault(t["tool"], {"calls": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0})
+            st["calls"] += 1
+            st["errors"] += 0 if t["ok"] else 1
+            st["total_ms"] += t["duration_ms"]
+            st["max_ms"] = max(st["max_ms"], t["duration_ms"])
+        _turn_stats["turns"] += 1
+        _turn_stats["plans"] += len(timings)
+        _turn_stats["waves"] += waves
+        _turn_stats["tool_ms_total"] += sum(t["duration_ms"] for t in timings)
+        _turn_stats["wall_ms_total"] += wall_ms
+
+
+def tool_timing_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        tools = {
+            name: {**st, "avg_ms": round(st["total_ms"] / st["calls"], 1) if st["calls"] else None}
+            for name, st in _tool_stats.items()
+        }
+        turns = dict(_turn_stats)
+    # time saved by running independent plans side by side
+    turns["parallel_saved_ms"] = round(turns["tool_ms_total"] - turns["wall_ms_total"], 1)
+    return {"tools": tools, "execute_tools": turns}
+
+
 def make_execute_tools_node(
     tools: ToolRegistry,
     max_history: int = 10,
 ) -> Callable[[LinearAgentState], LinearAgentState]:
 
+    def _run_one(call: Dict[str, Any], state: LinearAgentState) -> Dict[str, Any]:
+        tool_name = call["tool"]
+        # resolved only now: a get_items of an earlier wave may have just
+        # replaced the listing that "item 1" refers to
+        tool_args = _maybe_resolve_task_id_from_index(state, tool_name, call["args"])
+        func = call["func"]
+        start = time.perf_counter()
+
+        if not func:
+            error, result = f"Unknown tool: {tool_name}", None
+        else:
+            try:
+                with span_step(
+                    f"tool.{tool_name}",
+                    kind="tool",
+                    tool=tool_name,
+                    node="execute_tools",
+                    redact_input=True,
+                ):
+                    safe_update_current_span_io(
+                        input={"args": tool_args},
+                        redact=True,
+                    )
+
+                    result = func(tool_args, state)
+                    error = None
+
+                    safe_update_current_span_io(
+                        output=result,
+                        redact=True,
+                    )
+            except Exception as e:
+                error, result = str(e), None
+
+        return {
+            "tool": tool_name,
+            "args": tool_args,
+            "result": result,
+            "error": error,
+            "timestamp": datetime.now().isoformat(),
+            "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+
     def execute_tools_node(state: LinearAgentState) -> LinearAgentState:
         plans = state.get("actions") or []
         state.setdefault("context", {})
@@ -54,78 +197,54 @@ def make_execute_tools_node(
             kind="node",
             node="execute_tools",
             tool_count=len(plans),
-        ):
+        ) as span:
+            calls: List[Dict[str, Any]] = []
             for plan in plans:
                 # if plan is ToolCallPlan, keep dot-access; if dict, use ["tool"]
                 tool_name = plan.tool
                 tool_args = plan.args
 
-                tool_args = _maybe_resolve_task_id_from_index(state, tool_name, tool_args)
-
                 entry = tools.tools.get(tool_name)
                 if isinstance(entry, ToolSpec):
                     func = entry.fn
                 else:
                     func = entry  # plain callable
 
-                if not func:
-                    tool_result = {
-                        "tool": tool_name,
-                        "args": tool_args,
-                        "result": None,
-                        "error": f"Unknown tool: {tool_name}",
-                        "timestamp": datetime.now().isoformat(),
-                    }
-                    state["context"] = update_context_with_tool_result(
-                        state["context"], tool_result, max_history=max_history
-                    )
-                    continue
-
-                try:
-                    with span_step(
-                        f"tool.{tool_name}",
-                        kind="tool",
-                        tool=tool_name,
-                        node="execute_tools",
-                        redact_input=True,
-                    ):
-                        safe_update_current_span_io(
-                            input={"args": tool_args},
-                            redact=True,
-                        )
-
-                        result = func(tool_args, state)
-
-                        safe_update_current_span_io(
-                            output=result,
-                            redact=True,
-                        )
-
-                        tool_result = {
-                            "tool": tool_name,
-                            "args": tool_args,
-                            "result": result,
-                            "error": None,
-                            "timestamp": datetime.now().isoformat(),
-                        }
-
-                        state["context"] = update_context_with_tool_result(
-                            state["context"], tool_result, max_history=max_history
-                        )
-
-                except Exception as e:
-                    tool_result = {
-                        "tool": tool_name,
-                        "args": tool_args,
-                        "result": None,
-                        "error": str(e),
-                        "timestamp": datetime.now().isoformat(),
+                calls.append({"tool": tool_name, "args": tool_args, "func": func, "item_key": _item_key(tool_args)})
+
+            waves = plan_waves(calls)
+            results: List[Optional[Dict[str, Any]]] = [None] * len(calls)
+            start = time.perf_counter()
+            for wave in waves:
+                if len(wave) == 1:
+                    results[wave[0]] = _run_one(calls[wave[0]], state)
+                else:
+                    # each worker gets a copy of the current context so the
+                    # tool spans nest under execute_tools
+                    futures = {
+                        idx: _tool_pool.submit(contextvars.copy_context().run, _run_one, calls[idx], state)
+                        for idx in wave
                     }
+                    for idx, fut in futures.items():
+                        results[idx] = fut.result()
+
+                # merge in plan order: later waves (and the responder) see a
+                # deterministic context.tools regardless of completion order
+                for idx in wave:
                     state["context"] = update_context_with_tool_result(
-                        state["context"], tool_result, max_history=max_history
+                        state["context"], results[idx], max_history=max_history
                     )
+            wall_ms = (time.perf_counter() - start) * 1000
+
+            timings = [
+                {"tool": r["tool"], "duration_ms": r["duration_ms"], "ok": r["error"] is None}
+                for r in results
+            ]
+            _record_timings(timings, wall_ms, len(waves))
+            span.update(metadata={"tool_timings": timings, "waves": len(waves), "wall_ms": round(wall_ms, 1)})
 
             state["actions"] = []
+            state["turn_tool_results"] = results
             return state
 
     return execute_tools_node
@@ -3,8 +3,9 @@ import json
 from typing import List, Dict, Any, Callable
 from observability.obs import span_step, safe_update_current_span_io
 from agent.linear_flow.utils import add_message
-
-MAX_HISTORY = 10  # per agent
+from agent.linear_flow.message_assembly import assemble, json_block
+from agent.linear_flow.history import compact, history_messages
+from shared.token_counter import count_messages
 
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
@@ -33,20 +34,18 @@ def build_calendar_window(now: datetime, tz: ZoneInfo, days: int = 14):
 
 def make_ingest_node(system_prompt: str) -> Callable[[LinearAgentState], LinearAgentState]:
     def ingest(state: LinearAgentState) -> LinearAgentState:
-        with span_step("ingest", kind="node", node="ingest"):
+        with span_step("ingest", kind="node", node="ingest") as span:
             target_agent = state.get("target_agent")
             if not target_agent:
                 raise ValueError("ingest: state['target_agent'] must be set before ingest")
 
+            # volatile per-turn messages; they go AFTER the cacheable
+            # [system prompt + history] prefix (see message_assembly)
             messages: List[Dict[str, Any]] = []
 
             print(f"ingest: current_datetime={state.get('context', {}).get('current_datetime', '')}")
 
-            # 1) System prompt
-            if system_prompt:
-                messages.append({"role": "system", "content": system_prompt})
-
-            # 2) Context as system message
+            # 1) Context as system message
             ctx = state.get("context") or {}
             now = parse_context_datetime(ctx["current_datetime"], ctx["tz"])
 
@@ -61,14 +60,7 @@ def make_ingest_node(system_prompt: str) -> Callable[[LinearAgentState], LinearA
             state["context"] = ctx
 
             if ctx:
-                messages.append(
-                    {
-                        "role": "system",
-                        "content": "RUNTIME CONTEXT:\n```json\n"
-                                   + json.dumps(ctx, ensure_ascii=False)
-                                   + "\n```",
-                    }
-                )
+                messages.append(json_block("RUNTIME CONTEXT", ctx))
 
             # ---- 2b) Person-resolution handling on numeric replies ----
 
@@ -133,29 +125,26 @@ def make_ingest_node(system_prompt: str) -> Callable[[LinearAgentState], LinearA
                         )
 
 
-            # 3) Past chat messages for THIS target_agent only
-            all_history: List[Dict[str, Any]] = state.get("messages") or []
-            per_agent_history = [
-                m
-                for m in all_history
-                if m.get("target_agent") == target_agent
-                and m.get("role") in ("user", "assistant")
-            ]
-
-            trimmed_history = per_agent_history[-MAX_HISTORY:]
-            messages.extend(trimmed_history)
+            # 2) Past chat messages for THIS target_agent only: rolling summary
+            #    (when the buffer outgrew its window) + the whole bounded buffer.
+            #    Not a trailing slice: that would drop its oldest message every
+            #    turn and break the cached prefix (see message_assembly.py)
+            compact(state, target_agent)
+            history = history_messages(state, target_agent)
 
-            # 4) Current user input – must go into BOTH llm_messages and state["messages"]
+            # 3) Current user input – must go into BOTH llm_messages and state["messages"]
             if input_text:
                 # What planner sees now:
                 messages.append({"role": "user", "content": input_text})
                 # Persistent tagged history:
                 add_message("user", input_text, state)
 
-            state["llm_messages"] = messages
+            state["llm_messages"] = assemble(system_prompt, history, messages)
+            # planner prompt size (static prefix counts are memoized across turns)
+            span.update(metadata={"prompt_tokens": count_messages(state["llm_messages"])})
 
             safe_update_current_span_io(
-                input={"context": ctx, "messages": messages},
+                input={"context": ctx, "messages": state["llm_messages"]},
                 redact=True,
             )
             return state
@@ -1,21 +1,71 @@
 from agent.linear_flow.state import LinearAgentState
 from observability.obs import span_step, safe_update_current_span_io, mark_error
 from agent.linear_flow.models import LinearAgentPlan
-from openai import OpenAI
 from openai import APIError, BadRequestError, APITimeoutError
 import time
-from typing import Any
+from typing import Any, Dict, Optional
 from agent.linear_flow.utils import add_message
+from agent.linear_flow.message_assembly import fingerprint
+from shared.llm_gateway import gateway, json_schema_format
 
-client = OpenAI(
-        timeout=10,      # seconds, pick what you like
-        max_retries=1,   # don't keep retrying a bad request
-    )
-    
 model = "gpt-4o"
 
+
+def _request_kwargs(state: LinearAgentState) -> Dict[str, Any]:
+    return dict(
+        model=model,
+        tag=f"{state.get('target_agent')}.planner",  # prompt-cache key + cache report
+        messages=state["llm_messages"],
+        # non-strict so args: Dict[str,Any] is allowed
+        response_format=json_schema_format(LinearAgentPlan, "LinearAgentPlan", strict=False),
+    )
+
+
+def _apply_plan(state: LinearAgentState, content: str) -> None:
+    #print("planner llm messages:", state["llm_messages"])
+    #print("planner LLM response:", content)
+    plan = LinearAgentPlan.model_validate_json(content)
+
+    # log output
+    safe_update_current_span_io(output=plan.model_dump(), redact=True)
+    state["actions"] = plan.actions
+    state["followup_message"] = plan.followup_message
+
+
+def _take_speculative_plan(state: LinearAgentState) -> Optional[str]:
+    """
+    Plan content computed speculatively during routing (agent.tami.speculative),
+    if it was made for this agent and exactly these llm_messages. Consumed once.
+    """
+    spec = state.get("speculative_plan")
+    if not spec:
+        return None
+    state["speculative_plan"] = None
+    if spec.get("agent") != state.get("target_agent"):
+        return None
+    if spec.get("fingerprint") != fingerprint(state["llm_messages"]):
+        return None
+    return spec.get("content")
+
+
+def _apply_error(state: LinearAgentState, e: Exception, span: Any) -> None:
+    # Fallback: no tools, simple error/clarification message
+    state["actions"] = []
+    state["followup_message"] = "משהו השתבש, נסה לנסח שוב."
+    add_message("assistant", state["followup_message"], state)
+    state["status"] = "error"
+    # You can also log `e` somewhere
+    mark_error(e, kind="LLMError", span=span)
+
+
 def planner_llm(state: LinearAgentState) -> LinearAgentState:
-    with span_step("planner_llm_node", kind="node", node="planner_llm_node"):
+    with span_step("planner_llm_node", kind="node", node="planner_llm_node") as span:
+        speculative = _take_speculative_plan(state)
+        if speculative is not None:
+            span.update(metadata={"speculative_plan": True})
+            _apply_plan(state, speculative)
+            return state
+
         # inner span as generation (LLM call)
         with span_step(
             "llm_call",
@@ -29,41 +79,45 @@ def planner_llm(state: LinearAgentState) -> LinearAgentState:
             # ---------- Call LLM with Structured Outputs ----------
             start = time.time()
             try:
-                schema = LinearAgentPlan.model_json_schema()
-
-                resp = client.chat.completions.create(
-                    model=model,
-                    messages=state["llm_messages"],
-                    response_format={
-                        "type": "json_schema",
-                        "json_schema": {
-                            "name": "LinearAgentPlan",
-                            "schema": schema,
-                            "strict": False,   # <-- FIX: non-strict so args: Dict[str,Any] is allowed
-                        },
-                    },
-                )
+                resp = gateway.chat(**_request_kwargs(state))
 
                 elapsed = time.time() - start
                 # optional debug:
                 print(f"LLM parse took {elapsed:.2f}s")
+                _apply_plan(state, resp.choices[0].message.content)
+
+            except (APITimeoutError, APIError, BadRequestError) as e:
+                _apply_error(state, e, _gen)
 
-                #print("planner llm messages:", state["llm_messages"])
-                #print("planner LLM response:", resp)
-                plan = LinearAgentPlan.model_validate_json(resp.choices[0].message.content)
+            return state
 
-                # log output
-                safe_update_current_span_io(output=plan.model_dump(), redact=True)
-                state["actions"] = plan.actions
-                state["followup_message"] = plan.followup_message
+
+async def aplanner_llm(state: LinearAgentState) -> LinearAgentState:
+    """Async variant of planner_llm (used by app.ainvoke)."""
+    with span_step("planner_llm_node", kind="node", node="planner_llm_node") as span:
+        speculative = _take_speculative_plan(state)
+        if speculative is not None:
+            span.update(metadata={"speculative_plan": True})
+            _apply_plan(state, speculative)
+            return state
+
+        with span_step(
+            "llm_call",
+            kind="llm",
+            as_type="generation",
+            model=model,
+            node="planner_llm_node",
+        ) as _gen:
+            safe_update_current_span_io(input={"context": state["context"], "messages": state["llm_messages"]}, redact=True)
+            start = time.time()
+            try:
+                resp = await gateway.achat(**_request_kwargs(state))
+
+                elapsed = time.time() - start
+                print(f"LLM parse took {elapsed:.2f}s")
+                _apply_plan(state, resp.choices[0].message.content)
 
             except (APITimeoutError, APIError, BadRequestError) as e:
-                # Fallback: no tools, simple error/clarification message
-                state["actions"] = []
-                state["followup_message"] = "משהו השתבש, נסה לנסח שוב."
-                add_message("assistant", state["followup_message"], state)
-                state["status"] = "error"
-                # You can also log `e` somewhere
-                mark_error(e, kind="LLMError", span=_gen)
-
-            return state
\ No newline at end of file
+                _apply_error(state, e, _gen)
+
+            return state
@@ -1,9 +1,12 @@
 # linear_flow/nodes/prepare_responder_messages.py
-import json
 from typing import Callable, Dict, Any
 from agent.linear_flow.state import LinearAgentState
 from observability.obs import span_step, safe_update_current_span_io
 from datetime import timezone, datetime
+from agent.linear_flow.message_assembly import assemble, json_block
+from agent.linear_flow.history import history_messages
+from agent.linear_flow.context_projection import RESPONDER_MODEL, project_responder_context
+from shared.token_counter import count_messages
 
 def make_json_safe(obj):
     if isinstance(obj, datetime):
@@ -24,8 +27,10 @@ def make_prepare_responder_messages_node(
     """
     Build llm_messages for the responder LLM:
     - responder-specific system prompt
-    - context + tool_results as JSON
     - chat history (messages) for the CURRENT target_agent only
+    - context + tool_results as JSON, projected to the agent's token budget
+      (last: it changes every turn, so it must not sit in front of the
+      cacheable prefix)
     """
 
     def prepare_responder_messages(state: LinearAgentState) -> LinearAgentState:
@@ -33,7 +38,7 @@ def make_prepare_responder_messages_node(
             "prepare_responder_messages",
             kind="node",
             node="prepare_responder_messages",
-        ):
+        ) as span:
             context: Dict[str, Any] = state.get("context") or {}
             tool_results = state.get("tool_results", [])
 
@@ -43,53 +48,24 @@ def make_prepare_responder_messages_node(
                     "prepare_responder_messages: state['target_agent'] is not set"
                 )
 
-            all_history = state.get("messages") or []
+            # Only this target_agent's bounded history (summary + recent window)
+            history = history_messages(state, target_agent)
 
-            # Only user/assistant messages for this target_agent
-            history = [
-                m
-                for m in all_history
-                if m.get("target_agent") == target_agent
-                and m.get("role") in ("user", "assistant")
-            ]
-
-            # (optional) truncate per-agent history:
-            # history = history[-10:]
-
-            messages = []
-
-            # 1) System prompt for responder
-            messages.append(
-                {
-                    "role": "system",
-                    "content": (
-                        responder_system_prompt
-                    ),
-                }
+            payload, report = project_responder_context(
+                make_json_safe(context),
+                make_json_safe(tool_results),
+                target_agent,
             )
+            span.update(metadata={"context_projection": report})
 
-            # 2) Context + tool_results as a single system message
-            messages.append(
-                {
-                    "role": "system",
-                    "content": (
-                        "RUNTIME CONTEXT WITH TOOL RESULTS:\n```json\n"
-                        + json.dumps(
-                            {
-                                "context": make_json_safe(context),
-                                "tool_results": make_json_safe(tool_results),
-                            },
-                            ensure_ascii=False,
-                        )
-                        + "\n```"
-                    ),
-                }
+            messages = assemble(
+                responder_system_prompt,
+                history,
+                [json_block("RUNTIME CONTEXT WITH TOOL RESULTS", payload)],
             )
 
-            # 3) Agent-specific chat history
-            messages.extend(history)
-
             state["llm_messages"] = messages
+            span.update(metadata={"prompt_tokens": count_messages(messages, RESPONDER_MODEL)})
             safe_update_current_span_io(
                 input={"context": context, "messages": messages},
                 redact=True,
@@ -1,15 +1,57 @@
 # linear_flow/nodes/responder_llm.py
 import time
-from openai import OpenAI, APIError, BadRequestError, APITimeoutError
+from typing import Any, Dict
+from openai import APIError, BadRequestError, APITimeoutError
 from agent.linear_flow.state import LinearAgentState
 from agent.linear_flow.models import LinearAgentResponse
 from observability.obs import span_step, safe_update_current_span_io, mark_error
 from agent.linear_flow.utils import add_message
+from shared.llm_gateway import gateway, json_schema_format
 
-client = OpenAI(timeout=10, max_retries=1)
 model = "gpt-4o"
 
 
+def _request_kwargs(llm_messages: list, target_agent: str) -> Dict[str, Any]:
+    return dict(
+        model=model,
+        tag=f"{target_agent}.responder",  # prompt-cache key + cache report
+        messages=llm_messages,
+        response_format=json_schema_format(LinearAgentResponse, "LinearAgentResponse", strict=False),
+    )
+
+
+def _apply_response(state: LinearAgentState, resp: Any) -> None:
+    #print("LLM response:", resp)
+    parsed = LinearAgentResponse.model_validate_json(
+        resp.choices[0].message.content
+    )
+
+    # Log parsed output (response OR followup_message)
+    safe_update_current_span_io(
+        output=parsed.model_dump(),
+        redact=True,
+    )
+
+    # Normalize into state:
+    # Normal final answer
+    state["response"] = parsed.response
+    state["is_followup_question"] = parsed.is_followup_question
+    state["needs_person_resolution"] = parsed.needs_person_resolution
+    state["person_resolution_items"] = parsed.person_resolution_items
+    add_message("assistant", parsed.response, state)
+
+
+def _apply_error(state: LinearAgentState, e: Exception, span: Any) -> None:
+    fallback = "משהו השתבש, נסה לנסח שוב."
+    state["response"] = fallback
+    state["is_followup_question"] = False
+    state["needs_person_resolution"] = False
+    state["person_resolution_items"] = None
+    add_message("assistant", fallback, state)
+    state["status"] = "error"
+    mark_error(e, kind="LLMError", span=span)
+
+
 def responder_llm(state: LinearAgentState) -> LinearAgentState:
     with span_step("responder_llm_node", kind="node", node="responder_llm_node"):
         with span_step(
@@ -28,51 +70,44 @@ def responder_llm(state: LinearAgentState) -> LinearAgentState:
 
             start = time.time()
             try:
-                schema = LinearAgentResponse.model_json_schema()
-
-                resp = client.chat.completions.create(
-                    model=model,
-                    messages=llm_messages,
-                    response_format={
-                        "type": "json_schema",
-                        "json_schema": {
-                            "name": "LinearAgentResponse",
-                            "schema": schema,
-                            "strict": False,
-                        },
-                    },
-                )
+                resp = gateway.chat(**_request_kwargs(llm_messages, state.get("target_agent")))
+
+                elapsed = time.time() - start
+                print(f"Responder LLM parse took {elapsed:.2f}s")
+                _apply_response(state, resp)
+
+            except (APITimeoutError, APIError, BadRequestError) as e:
+                _apply_error(state, e, _gen)
+
+            return state
+
+
+async def aresponder_llm(state: LinearAgentState) -> LinearAgentState:
+    """Async variant of responder_llm (used by app.ainvoke)."""
+    with span_step("responder_llm_node", kind="node", node="responder_llm_node"):
+        with span_step(
+            "llm_call",
+            kind="llm",
+            as_type="generation",
+            model=model,
+            node="responder_llm_node",
+        ) as _gen:
+            llm_messages = state.get("llm_messages", [])
+
+            safe_update_current_span_io(
+                input={"llm_messages": llm_messages},
+                redact=True,
+            )
+
+            start = time.time()
+            try:
+                resp = await gateway.achat(**_request_kwargs(llm_messages, state.get("target_agent")))
 
                 elapsed = time.time() - start
                 print(f"Responder LLM parse took {elapsed:.2f}s")
-                #print("LLM response:", resp)
-
-                parsed = LinearAgentResponse.model_validate_json(
-                    resp.choices[0].message.content
-                )
-
-                # Log parsed output (response OR followup_message)
-                safe_update_current_span_io(
-                    output=parsed.model_dump(),
-                    redact=True,
-                )
-
-                # Normalize into state:
-                # Normal final answer
-                state["response"] = parsed.response
-                state["is_followup_question"] = parsed.is_followup_question
-                state["needs_person_resolution"] = parsed.needs_person_resolution
-                state["person_resolution_items"] = parsed.person_resolution_items
-                add_message("assistant", parsed.response, state)
+                _apply_response(state, resp)
 
             except (APITimeoutError, APIError, BadRequestError) as e:
-                fallback = "משהו השתבש, נסה לנסח שוב."
-                state["response"] = fallback
-                state["is_followup_question"] = False
-                state["needs_person_resolution"] = False
-                state["person_resolution_items"] = None
-                add_message("assistant", fallback, state)
-                state["status"] = "error"
-                mark_error(e, kind="LLMError", span=_gen)
+                _apply_error(state, e, _gen)
 
             return state
@@ -0,0 +1,44 @@
+# linear_flow/nodes/template_responder_node.py
+from typing import Callable, Optional
+from agent.linear_flow.state import LinearAgentState
+from agent.linear_flow.templates import ResponseTemplates
+from agent.linear_flow.utils import add_message
+from observability.obs import span_step, safe_update_current_span_io
+
+
+def make_template_responder_node(
+    templates: Optional[ResponseTemplates],
+) -> Callable[[LinearAgentState], LinearAgentState]:
+    """
+    Render the reply from templates when this turn's tool outcomes are
+    deterministic. Sets state["template_rendered"]; when False the graph
+    continues to prepare_responder_messages -> responder_llm.
+    """
+
+    def template_responder(state: LinearAgentState) -> LinearAgentState:
+        records = state.get("turn_tool_results") or []
+        with span_step(
+            "template_responder",
+            kind="node",
+            node="template_responder",
+            tool_count=len(records),
+        ) as span:
+            reply = templates.render(records) if templates else None
+            state["template_rendered"] = reply is not None
+            span.update(metadata={"template_rendered": reply is not None})
+            if reply is None:
+                return state
+
+            state["response"] = reply.response
+            state["is_followup_question"] = reply.is_followup_question
+            state["needs_person_resolution"] = reply.needs_person_resolution
+            state["person_resolution_items"] = reply.person_resolution_items
+            add_message("assistant", reply.response, state)
+            safe_update_current_span_io(
+                input={"tools": [r.get("tool") for r in records]},
+                output={"response": reply.response},
+                redact=True,
+            )
+            return state
+
+    return template_responder
@@ -5,12 +5,19 @@ class LinearAgentState(TypedDict, total=False):
     input_text: str
     context: Dict[str, Any]
     tool_results: List[Dict[str, Any]]
+    # tool records of the current turn only (execute_tools -> template_responder)
+    turn_tool_results: List[Dict[str, Any]]
+    template_rendered: Optional[bool]
     status: Optional[str]
 
     llm_messages: List[Dict[str, Any]]
-    messages: List[Dict[str, Any]]
+    messages: List[Dict[str, Any]]  # legacy flat history, migrated into agent_memory
+    # per agent: {"summary": item | None, "recent": [msg, ...]} (linear_flow/history.py)
+    agent_memory: Dict[str, Dict[str, Any]]
     
     # Planner LLM output
+    # {agent, fingerprint, content} computed while routing (speculative mode)
+    speculative_plan: Optional[Dict[str, Any]]
     actions: List[Dict[str, Any]]
     followup_message: Optional[str]
 
@@ -19,6 +26,8 @@ class LinearAgentState(TypedDict, total=False):
     is_followup_question: Optional[bool]
 
     target_agent: Optional[str]
+    # tokens / cost / latency of the last turn (observability.ledger), set by handle_tami_turn
+    turn_ledger: Optional[Dict[str, Any]]
     needs_person_resolution: Optional[bool]
     person_resolution_items: Optional[List[Dict[str, Any]]]
     
\ No newline at end of file
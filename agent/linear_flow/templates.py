@@ -0,0 +1,68 @@
+# agent/linear_flow/templates.py
+"""
+Rule-based responder for deterministic tool outcomes.
+
+After execute_tools, each agent may render the reply from templates instead
+of calling the responder LLM (prepare_responder_messages -> responder_llm).
+An agent opts in per tool:
+
+    ResponseTemplates(renderers={"process_task": render_process_task, ...})
+
+A renderer gets the records of THIS turn's calls to its tool
+([{tool, args, result, error}, ...], in call order) and returns the Hebrew
+text, or None when the outcome needs natural-language synthesis. The template
+path is taken only if EVERY tool of the turn rendered; otherwise the turn goes
+to the responder LLM as before.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+ToolRecord = Dict[str, Any]
+Renderer = Callable[[List[ToolRecord]], Optional[str]]
+
+
+@dataclass
+class TemplateReply:
+    response: str
+    is_followup_question: bool = False
+    needs_person_resolution: bool = False
+    person_resolution_items: Optional[List[Dict[str, Any]]] = None
+
+
+@dataclass
+class ResponseTemplates:
+    renderers: Dict[str, Renderer] = field(default_factory=dict)
+    # joins the parts of a multi-tool turn
+    separator: str = "\n"
+
+    def render(self, records: List[ToolRecord]) -> Optional[TemplateReply]:
+        if not records:
+            return None
+        by_tool: Dict[str, List[ToolRecord]] = {}
+        for record in records:
+            by_tool.setdefault(record.get("tool"), []).append(record)
+        parts: List[str] = []
+        for tool, tool_records in by_tool.items():
+            renderer = self.renderers.get(tool)
+            text = renderer(tool_records) if renderer else None
+            if text is None:
+                return None
+            parts.append(text)
+        return TemplateReply(response=self.separator.join(parts))
+
+
+def tool_ok(record: ToolRecord) -> bool:
+    """The tool ran and reported success ({ok: true} results, or no ok flag)."""
+    if record.get("error") is not None:
+        return False
+    result = record.get("result")
+    return not (isinstance(result, dict) and result.get("ok") is False)
+
+
+def tool_error_code(record: ToolRecord) -> Optional[str]:
+    result = record.get("result")
+    if isinstance(result, dict):
+        return result.get("code") or result.get("error")
+    return None
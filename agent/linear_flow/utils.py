@@ -59,6 +59,7 @@ def update_context_with_tool_result(
     return context
 
 from agent.linear_flow.state import LinearAgentState
+from agent.linear_flow.history import append_message
 
 def add_message(role: str, content: str, state: LinearAgentState, messages_key="messages") -> LinearAgentState:
     target_agent = state.get("target_agent")
@@ -77,6 +78,9 @@ def add_message(role: str, content: str, state: LinearAgentState, messages_key="
 
     if role == "system":
         state.setdefault("llm_messages", []).append(msg)
+    elif messages_key == "messages":
+        # bounded per-agent buffer (state["agent_memory"]), see linear_flow/history.py
+        append_message(state, msg)
     else:
         state.setdefault(messages_key, []).append(msg)
 
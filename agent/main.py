@@ -11,14 +11,16 @@ from shared.time import to_user_timezone, utcnow
 from shared.whisper_stt_facebook import transcribe_facebook_audio
 from context.primitives.sender import SharedContactInfo
 from models.input import In, Source, Category
-from agent.tami.main import process_input
+from agent.tami.main import aprocess_input
 from tools.base import instrument_io
 get_display = lambda x: x
 
+import asyncio
 import uuid
 from shared.user import get_user
 from store.user import UserStore
 from shared.user import userContextDict, normalize_recipient_id
+from tools.contact_index import invalidate_contact_index
 from langfuse import observe
 
 def format_shared_contact(contact: SharedContactInfo, user_id: str) -> str:
@@ -39,8 +41,8 @@ def format_shared_contact(contact: SharedContactInfo, user_id: str) -> str:
     contact1["phone"] = chat_id.split("@")[0]
     user.runtime.contacts[name] = contact1
 
-    UserStore(user_id).save(user)
-    userContextDict[user_id] = user
+    userContextDict.save(user, ("runtime", "contacts", name))
+    invalidate_contact_index(user_id)
 
     if contact.phone:
         parts.append(f"מספר: {contact.phone}")
@@ -67,8 +69,9 @@ def handle_media(content):
     redact=True,
 )
 async def handleUserInput(rawMessage:RawMessage, user:User):
-    handle_media(rawMessage.content)
-    contact = format_shared_contact(rawMessage.content.contact, user.user_id)
+    # audio download + Whisper STT and the contact save block: keep them off the loop
+    await asyncio.to_thread(handle_media, rawMessage.content)
+    contact = await asyncio.to_thread(format_shared_contact, rawMessage.content.contact, user.user_id)
     if contact:
         text = (rawMessage.content.text + "\n") if rawMessage.content.text else ""
         rawMessage.content.text = text + contact
@@ -91,14 +94,16 @@ async def handleUserInput(rawMessage:RawMessage, user:User):
         idempotency_key=rawMessage.idempotency_key,
         tz=user.config.timezone,
         locale=user.config.language,
+        # webhook arrival (queue wait in the turn ledger); now for direct calls
+        received_at=rawMessage.received_at or utcnow(),
     )
 
-    result = process_input(inp)
+    # Awaited natively (AsyncOpenAI + ainvoke); sync tool nodes run in
+    # LangGraph's executor, so the event loop keeps serving other chats.
+    result = await aprocess_input(inp)
     print(f"result:\n {result}")
     return result
 
-import asyncio
-
 async def main():
     while True:
         try:
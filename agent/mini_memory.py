@@ -2,9 +2,9 @@
 from __future__ import annotations
 from dataclasses import dataclass
 from typing import Callable, List, Dict, Any, Optional, Literal
-import math
 import time
 import asyncio
+from shared.token_counter import count_text
 
 Role = Literal["system", "user", "assistant", "tool"]
 
@@ -29,8 +29,8 @@ TokenCounter = Callable[[str], int]
 Summarizer = Callable[[str], str]
 
 def default_token_counter(text: str) -> int:
-    # Cheap heuristic ~4 chars per token. Replace with tiktoken if you want.
-    return max(1, math.ceil(len(text) / 4))
+    # Real BPE count (gpt-4o encoding), memoized per text (shared/token_counter.py)
+    return max(1, count_text(text))
 
 class MiniMemoryManager:
     def __init__(
@@ -0,0 +1,279 @@
+# agent/order/alias_index.py
+"""
+Process-wide in-memory index of the customer / product alias collections.
+
+store/customer_aliases_store and store/product_aliases_store ran one
+Firestore query per lookup; every line item of every order paid a network
+round trip. The index holds both collections in hash maps keyed by the
+normalized alias (agent/order/shortlist.normalize), so resolution is a dict
+lookup:
+
+    customer: alias -> canonical customer name
+    product:  (alias, customer_id | None) -> {canonical_product_id, canonical_product_name, ...}
+              (customer-specific override first, then the global mapping,
+              like get_canonical_product)
+
+Sources (ORDER_ALIAS_INDEX):
+  - "firestore" (default): full load, then live updates from an on_snapshot
+    listener per collection (the change feed), plus a full reload every
+    ALIAS_REFRESH_S by alias_sync_loop as a safety net for dropped listeners
+    and missed deletes.
+  - "file": a local JSON file (ORDER_ALIAS_INDEX_FILE) of
+    {"customer_aliases": {doc_id: {...}}, "product_aliases": {doc_id: {...}}},
+    reloaded when it changes. For tests and offline runs; no Firestore.
+
+version(collection) is a digest of the collection's current contents; the
+shortlist's catalog indexes (agent/order/shortlist) are rebuilt when it
+changes, so any alias change (from this code or the console) takes effect.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from agent.order.shortlist import normalize
+
+logger = logging.getLogger(__name__)
+
+ALIAS_INDEX_MODE = os.getenv("ORDER_ALIAS_INDEX", "firestore")
+ALIAS_INDEX_FILE = os.getenv("ORDER_ALIAS_INDEX_FILE", "aliases.json")
+ALIAS_REFRESH_S = float(os.getenv("ORDER_ALIAS_REFRESH_S", "300"))
+START_RETRY_S = 30.0  # after a failed initial load, lookups retry it at most this often
+UNLOADED_VERSION = "unloaded"
+
+COLLECTIONS = ("customer_aliases", "product_aliases")
+ENTITY_COLLECTION = {"customer": "customer_aliases", "product": "product_aliases"}
+
+ProductKey = Tuple[str, Optional[str]]
+
+
+def _scope(customer_id: Any) -> Optional[str]:
+    return None if customer_id in (None, "") else str(customer_id)
+
+
+class AliasIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._docs: Dict[str, Dict[str, Dict[str, Any]]] = {c: {} for c in COLLECTIONS}
+        self._versions: Dict[str, Optional[str]] = {c: None for c in COLLECTIONS}
+        self.customer: Dict[str, str] = {}
+        self.product: Dict[ProductKey, Dict[str, Any]] = {}
+        self.loaded = False
+        self.updates = 0
+
+    # -- mutation -------------------------------------------------------
+    def replace(self, collection: str, docs: Dict[str, Dict[str, Any]]) -> None:
+        """Swap in the full contents of a collection (doc id -> document)."""
+        with self._lock:
+            self._docs[collection] = dict(docs)
+            self._rebuild(collection)
+
+    def apply(self, collection: str, changes: Iterable[Tuple[str, Optional[Dict[str, Any]]]]) -> None:
+        """Upsert (doc id, document) pairs; a None document removes the doc."""
+        with self._lock:
+            docs = self._docs[collection]
+            for doc_id, data in changes:
+                if data is None:
+                    docs.pop(doc_id, None)
+                else:
+                    docs[doc_id] = data
+                self.updates += 1
+            self._rebuild(collection)
+
+    def _rebuild(self, collection: str) -> None:
+        # collections are small (hundreds of docs): rebuilding the maps keeps
+        # the "first doc by id wins" order of the old .limit(1) queries simple
+        docs = [d for _, d in sorted(self._docs[collection].items())]
+        if collection == "customer_aliases":
+            customer: Dict[str, str] = {}
+            for d in docs:
+                key = normalize(d.get("alias") or "")
+                if key and d.get("canonical"):
+                    customer.setdefault(key, d["canonical"])
+            self.customer = customer
+        else:
+            product: Dict[ProductKey, Dict[str, Any]] = {}
+            for d in docs:
+                key = normalize(d.get("alias") or "")
+                if not key:
+                    continue
+                product.setdefault((key, _scope(d.get("customer_id"))), {
+                    "canonical_product_id": d.get("canonical_product_id"),
+                    "canonical_product_name": d.get("canonical_product_name"),
+                    "customer_id": d.get("customer_id"),
+                })
+            self.product = product
+        self._versions[collection] = None
+
+    # -- lookups --------------------------------------------------------
+    def customer_canonical(self, alias: str) -> Optional[str]:
+        return self.customer.get(normalize(alias))
+
+    def canonical_product(self, alias: str, customer_id: Any = None) -> Optional[Dict[str, Any]]:
+        key = normalize(alias)
+        scope = _scope(customer_id)
+        if scope is not None:
+            hit = self.product.get((key, scope))
+            if hit is not None:
+                return {**hit, "scope": "customer"}
+        hit = self.product.get((key, None))
+        return {**hit, "scope": "global"} if hit is not None else None
+
+    def version(self, collection: str) -> str:
+        """Content digest; UNLOADED_VERSION (never cached) until the first successful load."""
+        with self._lock:
+            if not self.loaded:
+                return UNLOADED_VERSION
+            if self._versions[collection] is None:
+                payload = json.dumps(self._docs[collection], sort_keys=True, ensure_ascii=False, default=str)
+                self._versions[collection] = hashlib.blake2b(payload.encode("utf-8"), digest_size=6).hexdigest()
+            return self._versions[collection]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "loaded": self.loaded,
+                "customer_aliases": len(self.customer),
+                "product_aliases": len(self.product),
+                "live_updates": self.updates,
+            }
+
+
+# ----------------------------------------------------------------------
+# sources
+# ----------------------------------------------------------------------
+def _firestore_docs(collection: str) -> Dict[str, Dict[str, Any]]:
+    from db.base import db
+
+    return {snap.id: snap.to_dict() or {} for snap in db.collection(collection).stream()}
+
+
+def _file_docs() -> Dict[str, Dict[str, Dict[str, Any]]]:
+    if not os.path.exists(ALIAS_INDEX_FILE):
+        return {c: {} for c in COLLECTIONS}
+    with open(ALIAS_INDEX_FILE, encoding="utf-8") as f:
+        data = json.load(f)
+    out = {}
+    for c in COLLECTIONS:
+        docs = data.get(c) or {}
+        if isinstance(docs, list):  # plain list of documents: ids by position
+            docs = {str(i): d for i, d in enumerate(docs)}
+        out[c] = docs
+    return out
+
+
+_index = AliasIndex()
+_start_lock = threading.Lock()
+_listeners: list = []
+_file_mtime: Optional[float] = None
+
+
+def refresh(mode: str = ALIAS_INDEX_MODE) -> None:
+    """Full reload of both collections from the configured source."""
+    global _file_mtime
+    if mode == "file":
+        _file_mtime = os.path.getmtime(ALIAS_INDEX_FILE) if os.path.exists(ALIAS_INDEX_FILE) else None
+        for collection, docs in _file_docs().items():
+            _index.replace(collection, docs)
+    else:
+        docs = {collection: _firestore_docs(collection) for collection in COLLECTIONS}
+        for collection in COLLECTIONS:
+            _index.replace(collection, docs[collection])
+    with _index._lock:
+        _index.loaded = True
+
+
+def _on_snapshot(collection: str):
+    def callback(_docs, changes, _read_time):
+        _index.apply(collection, [
+            (c.document.id, None if c.type.name == "REMOVED" else (c.document.to_dict() or {}))
+            for c in changes
+        ])
+
+    return callback
+
+
+_started = False
+_last_attempt = 0.0
+
+
+def start(mode: str = ALIAS_INDEX_MODE) -> AliasIndex:
+    """
+    Load the index once per process and, for Firestore, subscribe to changes.
+
+    Callers arriving during the load wait for it. Only a successful load marks
+    the index started; after a failure the (empty, not loaded) index is served
+    and the load is retried by the next call after START_RETRY_S, or by
+    alias_sync_loop.
+    """
+    global _started, _last_attempt
+    if _started:
+        return _index
+    with _start_lock:
+        if _started:
+            return _index
+        if _last_attempt and time.monotonic() - _last_attempt < START_RETRY_S:
+            return _index
+        _last_attempt = time.monotonic()
+        try:
+            refresh(mode)
+        except Exception:
+            logger.exception("alias index: initial load failed; aliases resolve to nothing until it is retried")
+            return _index
+        logger.info("alias index loaded: %s", _index.stats())
+        if mode != "file":
+            from db.base import db
+
+            for collection in COLLECTIONS:
+                try:
+                    # the first snapshot re-delivers every doc as ADDED: harmless upserts
+                    _listeners.append(db.collection(collection).on_snapshot(_on_snapshot(collection)))
+                except Exception:
+                    logger.exception("alias index: listener for %s failed; relying on periodic refresh", collection)
+        _started = True
+    return _index
+
+
+def alias_index() -> AliasIndex:
+    return _index if _started else start()
+
+
+async def alias_sync_loop(stop_event: asyncio.Event, mode: str = ALIAS_INDEX_MODE) -> None:
+    """Safety-net full reloads (Firestore) / reload on file change (file mode)."""
+    await asyncio.to_thread(start, mode)
+    interval = 5.0 if mode == "file" else ALIAS_REFRESH_S
+    while not stop_event.is_set():
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=interval)
+            break
+        except asyncio.TimeoutError:
+            pass
+        try:
+            if not _started:
+                await asyncio.to_thread(start, mode)
+                continue
+            if mode == "file":
+                mtime = os.path.getmtime(ALIAS_INDEX_FILE) if os.path.exists(ALIAS_INDEX_FILE) else None
+                if mtime == _file_mtime:
+                    continue
+            await asyncio.to_thread(refresh, mode)
+        except Exception:
+            logger.exception("alias index: refresh failed")
+    for listener in _listeners:
+        try:
+            listener.unsubscribe()
+        except Exception:
+            pass
+
+
+def alias_index_stats() -> Dict[str, Any]:
+    out = _index.stats()
+    out["mode"] = ALIAS_INDEX_MODE
+    out["versions"] = {c: _index.version(c) for c in COLLECTIONS}
+    return out
@@ -7,8 +7,12 @@ from agent.order.file_helper import CUSTOMERS_STRING, PRODUCTS_STRING
 from agent.order.json_models import FormatterPayload
 from typing import Optional, Dict, Any
 from green_api.ledger_item import extract_ledger_from_message, _send_orders_async2
+import asyncio
 import logging
 import json
+import os
+import threading
+import time
 from agent.order.file_helper import CUSTOMERS
 logger = logging.getLogger(__name__)
 
@@ -46,32 +50,87 @@ def _to_int_or_none(x):
 
 import re
 from agent.order.file_helper import get_customer_id_by_name, get_product_id_by_name
-async def extract_orders_from_message(text: str) -> Optional[Dict[str, Any]]:
 
-    #step 1: extract order format
-    print(f"extracting order format from {text}")
-    order_format = await extract_orders_format_from_message(text=text)
-    if order_format is None:
-        return None
-    
-    payload = FormatterPayload(**order_format)
-    payload.original_text = text
-    
-    print(f"extracted order format: {payload}")
-    customer = payload.customer_span
-    if customer is None:
-        return None
+# customer + line-item matches of an order run side by side; the semaphore
+# bounds concurrent match calls across all orders in the process
+ORDER_MATCH_CONCURRENCY = int(os.getenv("ORDER_MATCH_CONCURRENCY", "6"))
+ORDER_MATCH_TIMEOUT_S = float(os.getenv("ORDER_MATCH_TIMEOUT_S", "30"))
+_match_sem = asyncio.Semaphore(ORDER_MATCH_CONCURRENCY)
 
-    #step 2: extract customer
-    customer_match = await match_entity("customer", customer or "", CUSTOMERS_STRING)
+_stats_lock = threading.Lock()
+_order_stats: Dict[str, float] = {
+    "orders": 0,
+    "matches": 0,
+    "failed_matches": 0,
+    "timeouts": 0,
+    "formatter_ms_total": 0.0,
+    "match_ms_total": 0.0,
+    "match_wall_ms_total": 0.0,
+    "total_ms_total": 0.0,
+}
+
+
+def _record_order(timings: Dict[str, Any]) -> None:
+    with _stats_lock:
+        _order_stats["orders"] += 1
+        _order_stats["matches"] += len(timings["matches_ms"])
+        _order_stats["failed_matches"] += timings["failed_matches"]
+        _order_stats["timeouts"] += timings["timeouts"]
+        _order_stats["formatter_ms_total"] += timings["formatter_ms"]
+        _order_stats["match_ms_total"] += sum(timings["matches_ms"].values())
+        _order_stats["match_wall_ms_total"] += timings["match_wall_ms"]
+        _order_stats["total_ms_total"] += timings["total_ms"]
+
+
+def order_timing_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        out = dict(_order_stats)
+    if out["orders"]:
+        for key in ("formatter", "match_wall", "total"):
+            out[f"{key}_ms_avg"] = round(out[f"{key}_ms_total"] / out["orders"], 1)
+    if out["matches"]:
+        out["match_ms_avg"] = round(out["match_ms_total"] / out["matches"], 1)
+    # serial match time the fan-out did not have to wait for
+    out["parallel_saved_ms"] = round(out["match_ms_total"] - out["match_wall_ms_total"], 1)
+    return out
+
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+async def _bounded_match(stage: str, timings: Dict[str, Any], entity_type: str, span: str, list_text: str, customer_id=None):
+    """match_entity under the shared semaphore and a timeout; None (recorded as failed) on error."""
+    start = time.perf_counter()
+    try:
+        async with _match_sem:
+            result = await asyncio.wait_for(
+                match_entity(entity_type, span, list_text, customer_id),
+                ORDER_MATCH_TIMEOUT_S,
+            )
+        if isinstance(result, dict):
+            return result
+        logger.warning("[orders] %s match for %r returned no JSON", stage, span)
+    except asyncio.TimeoutError:
+        timings["timeouts"] += 1
+        logger.warning("[orders] %s match for %r timed out after %ss", stage, span, ORDER_MATCH_TIMEOUT_S)
+    except Exception:
+        logger.exception("[orders] %s match for %r failed", stage, span)
+    finally:
+        timings["matches_ms"][stage] = _elapsed_ms(start)
+    timings["failed_matches"] += 1
+    return None
+
+
+async def _match_customer(payload: FormatterPayload, customer: str, timings: Dict[str, Any]) -> None:
+    customer_match = await _bounded_match("customer", timings, "customer", customer, CUSTOMERS_STRING)
     if customer_match is None:
-        return None
-    
-    cid = None
+        return  # partial failure: the order goes out without a matched customer
+
     confidence = float(customer_match.get("confidence", 0) or 0)
     reason = customer_match.get("reason") or None
     customer_match = customer_match.get("matched_name") if confidence > 0.8 else None
-   
+
     if customer_match:
         payload.customer_matched = customer_match
         cid = _to_int_or_none(get_customer_id_by_name(customer_match))
@@ -85,37 +144,72 @@ async def extract_orders_from_message(text: str) -> Optional[Dict[str, Any]]:
     else:
         if reason:
             payload.customer_matched = reason
-    #step 3: extract order items
+
+
+async def _match_item(i: int, item, timings: Dict[str, Any]) -> None:
+    product = item.product_span
+    if not product:
+        return
+    product_alias = try_default("product", product) # get product alias: גרנולה - גרנולה 12
+    if product_alias:
+        product_alias = product_alias.get("canonical_product_name")
+    else:
+        product_alias = product
+    print(f"product_alias: {product_alias}, product: {product}")
+    packaging = item.packaging_span
+    if packaging == "משטח" or packaging is None:
+        item.packaging_span = "מארז קטן"
+        if item.packaging_span not in product_alias :
+            product_alias += " " + item.packaging_span
+    elif packaging == "ביג" or packaging == "מארזים" or packaging == "ביגבג" or packaging == "משטחים" or packaging == "מארז":
+        item.packaging_span = "מארז גדול"
+        if item.packaging_span not in product_alias :
+            product_alias += " " + item.packaging_span
+    # customer_id is not known yet (matched concurrently); match_entity does not use it
+    product_match = await _bounded_match(f"item_{i}", timings, "product", product_alias or "", PRODUCTS_STRING)
+
+    # low confidence or a failed match keeps the (alias-resolved) span
+    if product_match is not None and float(product_match.get("confidence", 0) or 0) > 0.8:
+        item.product_matched = product_match.get("matched_name")
+    else:
+        item.product_matched = product_alias
+    item.product_id_matched = get_product_id_by_name(item.product_matched)
+    print(f"product_match: {item.product_matched}, product: {product}")
+
+
+async def extract_orders_from_message(text: str) -> Optional[Dict[str, Any]]:
+    started = time.perf_counter()
+    timings: Dict[str, Any] = {"matches_ms": {}, "failed_matches": 0, "timeouts": 0}
+
+    #step 1: extract order format
+    print(f"extracting order format from {text}")
+    order_format = await extract_orders_format_from_message(text=text)
+    timings["formatter_ms"] = _elapsed_ms(started)
+    if order_format is None:
+        return None
+    
+    payload = FormatterPayload(**order_format)
+    payload.original_text = text
+    
+    print(f"extracted order format: {payload}")
+    customer = payload.customer_span
+    if customer is None:
+        return None
     items = payload.line_items
     if items is None:
         return None
-    
-    for item in items:
-        product = item.product_span
-        if not product:
-            continue
-        product_alias = try_default("product", product) # get product alias: גרנולה - גרנולה 12 
-        if product_alias:
-            product_alias = product_alias.get("canonical_product_name")
-        else:
-            product_alias = product
-        print(f"product_alias: {product_alias}, product: {product}")
-        packaging = item.packaging_span
-        if packaging == "משטח" or packaging is None:
-            item.packaging_span = "מארז קטן"
-            if item.packaging_span not in product_alias :
-                product_alias += " " + item.packaging_span
-        elif packaging == "ביג" or packaging == "מארזים" or packaging == "ביגבג" or packaging == "משטחים" or packaging == "מארז":
-            item.packaging_span = "מארז גדול"
-            if item.packaging_span not in product_alias :
-                product_alias += " " + item.packaging_span
-        product_match = await match_entity("product", product_alias or "", PRODUCTS_STRING, cid)
-        if product_match is None:
-            return None
-
-        item.product_matched = product_match.get("matched_name") if float(product_match.get("confidence", 0) or 0) > 0.8 else product_alias
-        item.product_id_matched = get_product_id_by_name(item.product_matched)
-        print(f"product_match: {item.product_matched}, product: {product}")
+
+    #step 2+3: match customer and order items concurrently
+    match_start = time.perf_counter()
+    await asyncio.gather(
+        _match_customer(payload, customer or "", timings),
+        *(_match_item(i, item, timings) for i, item in enumerate(items)),
+    )
+    timings["match_wall_ms"] = _elapsed_ms(match_start)
+    timings["total_ms"] = _elapsed_ms(started)
+    payload.timings = timings
+    _record_order(timings)
+    logger.info("[orders] timings: %s", timings)
 
     await _send_orders_async2(payload)
     return payload
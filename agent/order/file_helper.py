@@ -1,6 +1,8 @@
 import csv
 from pathlib import Path
 
+from agent.order.shortlist import normalize
+
 # ── Constants ───────────────────────────────────────────────
 _CUSTOMERS_FILE = Path(__file__).parent / "customers1.csv"
 _PRODUCTS_FILE = Path(__file__).parent / "products.txt"
@@ -26,18 +28,23 @@ def _load_customers():
     return customers
 
 def get_customer_id_by_name(name: str) -> int | None:
-    name = name.strip()
-    for cid, data in CUSTOMERS.items():
-        if data["name"] == name:
-            return cid
-    return None
+    name = (name or "").strip()
+    cid = _CUSTOMER_ID_BY_NAME.get(name)
+    return cid if cid is not None else _CUSTOMER_ID_BY_KEY.get(normalize(name))
 
 def get_product_id_by_name(name: str) -> int | None:
-    name = name.strip()
-    for pid, desc in PRODUCTS.items():
-        if desc == name:
-            return pid
-    return None
+    name = (name or "").strip()
+    pid = _PRODUCT_ID_BY_NAME.get(name)
+    return pid if pid is not None else _PRODUCT_ID_BY_KEY.get(normalize(name))
+
+
+def _reverse(names) -> tuple[dict, dict]:
+    """name -> id and normalized name -> id maps; the first id wins (like the old linear scans)."""
+    by_name, by_key = {}, {}
+    for entity_id, name in names:
+        by_name.setdefault(name, entity_id)
+        by_key.setdefault(normalize(name), entity_id)
+    return by_name, by_key
 
 
 def _load_products():
@@ -61,6 +68,8 @@ CUSTOMERS_STRING = "id | name | address\n" + "\n".join(
 )
 
 PRODUCTS = _load_products()
+_CUSTOMER_ID_BY_NAME, _CUSTOMER_ID_BY_KEY = _reverse((cid, d["name"]) for cid, d in CUSTOMERS.items())
+_PRODUCT_ID_BY_NAME, _PRODUCT_ID_BY_KEY = _reverse(PRODUCTS.items())
 PRODUCTS_STRING = "\n".join(
     f"{name}"
     for name in PRODUCTS.values()
@@ -5,7 +5,6 @@ import logging
 from typing import Any, Dict, List, Optional, Union, Sequence
 
 from dotenv import load_dotenv
-from openai import AsyncOpenAI
 import httpx
 
 import asyncio
@@ -16,8 +15,9 @@ from agent.order.json_models import FORMATTER_JSON_SCHEMA
 
 load_dotenv(".venv/.env")
 
+from shared.llm_gateway import gateway
+
 logger = logging.getLogger(__name__)
-client = AsyncOpenAI()
 
 
 def _to_int_maybe(n: Union[int, float, str, None]) -> Optional[int]:
@@ -64,8 +64,9 @@ async def extract_orders_format_from_message(
 
     # --- LLM call ---
     try:
-        resp = await client.chat.completions.create(
+        resp = await gateway.achat(
             model="gpt-5-mini",
+            tag="order.formatter",
             messages=[
                 {"role": "system", "content": FORMAT_ORDER_MESSAGE_PROMPT},
                 {"role": "user", "content": text},
@@ -37,7 +37,7 @@ FORMATTER_JSON_SCHEMA = {
     }
 }
 
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 from pydantic import BaseModel, Field
 
 
@@ -60,3 +60,4 @@ class FormatterPayload(BaseModel):
     transportation_matched: Optional[str] = Field(None)
     notes_span: Optional[str] = Field(None)
     line_items: List[LineItem]
+    timings: Optional[Dict[str, Any]] = Field(None)  # per-stage ms of extract_orders_from_message
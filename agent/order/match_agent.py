@@ -1,37 +1,97 @@
 
 
+from agent.order import match_cache
 from agent.order.prompts import GENERIC_MATCH_PROMPT
-from openai import AsyncOpenAI
-from store.customer_aliases_store import get_customer_canonical_name
-from store.product_aliases_store import get_canonical_product
+from agent.order.shortlist import catalog_index, list_text as shortlist_text
+from agent.order.alias_index import alias_index
 from typing import Optional
 import json
+import os
 import re
-client = AsyncOpenAI()
+from shared.llm_gateway import gateway
 
 import asyncio
 import random
 
 
-# add cache for previous searches
-async def match_entity(entity_type: str, message: str, list_text: str, customer_id: Optional[str] = None):
-    print(f"Matching {entity_type} for {message}")
+USE_SHORTLIST = os.getenv("ORDER_MATCH_SHORTLIST", "1") == "1"
+USE_MATCH_CACHE = os.getenv("ORDER_MATCH_CACHE", "1") == "1"
+LOCAL_MATCH_REASON = "local shortlist"
+
+
+def build_match_prompt(entity_type: str, message: str, list_text: str) -> str:
+    return GENERIC_MATCH_PROMPT\
+        .replace("{{ENTITY_TYPE}}", entity_type)\
+        .replace("{{ORIGINAL_MESSAGE}}", message)\
+        .replace("{{LIST_TEXT}}", list_text)
+
+
+async def match_entity(
+    entity_type: str,
+    message: str,
+    list_text: str,
+    customer_id: Optional[str] = None,
+    use_shortlist: bool = USE_SHORTLIST,
+    use_cache: bool = USE_MATCH_CACHE,
+):
+    """
+    Match `message` to one entry of the entity catalog.
 
+    Customer aliases (agent/order/alias_index) are resolved first, before the
+    cache, so alias changes never need a cache invalidation (product aliases
+    are resolved by the caller, see core.try_default). Confident model results
+    are kept in the persistent match cache (agent/order/match_cache.py), so
+    recurring spans resolve without a model call; local matches are recomputed
+    (an in-memory lookup) instead. With the shortlist on, entity types that
+    have a local catalog index (customer / product, see
+    agent/order/shortlist.py) are matched locally first: an unambiguous hit is
+    returned without a model call, otherwise the model sees only the top-K
+    candidates instead of the full `list_text`.
+    """
     if entity_type == "customer":
-        canonical_name = get_customer_canonical_name(message)
+        canonical_name = alias_index().customer_canonical(message)
         if canonical_name:
             return {
                 "matched_name": canonical_name,
                 "confidence": 1.0,
             }
 
-    prompt = GENERIC_MATCH_PROMPT\
-        .replace("{{ENTITY_TYPE}}", entity_type)\
-        .replace("{{ORIGINAL_MESSAGE}}", message)\
-        .replace("{{LIST_TEXT}}", list_text)
+    scope = str(customer_id or "")
+    if use_cache:
+        cached = await asyncio.to_thread(match_cache.get, entity_type, message, scope)
+        if cached is not None:
+            print(f"Matched {entity_type} for {message} from cache: {cached.get('matched_name')}")
+            return cached
+
+    result = await _match_entity(entity_type, message, list_text, use_shortlist)
+    local = isinstance(result, dict) and result.get("reason") == LOCAL_MATCH_REASON
+    if use_cache and not local:
+        await asyncio.to_thread(match_cache.put, entity_type, message, result, scope)
+    return result
+
+
+async def _match_entity(entity_type: str, message: str, list_text: str, use_shortlist: bool):
+    print(f"Matching {entity_type} for {message}")
+
+    index = catalog_index(entity_type) if use_shortlist else None
+    if index is not None:
+        auto = index.decide(message)
+        if auto is not None:
+            print(f"Matched {entity_type} for {message} locally: {auto.name}")
+            return {
+                "matched_name": auto.name,
+                "confidence": 1.0,
+                "reason": LOCAL_MATCH_REASON,
+            }
+        candidates = index.shortlist(message)
+        if candidates:
+            list_text = shortlist_text(candidates)
+
+    prompt = build_match_prompt(entity_type, message, list_text)
 
-    response = await client.chat.completions.create(
+    response = await gateway.achat(
         model="gpt-5-mini",
+        tag="order.match",
         messages=[{"role": "system", "content": prompt}],
     )
     print(f"Matched {entity_type} for {message}: {response.choices[0].message.content}")
@@ -54,7 +114,7 @@ async def match_entity(entity_type: str, message: str, list_text: str, customer_
 
 def try_default(entity_type: str, message: str, customer_id: Optional[str] = None):
     if entity_type == "customer":
-        return get_customer_canonical_name(message)
+        return alias_index().customer_canonical(message)
     if entity_type == "product":
-        return get_canonical_product(message, customer_id=customer_id)
+        return alias_index().canonical_product(message, customer_id=customer_id)
     return None
\ No newline at end of file
@@ -0,0 +1,205 @@
+# agent/order/match_cache.py
+"""
+Persistent cache of order entity matches (customer / product resolution).
+
+The same customers and products recur all day in the monitored groups;
+match_entity looks each (entity type, normalized span, customer scope) up
+here after the alias index and before the shortlist or the model, and stores
+every confident model result (confidence >= MIN_CACHED_CONFIDENCE).
+
+Entries are keyed by a catalog version as well:
+
+    <digest of customers1.csv + products.txt as loaded by this process>
+    .<digest of the match prompt + shortlist settings>
+
+so a new catalog or a matcher change reads fresh entries. Aliases are not part
+of the key: they are resolved before the cache. Rows of other versions are
+never deleted at lookup time (another process sharing the file may still use
+them); like any unused row they leave through the LRU bound
+(MATCH_CACHE_MAX_ROWS) or once unused for MATCH_CACHE_MAX_AGE_S.
+
+Storage is a local SQLite file (WAL mode), shared by all worker processes on
+the host. Any SQLite or data error degrades to a cache miss.
+Hit rates: match_cache_stats().
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+from agent.order import shortlist
+from agent.order.file_helper import _CUSTOMERS_FILE, _PRODUCTS_FILE
+from agent.order.prompts import GENERIC_MATCH_PROMPT
+from agent.order.shortlist import normalize
+
+logger = logging.getLogger(__name__)
+
+MATCH_CACHE_PATH = os.getenv("ORDER_MATCH_CACHE_PATH", "match_cache.sqlite3")
+MATCH_CACHE_MAX_ROWS = int(os.getenv("ORDER_MATCH_CACHE_MAX_ROWS", "50000"))
+MATCH_CACHE_MAX_AGE_S = float(os.getenv("ORDER_MATCH_CACHE_MAX_AGE_S", str(14 * 24 * 3600)))
+MIN_CACHED_CONFIDENCE = 0.8  # same bar core.py applies before accepting a match
+EVICT_EVERY = 256  # stores between size checks
+TOUCH_AFTER_S = 60.0  # refresh last_used of a hit at most this often
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS match_cache (
+    entity_type TEXT NOT NULL,
+    span TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    version TEXT NOT NULL,
+    result TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (entity_type, span, scope, version)
+);
+CREATE INDEX IF NOT EXISTS match_cache_last_used ON match_cache (last_used);
+"""
+
+
+# ----------------------------------------------------------------------
+# catalog version
+# ----------------------------------------------------------------------
+@lru_cache(maxsize=None)
+def _files_digest() -> str:
+    # once per process: the catalogs are loaded once, at import of file_helper
+    h = hashlib.blake2b(digest_size=6)
+    for path in (_CUSTOMERS_FILE, _PRODUCTS_FILE):
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def _matcher_digest() -> str:
+    settings = f"{shortlist.SHORTLIST_K}|{shortlist.AUTO_MATCH_RULE}"
+    return hashlib.blake2b((GENERIC_MATCH_PROMPT + settings).encode("utf-8"), digest_size=4).hexdigest()
+
+
+def catalog_version(entity_type: str) -> str:
+    return f"{_files_digest()}.{_matcher_digest()}"
+
+
+# ----------------------------------------------------------------------
+# sqlite store
+# ----------------------------------------------------------------------
+_local = threading.local()
+_stats_lock = threading.Lock()
+_stats: Dict[str, int] = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0, "errors": 0}
+_stores_since_evict = 0
+
+
+def _bump(key: str, n: int = 1) -> None:
+    with _stats_lock:
+        _stats[key] += n
+
+
+def _conn() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(MATCH_CACHE_PATH, timeout=2.0, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        _local.conn = conn
+    return conn
+
+
+def _maybe_evict(conn: sqlite3.Connection) -> None:
+    global _stores_since_evict
+    with _stats_lock:
+        _stores_since_evict += 1
+        if _stores_since_evict < EVICT_EVERY:
+            return
+        _stores_since_evict = 0
+    # rows unused for a long time (e.g. of a catalog version no process uses any more)
+    cur = conn.execute("DELETE FROM match_cache WHERE last_used < ?", (time.time() - MATCH_CACHE_MAX_AGE_S,))
+    if cur.rowcount:
+        _bump("expired", cur.rowcount)
+    (rows,) = conn.execute("SELECT COUNT(*) FROM match_cache").fetchone()
+    excess = rows - MATCH_CACHE_MAX_ROWS
+    if excess > 0:
+        conn.execute(
+            "DELETE FROM match_cache WHERE rowid IN "
+            "(SELECT rowid FROM match_cache ORDER BY last_used LIMIT ?)",
+            (excess,),
+        )
+        _bump("evictions", excess)
+
+
+def get(entity_type: str, span: str, scope: str = "") -> Optional[Dict[str, Any]]:
+    """Cached match result for the span under the current catalog version, else None."""
+    key = normalize(span)
+    if not key:
+        return None
+    try:
+        version = catalog_version(entity_type)
+        conn = _conn()
+        row = conn.execute(
+            "SELECT result, last_used FROM match_cache "
+            "WHERE entity_type = ? AND span = ? AND scope = ? AND version = ?",
+            (entity_type, key, scope, version),
+        ).fetchone()
+        if row is None:
+            _bump("misses")
+            return None
+        now = time.time()
+        if now - row[1] >= TOUCH_AFTER_S:
+            conn.execute(
+                "UPDATE match_cache SET last_used = ?, hits = hits + 1 "
+                "WHERE entity_type = ? AND span = ? AND scope = ? AND version = ?",
+                (now, entity_type, key, scope, version),
+            )
+        _bump("hits")
+        return json.loads(row[0])
+    except Exception as e:
+        _bump("errors")
+        logger.warning("match cache: lookup failed: %s", e)
+        return None
+
+
+def put(entity_type: str, span: str, result: Any, scope: str = "") -> None:
+    """Store a confident match result (anything else is ignored)."""
+    key = normalize(span)
+    if not key or not isinstance(result, dict) or not result.get("matched_name"):
+        return
+    try:
+        # model output: "confidence" may be anything ("high", null, ...)
+        confidence = float(result.get("confidence", 0) or 0)
+    except (TypeError, ValueError):
+        return
+    if confidence < MIN_CACHED_CONFIDENCE:
+        return
+    try:
+        version = catalog_version(entity_type)
+        conn = _conn()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO match_cache (entity_type, span, scope, version, result, created_at, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (entity_type, key, scope, version, json.dumps(result, ensure_ascii=False), now, now),
+        )
+        _bump("stores")
+        _maybe_evict(conn)
+    except Exception as e:
+        _bump("errors")
+        logger.warning("match cache: store failed: %s", e)
+
+
+def match_cache_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        out: Dict[str, Any] = dict(_stats)
+    lookups = out["hits"] + out["misses"]
+    out["hit_rate"] = round(out["hits"] / lookups, 3) if lookups else 0.0
+    try:
+        out["rows"] = _conn().execute("SELECT COUNT(*) FROM match_cache").fetchone()[0]
+    except Exception:
+        out["rows"] = None
+    return out
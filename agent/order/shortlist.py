@@ -0,0 +1,261 @@
+# agent/order/shortlist.py
+"""
+Local candidate generator for order entity matching (customers / products).
+
+match_agent.match_entity used to send the whole catalog (CUSTOMERS_STRING,
+PRODUCTS_STRING) to the model for every span. The CatalogIndex here narrows
+that to the top-K names first, with rapidfuzz (token-set prefilter, WRatio
+rescoring) over keys pre-derived once per catalog entry:
+
+  - normalized text: niqqud, geresh / gershayim, quotes and punctuation
+    removed, final letters folded (ם -> מ ...), whitespace collapsed
+    ("כשל\"פ" == "כשלפ", "4.6" == "4-6" == "4 6")
+  - consonant skeleton: normalized text without the inner matres lectionis
+    (א ו י ה), so "אורופאק" == "אורופק"
+  - phonetic key of a Latin transliteration, for spans typed in English
+    letters ("eurofak" -> same key as "אורופק")
+
+Aliases (the global mappings of agent/order/alias_index) and extra surface
+forms ("name city" for customers) are indexed as additional keys of the same
+canonical name. The index is rebuilt when the alias collection's version
+changes, so learned and deleted aliases take effect on the next lookup.
+
+The skeleton and phonetic keys only rank the shortlist: they conflate real,
+different names ("חסן" / "חוסין", "דניאל" / "דניאלי"). `decide()` resolves a
+span without the LLM only when its normalized text is exactly one indexed
+form of one name and no other name contains all of its words ("רכלבסקי" with
+three "רכלבסקי ..." customers, "בסיס מארז" next to "בסיס מארז קטן / גדול"
+go to the LLM). Everything else goes to the LLM with the shortlist as its
+LIST.
+"""
+from __future__ import annotations
+
+import os
+import re
+import threading
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+from rapidfuzz import fuzz, process
+
+SHORTLIST_K = int(os.getenv("ORDER_SHORTLIST_K", "15"))
+AUTO_MATCH_RULE = "exact-unique"  # part of the match cache version: change it when decide() changes
+MIN_SCORE = 30.0  # below this a key is noise, not a candidate
+
+_NIQQUD = re.compile(r"[\u0591-\u05bd\u05bf-\u05c7]")  # cantillation + vowel points (not maqaf)
+_FINALS = str.maketrans("ךםןףץ", "כמנפצ")
+_PUNCT = re.compile(r"[^\w\s]|_")
+_SPACES = re.compile(r"\s+")
+_MATRES = "אויה"
+
+# Hebrew letter -> Latin consonant class; vowels-only letters map to ""
+_HEB_TO_LATIN = {
+    "א": "", "ב": "b", "ג": "g", "ד": "d", "ה": "", "ו": "", "ז": "z", "ח": "k",
+    "ט": "t", "י": "", "כ": "k", "ל": "l", "מ": "m", "נ": "n", "ס": "s", "ע": "",
+    "פ": "p", "צ": "s", "ק": "k", "ר": "r", "ש": "s", "ת": "t",
+}
+# Latin digraphs / letters folded onto the same consonant classes
+_LATIN_DIGRAPHS = (("sh", "s"), ("ch", "k"), ("kh", "k"), ("tz", "s"), ("ts", "s"), ("th", "t"), ("ph", "p"))
+_LATIN_FOLD = str.maketrans({"f": "p", "v": "b", "w": "b", "c": "k", "q": "k", "x": "k", "j": "g"})
+_LATIN_VOWELS = re.compile(r"[aeiouyh]")
+_HAS_HEBREW = re.compile(r"[\u05d0-\u05ea]")
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFC", text or "")
+    text = _NIQQUD.sub("", text).translate(_FINALS).casefold()
+    text = text.replace("׳", "").replace("״", "").replace("'", "").replace('"', "")
+    return _SPACES.sub(" ", _PUNCT.sub(" ", text)).strip()
+
+
+def skeleton(norm: str) -> str:
+    """Drop inner matres lectionis from each word of a normalized string."""
+    return " ".join(w[0] + "".join(ch for ch in w[1:] if ch not in _MATRES) if w else w for w in norm.split())
+
+
+def phonetic(norm: str) -> str:
+    """Script-independent consonant key of a normalized string (Hebrew or Latin)."""
+    if _HAS_HEBREW.search(norm):
+        return "".join(_HEB_TO_LATIN.get(ch, ch) for ch in norm)
+    for digraph, repl in _LATIN_DIGRAPHS:
+        norm = norm.replace(digraph, repl)
+    return _LATIN_VOWELS.sub("", norm.translate(_LATIN_FOLD))
+
+
+@dataclass(frozen=True)
+class Candidate:
+    name: str
+    score: float  # 0..100
+
+
+class CatalogIndex:
+    """Pre-normalized fuzzy index over one catalog: canonical name -> extra surface forms."""
+
+    def __init__(self, entries: Mapping[str, Iterable[str]]):
+        self.names: List[str] = []
+        self.ids: Dict[str, int] = {}
+        self._forms: Set[Tuple[int, str]] = set()
+        self.exact: Dict[str, int] = {}
+        self._exact_conflicts: Set[str] = set()  # forms shared by several names
+        self._tokens: Dict[str, Set[int]] = {}  # word -> names with a form containing it
+        # one parallel (keys, owner index) list per key kind
+        self._keys: Dict[str, Tuple[List[str], List[int]]] = {"norm": ([], []), "skel": ([], []), "phon": ([], [])}
+        for name, forms in entries.items():
+            self.add(name, forms)
+
+    def add(self, name: str, forms: Iterable[str] = ()) -> None:
+        """Index `name` (or more surface forms of an already indexed name)."""
+        i = self.ids.get(name)
+        if i is None:
+            i = self.ids[name] = len(self.names)
+            self.names.append(name)
+        for form in {name, *forms}:
+            norm = normalize(form)
+            if not norm or (i, norm) in self._forms:
+                continue
+            self._forms.add((i, norm))
+            if self.exact.setdefault(norm, i) != i:
+                self._exact_conflicts.add(norm)
+            for token in norm.split():
+                self._tokens.setdefault(token, set()).add(i)
+            for kind, key in (("norm", norm), ("skel", skeleton(norm)), ("phon", phonetic(norm))):
+                if key:
+                    keys, owners = self._keys[kind]
+                    keys.append(key)
+                    owners.append(i)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def shortlist(self, query: str, k: int = SHORTLIST_K) -> List[Candidate]:
+        """Top-k canonical names for `query`, best first (each name once, with its best key score)."""
+        norm = normalize(query)
+        if not norm:
+            return []
+        best: Dict[int, float] = {}
+        exact = self.exact.get(norm)
+        if exact is not None:
+            best[exact] = 100.0
+
+        if _HAS_HEBREW.search(norm):
+            probes = (("norm", norm), ("skel", skeleton(norm)))
+        else:
+            probes = (("norm", norm), ("phon", phonetic(norm)))
+        for kind, probe in probes:
+            keys, owners = self._keys[kind]
+            if not probe or not keys:
+                continue
+            # cheap token-set pass over the whole catalog, WRatio only on its survivors
+            hits = process.extract(
+                probe,
+                keys,
+                scorer=fuzz.token_set_ratio,
+                processor=None,
+                limit=k * 4,  # several keys per name
+                score_cutoff=MIN_SCORE,
+            )
+            for key, _, pos in hits:
+                owner = owners[pos]
+                score = fuzz.WRatio(probe, key, processor=None)
+                if score > best.get(owner, 0.0):
+                    best[owner] = score
+
+        ranked = sorted(best.items(), key=lambda t: (-t[1], t[0]))[:k]
+        return [Candidate(self.names[i], round(score, 1)) for i, score in ranked]
+
+    def containing(self, norm: str) -> Set[int]:
+        """Names having surface forms that contain every word of `norm`."""
+        sets = sorted((self._tokens.get(t, set()) for t in set(norm.split())), key=len)
+        if not sets:
+            return set()
+        out = set(sets[0])
+        for other in sets[1:]:
+            out &= other
+        return out
+
+    def decide(self, query: str) -> Optional[Candidate]:
+        """The catalog name `query` certainly means (exact and unambiguous), else None for the LLM."""
+        norm = normalize(query)
+        i = self.exact.get(norm)
+        if i is None or norm in self._exact_conflicts:
+            return None
+        if self.containing(norm) != {i}:
+            return None
+        return Candidate(self.names[i], 100.0)
+
+
+def list_text(candidates: List[Candidate]) -> str:
+    """LIST block for GENERIC_MATCH_PROMPT (one name per line, like the full catalog strings)."""
+    return "\n".join(c.name for c in candidates)
+
+
+# ----------------------------------------------------------------------
+# catalog indexes (built on first use, rebuilt when the aliases change)
+# ----------------------------------------------------------------------
+_indexes: Dict[str, Tuple[str, CatalogIndex]] = {}
+_lock = threading.Lock()
+
+
+def _alias_forms(entity_type: str) -> Dict[str, List[str]]:
+    """canonical name -> its global aliases, from the live alias index."""
+    from agent.order.alias_index import alias_index
+
+    index = alias_index()
+    forms: Dict[str, List[str]] = {}
+    if entity_type == "customer":
+        for alias, canonical in index.customer.items():
+            forms.setdefault(canonical, []).append(alias)
+    elif entity_type == "product":
+        for (alias, scope), hit in index.product.items():
+            # customer-specific overrides are not a surface form for everyone
+            if scope is None and hit.get("canonical_product_name"):
+                forms.setdefault(hit["canonical_product_name"], []).append(alias)
+    return forms
+
+
+def _alias_version(entity_type: str) -> str:
+    from agent.order.alias_index import ENTITY_COLLECTION, alias_index
+
+    return alias_index().version(ENTITY_COLLECTION[entity_type])
+
+
+def _build(entity_type: str) -> Optional[CatalogIndex]:
+    from agent.order.file_helper import CUSTOMERS, PRODUCTS
+
+    if entity_type == "customer":
+        entries: Dict[str, List[str]] = {}
+        for data in CUSTOMERS.values():
+            name = data.get("name") or ""
+            if not name:
+                continue
+            forms = entries.setdefault(name, [])
+            if data.get("address"):
+                forms.append(f"{name} {data['address']}")
+    elif entity_type == "product":
+        entries = {desc: [] for desc in PRODUCTS.values() if desc}
+    else:
+        return None
+    # only aliases of catalog names: the LIST must hold catalog entries
+    for canonical, aliases in _alias_forms(entity_type).items():
+        if canonical in entries:
+            entries[canonical].extend(aliases)
+    return CatalogIndex(entries)
+
+
+def catalog_index(entity_type: str) -> Optional[CatalogIndex]:
+    """Index for "customer" / "product" (None for entity types without a local catalog)."""
+    if entity_type not in ("customer", "product"):
+        return None
+    version = _alias_version(entity_type)
+    hit = _indexes.get(entity_type)
+    if hit is not None and hit[0] == version:
+        return hit[1]
+    with _lock:
+        hit = _indexes.get(entity_type)
+        if hit is None or hit[0] != version:
+            idx = _build(entity_type)
+            if idx is None:
+                return None
+            hit = _indexes[entity_type] = (version, idx)
+    return hit[1]
@@ -0,0 +1,234 @@
+# agent/tami/fast_router.py
+"""
+Local fast-path router in front of the router LLM.
+
+Two cheap classifiers decide high-confidence turns in microseconds:
+
+1) keyword rules (built in): weighted Hebrew/English cues per agent.
+   confidence = top score / (sum of scores + prior), so one strong cue is
+   enough, while cues for two agents ("תשלח לדנה על הפגישה") cancel out.
+2) optional character n-gram naive Bayes model, trained offline from the
+   Langfuse evaluation dataset (evaluation/fast_router_eval.py) and loaded
+   from TAMI_FAST_ROUTER_MODEL if that file exists.
+
+Below TAMI_FAST_ROUTER_THRESHOLD the caller falls back to the LLM. Every
+decision is counted (fast_router_stats) and logged.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+AGENTS = ("tasks", "events", "comms")
+FAST_ROUTER_THRESHOLD = float(os.getenv("TAMI_FAST_ROUTER_THRESHOLD", "0.8"))
+FAST_ROUTER_MODEL_PATH = os.getenv("TAMI_FAST_ROUTER_MODEL", "tami_fast_router.json")
+FAST_ROUTER_ENABLED = os.getenv("TAMI_FAST_ROUTER", "1") == "1"
+
+_RULE_PRIOR = 0.5
+
+# (pattern, weight): 3 = decisive cue, 1 = weak hint
+RULES: Dict[str, List[Tuple[str, float]]] = {
+    "tasks": [
+        (r"משימ(ה|ות|ת)", 3),
+        (r"מטל(ה|ות)", 3),
+        (r"\bto ?do\b|\btasks?\b", 3),
+        (r"רשימת (ה)?(משימות|מטלות|דברים)", 3),
+        (r"(סמן|תסמן|סמני).{0,15}(בוצע|הושלם|כבוצע)", 3),
+        (r"\bבוצע\b|\bהושלם\b", 1),
+        (r"\bצריך ל", 1),
+    ],
+    "events": [
+        (r"פגיש(ה|ות|ת)", 3),
+        (r"(ב|ל|מה)?יומן", 3),
+        (r"\bאירוע(ים)?\b", 3),
+        (r"(תקבע|לקבוע|קבע|קבעי|תזמן) (לי )?(פגישה|תור|שיחה|אירוע)", 3),
+        (r"\bתור (ל|אצל)", 3),
+        (r"\bזימון\b", 3),
+        (r"\b(meeting|calendar|appointment|event)s?\b", 3),
+        (r"\bתקבע\b|\bלקבוע\b", 1),
+    ],
+    "comms": [
+        (r"\b(תשלח|שלח|שלחי|תשלחי|לשלוח)\b", 3),
+        (r"\b(תכתוב|תכתבי|כתוב|תודיע|תודיעי|תעדכן|תעדכני) ל", 3),
+        (r"\bהודע(ה|ות)\b", 1),
+        (r"וו?טסאפ|וואטסאפ|\bwhatsapp\b", 3),
+        (r"מה (הוא |היא |הם )?(כתב|כתבה|כתבו|שלח|שלחה|שלחו|כתבתי|שלחתי)", 3),
+        (r"\bבקבוצ(ה|ת)\b|\bבצ'?אט\b|בשיחה עם", 3),
+        (r"\bתזכיר(י)? לי בעוד\b", 3),
+        (r"\bתזכיר(י)? לי\b", 1),
+    ],
+}
+_COMPILED = {agent: [(re.compile(p, re.IGNORECASE), w) for p, w in rules] for agent, rules in RULES.items()}
+
+_NIQQUD = re.compile(r"[֑-ׇ]")
+_NON_WORD = re.compile(r"[^\w\s']+", re.UNICODE)
+
+
+def normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFC", text or "")
+    text = _NIQQUD.sub("", text)
+    text = _NON_WORD.sub(" ", text).casefold()
+    return " ".join(text.split())
+
+
+@dataclass
+class RouteDecision:
+    agent: str
+    confidence: float
+    source: str                 # "rules" | "model"
+    scores: Dict[str, float]
+
+
+# ----------------------------------------------------------------------
+# keyword rules
+# ----------------------------------------------------------------------
+def rule_scores(text: str) -> Dict[str, float]:
+    norm = normalize_text(text)
+    return {
+        agent: sum(w for rx, w in rules if rx.search(norm))
+        for agent, rules in _COMPILED.items()
+    }
+
+
+def route_by_rules(text: str) -> Optional[RouteDecision]:
+    scores = rule_scores(text)
+    agent, top = max(scores.items(), key=lambda kv: kv[1])
+    if top <= 0:
+        return None
+    confidence = top / (sum(scores.values()) + _RULE_PRIOR)
+    return RouteDecision(agent, round(confidence, 3), "rules", scores)
+
+
+# ----------------------------------------------------------------------
+# char n-gram naive Bayes
+# ----------------------------------------------------------------------
+def char_ngrams(text: str, n_min: int = 2, n_max: int = 4) -> List[str]:
+    padded = f" {normalize_text(text)} "
+    return [padded[i:i + n] for n in range(n_min, n_max + 1) for i in range(len(padded) - n + 1)]
+
+
+class NgramNB:
+    def __init__(self, priors: Dict[str, float], log_probs: Dict[str, Dict[str, float]], unk: Dict[str, float]):
+        self.priors = priors
+        self.log_probs = log_probs
+        self.unk = unk
+
+    @classmethod
+    def train(cls, samples: Iterable[Tuple[str, str]], alpha: float = 0.5) -> "NgramNB":
+        counts: Dict[str, Counter] = {a: Counter() for a in AGENTS}
+        docs: Counter = Counter()
+        for text, label in samples:
+            if label not in counts:
+                continue
+            docs[label] += 1
+            counts[label].update(char_ngrams(text))
+        vocab = set().union(*counts.values())
+        n_docs = sum(docs.values()) or 1
+        priors, log_probs, unk = {}, {}, {}
+        for agent in AGENTS:
+            total = sum(counts[agent].values()) + alpha * (len(vocab) + 1)
+            priors[agent] = math.log((docs[agent] + 1) / (n_docs + len(AGENTS)))
+            log_probs[agent] = {g: math.log((c + alpha) / total) for g, c in counts[agent].items()}
+            unk[agent] = math.log(alpha / total)
+        return cls(priors, log_probs, unk)
+
+    def predict(self, text: str) -> RouteDecision:
+        grams = char_ngrams(text)
+        logits = {
+            a: self.priors[a] + sum(self.log_probs[a].get(g, self.unk[a]) for g in grams)
+            for a in AGENTS
+        }
+        m = max(logits.values())
+        exp = {a: math.exp(v - m) for a, v in logits.items()}
+        z = sum(exp.values())
+        probs = {a: v / z for a, v in exp.items()}
+        agent = max(probs, key=probs.get)
+        return RouteDecision(agent, round(probs[agent], 3), "model", probs)
+
+    def to_json(self) -> dict:
+        return {"priors": self.priors, "log_probs": self.log_probs, "unk": self.unk}
+
+    @classmethod
+    def from_json(cls, data: dict) -> "NgramNB":
+        return cls(data["priors"], data["log_probs"], data["unk"])
+
+
+_model: Optional[NgramNB] = None
+_model_loaded = False
+
+
+def load_model(path: str = FAST_ROUTER_MODEL_PATH) -> Optional[NgramNB]:
+    global _model, _model_loaded
+    if not _model_loaded:
+        _model_loaded = True
+        if os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    _model = NgramNB.from_json(json.load(f))
+                logger.info("fast router: loaded n-gram model from %s", path)
+            except Exception:
+                logger.exception("fast router: failed to load %s", path)
+    return _model
+
+
+# ----------------------------------------------------------------------
+# public API
+# ----------------------------------------------------------------------
+_stats_lock = threading.Lock()
+_stats: Dict[str, float] = Counter()
+
+
+def classify(text: str) -> Optional[RouteDecision]:
+    """Best local decision (rules first, then the n-gram model if present)."""
+    decision = route_by_rules(text)
+    model = load_model()
+    if model is not None and (decision is None or decision.confidence < FAST_ROUTER_THRESHOLD):
+        candidate = model.predict(text)
+        if decision is None or candidate.confidence > decision.confidence:
+            decision = candidate
+    return decision
+
+
+def fast_route(text: str, threshold: float = FAST_ROUTER_THRESHOLD) -> Optional[RouteDecision]:
+    """A confident local decision, or None (= ask the LLM)."""
+    if not FAST_ROUTER_ENABLED:
+        return None
+    start = time.perf_counter()
+    decision = classify(text)
+    elapsed_us = (time.perf_counter() - start) * 1e6
+    hit = decision is not None and decision.confidence >= threshold
+    with _stats_lock:
+        _stats["calls"] += 1
+        _stats["fast_hits" if hit else "llm_fallbacks"] += 1
+        _stats["classify_us_total"] += elapsed_us
+        if hit:
+            _stats[f"hits.{decision.source}.{decision.agent}"] += 1
+    logger.info(
+        "fast router: %s (conf=%s, source=%s, %.0fus)",
+        decision.agent if hit else "-> llm",
+        decision.confidence if decision else None,
+        decision.source if decision else None,
+        elapsed_us,
+    )
+    return decision if hit else None
+
+
+def fast_router_stats() -> Dict[str, float]:
+    with _stats_lock:
+        out = dict(_stats)
+    calls = out.get("calls", 0)
+    if calls:
+        out["fallback_rate"] = round(out.get("llm_fallbacks", 0) / calls, 3)
+        out["classify_us_avg"] = round(out.get("classify_us_total", 0) / calls, 1)
+    return out
@@ -3,12 +3,15 @@
 from typing import Literal
 from langgraph.graph import StateGraph, END
 from langgraph.checkpoint.memory import MemorySaver
+from context.windowed_sqlite_saver import build_tami_checkpointer
 from agent.linear_flow.state import LinearAgentState
 
 from agent.tami.tasks.main import build_tasks_agent_graph
 from agent.tami.events.main import build_events_agent_graph
 from agent.tami.comms.main import build_comms_agent_graph
-from agent.tami.router_graph import route_node
+from agent.tami.router_graph import route_node, aroute_node
+from agent.tami.speculative import SPECULATIVE_PLANNER, aspeculative_route_node
+from langchain_core.runnables import RunnableLambda
 from langgraph.types import Command, Interrupt
 
 def postprocess_node(state: LinearAgentState) -> LinearAgentState:
@@ -22,10 +25,66 @@ from typing import Any, Dict, Optional
 from langgraph.types import Command, Interrupt
 
 from observability.obs import span_step
+from observability.ledger import open_turn_ledger, finish_turn
+from datetime import datetime, timezone
 
 def handle_tami_turn(app, thread_id, user_message, base_state=None):
-    with span_step("tami_turn", kind="agent_turn"):
-        return _handle_tami_turn_internal(app, thread_id, user_message, base_state)
+    with open_turn_ledger(thread_id, *_ledger_identity(base_state)) as ledger:
+        with span_step("tami_turn", kind="agent_turn"):
+            result = _handle_tami_turn_internal(app, thread_id, user_message, base_state)
+        return _attach_ledger(result, ledger)
+
+
+async def ahandle_tami_turn(app, thread_id, user_message, base_state=None):
+    with open_turn_ledger(thread_id, *_ledger_identity(base_state)) as ledger:
+        with span_step("tami_turn", kind="agent_turn"):
+            result = await _ahandle_tami_turn_internal(app, thread_id, user_message, base_state)
+        return _attach_ledger(result, ledger)
+
+
+def _ledger_identity(base_state: Optional[Dict[str, Any]]) -> tuple:
+    """(user_id, queue_wait_ms) of the turn: wait = now - message received_at."""
+    ctx = (base_state or {}).get("context") or {}
+    queue_wait_ms = 0.0
+    received_at = ctx.get("received_at")
+    try:
+        if isinstance(received_at, str):
+            received_at = datetime.fromisoformat(received_at.replace("Z", "+00:00"))
+        if isinstance(received_at, datetime) and received_at.tzinfo is not None:
+            queue_wait_ms = max(0.0, (datetime.now(timezone.utc) - received_at).total_seconds() * 1000)
+    except ValueError:
+        pass
+    return ctx.get("user_id"), queue_wait_ms
+
+
+def _attach_ledger(result: Dict[str, Any], ledger) -> Dict[str, Any]:
+    """Finish the turn ledger and return it with the turn state (state['turn_ledger'])."""
+    state = result.get("state")
+    agent = state.get("target_agent") if isinstance(state, dict) else None
+    entry = finish_turn(ledger, agent=agent, status=result.get("status"))
+    if isinstance(state, dict):
+        state["turn_ledger"] = entry
+    return result
+
+
+def _normalize_turn_result(result: Any, interrupts: tuple) -> Dict[str, Any]:
+    if isinstance(result, dict) and result.get("__interrupt__"):
+        intr = interrupts[0] if interrupts else None
+
+        return {
+            "status": "interrupt",
+            "interrupt": intr,
+            "interrupts": interrupts,
+            "state": result,
+        }
+
+    # Plain state
+    return {
+        "status": "ok",
+        "interrupt": None,
+        "interrupts": None,
+        "state": result,
+    }
 
 
 def _handle_tami_turn_internal(
@@ -66,31 +125,59 @@ def _handle_tami_turn_internal(
     # -------------------------------------------------
     # Normalize return: interrupt vs plain state
     # -------------------------------------------------
+    interrupts = ()
     if isinstance(result, dict) and result.get("__interrupt__"):
         # Get the latest interrupts from checkpoint
         snapshot = app.get_state(config)
-        interrupts = ()
         if snapshot is not None:
             interrupts = getattr(snapshot, "interrupts", ()) or ()
-        intr = interrupts[0] if interrupts else None
 
-        return {
-            "status": "interrupt",
-            "interrupt": intr,
-            "interrupts": interrupts,
-            "state": result,
-        }
+    return _normalize_turn_result(result, interrupts)
 
-    # Plain state
-    return {
-        "status": "ok",
-        "interrupt": None,
-        "interrupts": None,
-        "state": result,
-    }
 
+async def _ahandle_tami_turn_internal(
+    app,
+    thread_id: str,
+    user_message: Any,
+    base_state: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Async twin of _handle_tami_turn_internal (ainvoke / aget_state).
+    Same return shape.
+    """
+    config = {"configurable": {"thread_id": thread_id}}
+    snapshot = await app.aget_state(config)
+
+    interrupts: tuple[Interrupt, ...] = ()
+    if snapshot is not None:
+        interrupts = getattr(snapshot, "interrupts", ()) or ()
+
+    if interrupts:
+        resume_value = {"content": str(user_message)}
+        result = await app.ainvoke(Command(resume=resume_value), config=config)
+    else:
+        state: Dict[str, Any] = dict(base_state or {})
+        state["input_text"] = str(user_message)
+        result = await app.ainvoke(state, config=config)
+
+    interrupts = ()
+    if isinstance(result, dict) and result.get("__interrupt__"):
+        snapshot = await app.aget_state(config)
+        if snapshot is not None:
+            interrupts = getattr(snapshot, "interrupts", ()) or ()
+
+    return _normalize_turn_result(result, interrupts)
+
+
+def build_tami_router_app(checkpointer=None, speculative: Optional[bool] = None):
+    """
+    speculative: start the planners of the top-2 candidate agents while the
+    router LLM runs (async turns only, see agent/tami/speculative.py).
+    Defaults to TAMI_SPECULATIVE_PLANNER.
+    """
+    if speculative is None:
+        speculative = SPECULATIVE_PLANNER
 
-def build_tami_router_app():
     # Get uncompiled graphs
     tasks_graph = build_tasks_agent_graph()
     events_graph = build_events_agent_graph()
@@ -100,7 +187,10 @@ def build_tami_router_app():
     builder = StateGraph(LinearAgentState)
 
     # 1. Router + postprocess
-    builder.add_node("route", route_node)
+    builder.add_node(
+        "route",
+        RunnableLambda(route_node, afunc=aspeculative_route_node if speculative else aroute_node, name="route"),
+    )
     builder.add_node("postprocess", postprocess_node)
 
     # 2. Subgraphs as nodes (uncompiled graphs)
@@ -133,7 +223,9 @@ def build_tami_router_app():
     builder.add_edge("comms_agent", "postprocess")
     builder.add_edge("postprocess", END)
 
-    # 6. Single shared checkpointer for the whole system
-    checkpointer = MemorySaver()
+    # 6. Single shared checkpointer for the whole system:
+    #    SQLite-backed, last K checkpoints per thread, LRU hot cache
+    if checkpointer is None:
+        checkpointer = build_tami_checkpointer()
     app = builder.compile(checkpointer=checkpointer)
     return app
@@ -1,5 +1,5 @@
 from models.input import In
-from agent.tami.graph import build_tami_router_app, handle_tami_turn
+from agent.tami.graph import build_tami_router_app, handle_tami_turn, ahandle_tami_turn
 from agent.linear_flow.state import LinearAgentState
 import time
 from datetime import datetime
@@ -13,9 +13,7 @@ def to_iso(dt):
 app = build_tami_router_app()
 
 
-def process_input(inp: In) -> str:
-    start_time = time.time()
-
+def _build_state(inp: In) -> LinearAgentState:
     # -----------------------------
     # Build base LinearAgentState
     # -----------------------------
@@ -42,16 +40,10 @@ def process_input(inp: In) -> str:
             "redacted": inp.redacted,
         },
     }
+    return state
 
-    # -----------------------------
-    # Run Tami turn
-    # -----------------------------
-    result = handle_tami_turn(app, inp.thread_id, inp.text, base_state=state)
-    end_time = time.time()
-    print(f"turn took {end_time - start_time:.2f}s")
-
-    #print("result:", result)
 
+def _outgoing_message(result: dict) -> str:
     status = result.get("status")
     graph_state = result.get("state") or {}
 
@@ -100,6 +92,42 @@ def process_input(inp: In) -> str:
     return outgoing
 
 
+def _ledger_line(result: dict) -> str:
+    ledger = (result.get("state") or {}).get("turn_ledger") or {}
+    return (
+        f"(llm_calls={len(ledger.get('llm_calls') or [])}, "
+        f"prompt={ledger.get('prompt_tokens', 0)} cached={ledger.get('cached_tokens', 0)} "
+        f"completion={ledger.get('completion_tokens', 0)}, cost=${ledger.get('cost_usd', 0.0):.4f})"
+    )
+
+
+def process_input(inp: In) -> str:
+    start_time = time.time()
+    state = _build_state(inp)
+
+    # -----------------------------
+    # Run Tami turn
+    # -----------------------------
+    result = handle_tami_turn(app, inp.thread_id, inp.text, base_state=state)
+    end_time = time.time()
+    print(f"turn took {end_time - start_time:.2f}s {_ledger_line(result)}")
+
+    #print("result:", result)
+    return _outgoing_message(result)
+
+
+async def aprocess_input(inp: In) -> str:
+    """Async twin of process_input: awaits the graph (ainvoke) instead of blocking."""
+    start_time = time.time()
+    state = _build_state(inp)
+
+    result = await ahandle_tami_turn(app, inp.thread_id, inp.text, base_state=state)
+    end_time = time.time()
+    print(f"turn took {end_time - start_time:.2f}s {_ledger_line(result)}")
+
+    return _outgoing_message(result)
+
+
 if __name__ == "__main__":
     msg = process_input(
         In(
@@ -4,7 +4,6 @@ import json
 from typing import Literal
 from langgraph.graph import StateGraph, END
 from langgraph.checkpoint.memory import MemorySaver
-from openai import OpenAI
 
 from agent.linear_flow.state import LinearAgentState
 from agent.tami.router_prompt import ROUTER_SYSTEM_PROMPT
@@ -12,8 +11,48 @@ from agent.tami.router_prompt import ROUTER_SYSTEM_PROMPT
 from agent.tami.tasks.main import build_tasks_agent_graph
 from agent.tami.events.main import build_events_agent_graph
 from agent.tami.comms.main import build_comms_agent_graph
+from shared.llm_gateway import gateway
+from agent.tami.fast_router import fast_route
 
-client = OpenAI()  # or reuse your existing client
+ROUTER_MODEL = "gpt-4.1-mini"  # or whatever you're using
+
+
+def _followup_target(state: LinearAgentState):
+    """Deterministic handling for follow-up answers: stay on the previous agent."""
+    if state.get("is_followup_question", False):
+        print("Follow-up question detected, target agent is", state.get("target_agent", "tasks"))
+        prev_agent = state.get("target_agent", "tasks")
+        if prev_agent in ("tasks", "events", "comms"):
+            return prev_agent
+        # if somehow weird, still fall through to LLM with default
+    return None
+
+
+def _router_messages(input_text: str) -> list:
+    return [
+        {"role": "system", "content": ROUTER_SYSTEM_PROMPT},
+        {"role": "user", "content": input_text},
+    ]
+
+
+def _parse_target(content: str) -> Literal["tasks", "events", "comms"]:
+    data = json.loads(content)
+
+    target = data.get("target_agent", "tasks")
+    if target not in ("tasks", "events", "comms"):
+        target = "tasks"
+    return target  # type: ignore[return-value]
+
+
+async def arouter_llm_call(input_text: str) -> Literal["tasks", "events", "comms"]:
+    """The router LLM call alone (no follow-up / fast-path shortcuts)."""
+    resp = await gateway.achat(
+        model=ROUTER_MODEL,
+        tag="router",
+        response_format={"type": "json_object"},
+        messages=_router_messages(input_text),
+    )
+    return _parse_target(resp.choices[0].message.content)
 
 
 def llm_route(input_text: str, state: LinearAgentState) -> Literal["tasks", "events", "comms"]:
@@ -22,30 +61,42 @@ def llm_route(input_text: str, state: LinearAgentState) -> Literal["tasks", "eve
     Falls back to "tasks" on any error.
     """
     try:
-        is_followup_question = state.get("is_followup_question", False)
-
         # --- 1) Deterministic handling for follow-up answers ---
-        if is_followup_question:
-            print("Follow-up question detected, target agent is", state.get("target_agent", "tasks"))
-            prev_agent = state.get("target_agent", "tasks")
-            if prev_agent in ("tasks", "events", "comms"):
-                return prev_agent  # type: ignore[return-value]
-            # if somehow weird, still fall through to LLM with default
-        resp = client.chat.completions.create(
-            model="gpt-4.1-mini",  # or whatever you're using
+        prev_agent = _followup_target(state)
+        if prev_agent:
+            return prev_agent  # type: ignore[return-value]
+
+        # --- 2) Local fast path: confident keyword/n-gram decisions skip the LLM ---
+        fast = fast_route(input_text)
+        if fast:
+            return fast.agent  # type: ignore[return-value]
+
+        resp = gateway.chat(
+            model=ROUTER_MODEL,
+            tag="router",
             response_format={"type": "json_object"},
-            messages=[
-                {"role": "system", "content": ROUTER_SYSTEM_PROMPT},
-                {"role": "user", "content": input_text},
-            ],
+            messages=_router_messages(input_text),
         )
-        content = resp.choices[0].message.content
-        data = json.loads(content)
+        return _parse_target(resp.choices[0].message.content)
+
+    except Exception:
+        # conservative fallback
+        return "tasks"  # type: ignore[return-value]
+
+
+async def allm_route(input_text: str, state: LinearAgentState) -> Literal["tasks", "events", "comms"]:
+    """Async variant of llm_route."""
+    try:
+        prev_agent = _followup_target(state)
+        if prev_agent:
+            return prev_agent  # type: ignore[return-value]
+
+        # --- 2) Local fast path: confident keyword/n-gram decisions skip the LLM ---
+        fast = fast_route(input_text)
+        if fast:
+            return fast.agent  # type: ignore[return-value]
 
-        target = data.get("target_agent", "tasks")
-        if target not in ("tasks", "events", "comms"):
-            target = "tasks"
-        return target  # type: ignore[return-value]
+        return await arouter_llm_call(input_text)
 
     except Exception:
         # conservative fallback
@@ -68,3 +119,12 @@ def route_node(state: LinearAgentState) -> LinearAgentState:
     # state.setdefault("context", {})["routing_reason"] = data.get("reason")
 
     return state
+
+
+async def aroute_node(state: LinearAgentState) -> LinearAgentState:
+    """
+    Async variant of route_node.
+    """
+    text = state.get("input_text", "") or ""
+    state["target_agent"] = await allm_route(text, state)
+    return state
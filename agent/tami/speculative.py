@@ -0,0 +1,178 @@
+# agent/tami/speculative.py
+"""
+Speculative planner execution for uncertain routes (async path only).
+
+When neither the follow-up rule nor the local fast router decides a turn, the
+router LLM runs and the planner of the chosen agent waits for it. In
+speculative mode the planner LLM calls of the two most likely agents (ranked
+by fast_router.classify scores) start together with the router call:
+
+    router LLM  ─────────────┐
+    planner(tasks)  ───────┐ ├─> winner's plan kept in state["speculative_plan"]
+    planner(events) ───x   │ │   loser cancelled (or its answer discarded)
+
+Only the planner LLM call is speculative: ingest runs on a deep copy of the
+state, and the real planner node accepts the plan only if it is for the routed
+agent and for exactly the llm_messages the real ingest produced
+(message_assembly.fingerprint). Tools never run before routing is decided.
+
+Enable with TAMI_SPECULATIVE_PLANNER=1 (or build_tami_router_app(speculative=True)).
+Hit rate and the spend of discarded plans are in speculation_stats().
+"""
+from __future__ import annotations
+
+import asyncio
+import copy
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from agent.linear_flow.history import needs_compaction
+from agent.linear_flow.message_assembly import fingerprint
+from agent.linear_flow.nodes.ingest_node import make_ingest_node
+from agent.linear_flow.nodes.planner_llm_node import _request_kwargs
+from agent.linear_flow.state import LinearAgentState
+from agent.tami.comms.main import system_prompt as COMMS_PLANNER_PROMPT
+from agent.tami.events.main import system_prompt as EVENTS_PLANNER_PROMPT
+from agent.tami.fast_router import AGENTS, classify, fast_route
+from agent.tami.router_graph import _followup_target, arouter_llm_call
+from agent.tami.tasks.main import system_prompt as TASKS_PLANNER_PROMPT
+from observability.obs import span_step
+from shared.llm_gateway import gateway
+
+logger = logging.getLogger(__name__)
+
+SPECULATIVE_PLANNER = os.getenv("TAMI_SPECULATIVE_PLANNER", "0") == "1"
+SPECULATION_WIDTH = 2
+
+_INGEST = {
+    "tasks": make_ingest_node(TASKS_PLANNER_PROMPT),
+    "events": make_ingest_node(EVENTS_PLANNER_PROMPT),
+    "comms": make_ingest_node(COMMS_PLANNER_PROMPT),
+}
+
+
+def candidate_agents(text: str, k: int = SPECULATION_WIDTH) -> List[str]:
+    """The k most likely agents by local classifier scores (ties keep AGENTS order)."""
+    decision = classify(text)
+    scores = decision.scores if decision else {}
+    return sorted(AGENTS, key=lambda a: -scores.get(a, 0.0))[:k]
+
+
+# ----------------------------------------------------------------------
+# stats
+# ----------------------------------------------------------------------
+_stats_lock = threading.Lock()
+_stats: Dict[str, float] = {
+    "speculations": 0,
+    "hits": 0,
+    "misses": 0,
+    "planner_calls": 0,
+    "cancelled": 0,
+    "wasted_prompt_tokens": 0,
+    "wasted_completion_tokens": 0,
+    "hit_wait_ms_total": 0.0,
+}
+
+
+def _bump(**deltas: float) -> None:
+    with _stats_lock:
+        for key, value in deltas.items():
+            _stats[key] += value
+
+
+def speculation_stats() -> Dict[str, float]:
+    with _stats_lock:
+        out = dict(_stats)
+    if out["speculations"]:
+        out["hit_rate"] = round(out["hits"] / out["speculations"], 3)
+    if out["hits"]:
+        # time the winner's planner still needed after routing (0 = fully hidden)
+        out["hit_wait_ms_avg"] = round(out["hit_wait_ms_total"] / out["hits"], 1)
+    return out
+
+
+# ----------------------------------------------------------------------
+# speculation
+# ----------------------------------------------------------------------
+async def _speculative_plan(agent: str, shadow: LinearAgentState) -> Dict[str, Any]:
+    """Ingest + planner LLM of `agent` on `shadow` (a private copy of the turn state)."""
+    shadow["target_agent"] = agent
+    shadow = _INGEST[agent](shadow)
+    resp = await gateway.achat(**_request_kwargs(shadow))
+    return {
+        "agent": agent,
+        "fingerprint": fingerprint(shadow["llm_messages"]),
+        "content": resp.choices[0].message.content,
+        "usage": getattr(resp, "usage", None),
+    }
+
+
+def _record_waste(task: "asyncio.Task") -> None:
+    if task.cancelled():
+        _bump(cancelled=1)
+        return
+    if task.exception() is not None:
+        return
+    usage = task.result().get("usage")
+    _bump(
+        wasted_prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+        wasted_completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+    )
+
+
+async def aspeculative_route_node(state: LinearAgentState) -> LinearAgentState:
+    """aroute_node + speculative planners for the top candidates while the router LLM runs."""
+    text = state.get("input_text", "") or ""
+    state["speculative_plan"] = None
+
+    # deterministic routes: nothing to hide, no speculation
+    prev_agent = _followup_target(state)
+    if prev_agent:
+        state["target_agent"] = prev_agent
+        return state
+    fast = fast_route(text)
+    if fast:
+        state["target_agent"] = fast.agent
+        return state
+
+    with span_step("speculative_route", kind="node", node="route") as span:
+        # an agent whose history is due for its rolling summary would summarize
+        # twice (shadow + real ingest) and never match: don't speculate on it
+        candidates = [a for a in candidate_agents(text) if not needs_compaction(state, a)]
+        tasks = {
+            a: asyncio.create_task(_speculative_plan(a, copy.deepcopy(dict(state))))
+            for a in candidates
+        }
+        _bump(speculations=1, planner_calls=len(tasks))
+        kept: Optional[str] = None
+        try:
+            try:
+                target = await arouter_llm_call(text)
+            except Exception:
+                target = "tasks"  # same conservative fallback as allm_route
+            state["target_agent"] = target
+
+            hit = target in tasks
+            _bump(hits=1 if hit else 0, misses=0 if hit else 1)
+            span.update(metadata={"candidates": candidates, "target": target, "hit": hit})
+            if hit:
+                start = time.perf_counter()
+                kept = target
+                try:
+                    spec = await tasks[target]
+                    spec.pop("usage", None)
+                    state["speculative_plan"] = spec
+                except Exception:
+                    logger.exception("speculative planner for %s failed; planning normally", target)
+                _bump(hit_wait_ms_total=(time.perf_counter() - start) * 1000)
+        finally:
+            for agent, task in tasks.items():
+                if agent == kept:
+                    continue
+                if not task.done():
+                    task.cancel()
+                task.add_done_callback(_record_waste)
+    return state
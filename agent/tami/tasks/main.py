@@ -4,6 +4,7 @@ from typing import Dict, Any
 from agent.linear_flow.graph import build_agent_app
 from agent.tami.tasks.tool_registery import tools_reference, tools
 from agent.tami.tasks.prompt import TASKS_PLANNER_SYSTEM_PROMPT, TASKS_RESPONDER_SYSTEM_PROMPT
+from agent.tami.tasks.response_templates import TASKS_RESPONSE_TEMPLATES
 from observability.obs import instrument
 from datetime import datetime
 from typing import Optional
@@ -23,6 +24,7 @@ app = build_agent_app(
     planner_system_prompt=system_prompt,
     tools=tools,
     responder_system_prompt=TASKS_RESPONDER_SYSTEM_PROMPT,
+    response_templates=TASKS_RESPONSE_TEMPLATES,
 )
 
 def build_tasks_agent_graph():
@@ -31,6 +33,7 @@ def build_tasks_agent_graph():
         planner_system_prompt=system_prompt,
         tools=tools,
         responder_system_prompt=TASKS_RESPONDER_SYSTEM_PROMPT,
+        response_templates=TASKS_RESPONSE_TEMPLATES,
     )
     return app
 # -------------------------------
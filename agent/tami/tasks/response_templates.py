@@ -0,0 +1,92 @@
+# agent/tami/tasks/response_templates.py
+"""
+Template replies for the tasks agent (see agent/linear_flow/templates.py).
+
+Create/update/complete/delete confirmations and task listings are fully
+determined by the tool results, so they skip the responder LLM. Anything
+that may need a clarification question (validation errors such as a
+missing item_id) returns None and goes to the LLM.
+"""
+from typing import Any, Dict, List, Optional
+
+from agent.linear_flow.templates import ResponseTemplates, ToolRecord, tool_error_code, tool_ok
+
+GENERIC_ERROR = "משהו השתבש, נסה שוב."
+
+# command -> (singular, plural with {n})
+_CONFIRMATIONS: Dict[str, tuple] = {
+    "create": ("המשימה נוצרה.", "{n} משימות נוצרו."),
+    "update": ("המשימה עודכנה.", "{n} משימות עודכנו."),
+    "complete": ("המשימה סומנה כבוצעה.", "{n} משימות סומנו כבוצעות."),
+    "delete": ("המשימה נמחקה.", "{n} משימות נמחקו."),
+}
+
+# get_items status -> (header, empty)
+_LISTINGS: Dict[str, tuple] = {
+    "open": ("המשימות הפתוחות שלך:", "אין משימות פתוחות."),
+    "completed": ("משימות שהושלמו:", "אין משימות שהושלמו."),
+    "all": ("כל המשימות שלך:", "אין משימות."),
+}
+
+
+def _arg(record: ToolRecord, key: str) -> Any:
+    args = record.get("args") or {}
+    if hasattr(args, "model_dump"):
+        args = args.model_dump()
+    return args.get(key)
+
+
+def _command(record: ToolRecord) -> Optional[str]:
+    command = _arg(record, "command")
+    if command == "update" and _arg(record, "status") == "completed":
+        return "complete"
+    return command
+
+
+def render_process_task(records: List[ToolRecord]) -> Optional[str]:
+    failed = [r for r in records if not tool_ok(r)]
+    if failed:
+        codes = {tool_error_code(r) for r in failed}
+        if codes <= {"not_found"}:
+            return "לא מצאתי את המשימה הזו."
+        if "validation_error" in codes:
+            return None  # may need a clarification question
+        return GENERIC_ERROR
+
+    counts: Dict[str, int] = {}
+    for r in records:
+        command = _command(r)
+        if command not in _CONFIRMATIONS:
+            return None
+        counts[command] = counts.get(command, 0) + 1
+
+    lines = []
+    for command, n in counts.items():
+        singular, plural = _CONFIRMATIONS[command]
+        lines.append(singular if n == 1 else plural.format(n=n))
+    return "\n".join(lines)
+
+
+def render_get_items(records: List[ToolRecord]) -> Optional[str]:
+    if len(records) != 1:
+        return None
+    record = records[0]
+    if not tool_ok(record):
+        return GENERIC_ERROR
+
+    listing = (record.get("result") or {}).get("items")
+    if not isinstance(listing, str):
+        return None  # not the numbered text of format_items_for_llm
+
+    header, empty = _LISTINGS.get(_arg(record, "status") or "open", _LISTINGS["all"])
+    if not listing.strip():
+        return empty
+    return f"{header}\n{listing}"
+
+
+TASKS_RESPONSE_TEMPLATES = ResponseTemplates(
+    renderers={
+        "process_task": render_process_task,
+        "get_items": render_get_items,
+    }
+)
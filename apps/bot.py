@@ -10,7 +10,21 @@ from fastapi.responses import JSONResponse
 from fastapi.responses import Response
 from shared.event_trigger import trigger_events_loop
 from shared.google_calendar.oauth import google_router
-from shared.message_worker import message_queue, _queue_worker, message_cache, MESSAGE_TTL_SECONDS
+from shared.message_worker import ingress_queue, message_cache, _queue_worker, worker_metrics
+from models.user import userContextDict
+from adapters.whatsapp.cloudapi.cloud_api_adapter import graph_http
+from shared.llm_gateway import gateway
+from observability.tokens import prompt_cache_report
+from agent.linear_flow.context_projection import projection_stats
+from agent.tami.fast_router import fast_router_stats
+from agent.linear_flow.nodes.execute_tools_node import tool_timing_stats
+from agent.tami.speculative import speculation_stats
+from observability.ledger import ledger_report
+from shared.token_counter import token_counter_stats
+from agent.order.core import order_timing_stats
+from agent.order.match_cache import match_cache_stats
+from agent.order.alias_index import alias_sync_loop, alias_index_stats
+from shared.google_sheets.order_sink import start_order_sinks, close_order_sinks, order_sink_stats
 from fastapi.templating import Jinja2Templates
 from green_api.green_router import green_router
 from green_api.live_router import green_live_router
@@ -106,13 +120,17 @@ import asyncio
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     stop_event = asyncio.Event()
+    await graph_http.start()  # pooled HTTP/2 client for all Cloud API calls
+    await start_order_sinks()  # resend order rows spooled before the restart
 
     loop_task   = asyncio.create_task(trigger_events_loop(stop_event), name="trigger_events_loop")
     worker_task = asyncio.create_task(_queue_worker(stop_event),        name="queue_worker")
     pool_task   = asyncio.create_task(pool_worker(stop_event),          name="pool_worker")
+    users_task  = asyncio.create_task(userContextDict.flush_loop(stop_event), name="user_cache_flush")
+    alias_task  = asyncio.create_task(alias_sync_loop(stop_event),      name="alias_sync_loop")
     #digest_task = asyncio.create_task(daily_digest_loop(stop_event),    name="daily_digest_loop")
 
-    tasks = (loop_task, worker_task, pool_task)
+    tasks = (loop_task, worker_task, pool_task, users_task, alias_task)
 
     try:
         yield
@@ -131,6 +149,8 @@ async def lifespan(app: FastAPI):
                 if t:
                     with suppress(asyncio.CancelledError):
                         await t
+        await close_order_sinks()
+        await graph_http.aclose()
 
 # Config
 VERIFY_TOKEN = os.getenv("WHATSAPP_VERIFY_TOKEN", "...")
@@ -156,6 +176,58 @@ def health_check():
 def head_root():
     return Response(status_code=200)
 
+@app.get("/metrics/worker")
+def worker_pool_metrics():
+    return JSONResponse(content=worker_metrics(), status_code=200)
+
+@app.get("/metrics/llm")
+def llm_gateway_metrics():
+    return JSONResponse(content=gateway.stats(), status_code=200)
+
+@app.get("/metrics/prompt-cache")
+def prompt_cache_metrics():
+    return JSONResponse(content=prompt_cache_report(), status_code=200)
+
+@app.get("/metrics/context-projection")
+def context_projection_metrics():
+    return JSONResponse(content=projection_stats(), status_code=200)
+
+@app.get("/metrics/router")
+def fast_router_metrics():
+    return JSONResponse(content=fast_router_stats(), status_code=200)
+
+@app.get("/metrics/tools")
+def tool_metrics():
+    return JSONResponse(content=tool_timing_stats(), status_code=200)
+
+@app.get("/metrics/speculation")
+def speculation_metrics():
+    return JSONResponse(content=speculation_stats(), status_code=200)
+
+@app.get("/metrics/turns")
+def turn_ledger_metrics():
+    return JSONResponse(content=ledger_report(), status_code=200)
+
+@app.get("/metrics/token-counter")
+def token_counter_metrics():
+    return JSONResponse(content=token_counter_stats(), status_code=200)
+
+@app.get("/metrics/orders")
+def order_metrics():
+    return JSONResponse(content=order_timing_stats(), status_code=200)
+
+@app.get("/metrics/match-cache")
+def match_cache_metrics():
+    return JSONResponse(content=match_cache_stats(), status_code=200)
+
+@app.get("/metrics/aliases")
+def alias_index_metrics():
+    return JSONResponse(content=alias_index_stats(), status_code=200)
+
+@app.get("/metrics/sheets")
+def sheets_sink_metrics():
+    return JSONResponse(content=order_sink_stats(), status_code=200)
+
 @app.get("/home", response_class=HTMLResponse)
 async def home(request: Request):
     return templates.TemplateResponse("home.html", {"request": request})
@@ -228,11 +300,6 @@ async def webhook(
     # ---- NEW: enqueue all new Cloud API messages & return fast ----
     saw_messages = False
     new_jobs = 0
-    now = time.time()
-
-    stale = [mid for mid, ts in message_cache.items() if now - ts >= MESSAGE_TTL_SECONDS]
-    for mid in stale:
-        del message_cache[mid]
 
     try:
         for entry in (raw_data.get("entry") or []):
@@ -246,11 +313,11 @@ async def webhook(
                     if not mid:
                         continue
 
-                    if mid in message_cache:
+                    if message_cache.seen(mid):
                         # Already seen (likely retry/batch dup)
                         continue
 
-                    # --- inside your /webhook loop, just before message_queue.append({...}) ---
+                    # --- inside your /webhook loop, just before ingress_queue.enqueue(...) ---
                     try:
                         msg_type = m.get("type")
                         keys = list(m.keys())
@@ -270,15 +337,20 @@ async def webhook(
                     if not (text or caption or button_text or interactive_type):
                         logger.debug("ENQ raw message (no textish fields): %s", json.dumps(m)[:1000])
 
-                    # Mark seen and enqueue a compact job
-                    message_cache[mid] = now
-                    message_queue.append({
+                    # Durably enqueue a compact job; the queue dedupes by mid
+                    # (also across restarts), so Meta retries are dropped here
+                    is_new = ingress_queue.enqueue(mid, {
                         "message_id": mid,
                         "phone_number_id": phone_number_id,
                         "raw": m,        # the single message object (keep minimal)
                         "timestamp": m.get("timestamp"),
                         "from": m.get("from"),
+                        "received_at": time.time(),  # webhook arrival: turn ledger queue_wait_ms
                     })
+                    message_cache.mark(mid)
+                    if not is_new:
+                        # Seen before a restart (durable dedupe)
+                        continue
                     new_jobs += 1
 
     except Exception:
@@ -11,7 +11,7 @@ from fastapi.responses import JSONResponse
 from fastapi.responses import Response
 from shared.event_trigger import trigger_events_loop
 from shared.google_calendar.oauth import google_router
-from shared.message_worker import message_queue, _queue_worker, message_cache, MESSAGE_TTL_SECONDS
+from shared.message_worker import ingress_queue, message_cache, _queue_worker
 from fastapi.templating import Jinja2Templates
 from green_api.green_router import green_router
 from green_api.live_router import green_live_router
@@ -109,9 +109,7 @@ logger = logging.getLogger(__name__)
 
 # Provided/assumed elsewhere:
 # APP_SECRET: str | None
-# message_cache: dict[str, float]
-# message_queue: deque[dict]
-# MESSAGE_TTL_SECONDS: int
+# ingress_queue: durable queue with enqueue(mid, job) -> bool (False on duplicate)
 # MESSAGE_INDEX: singleton with put(wamid:str, msg:dict) and gc()
 
 @app.post("/webhook")
@@ -140,15 +138,6 @@ async def webhook(
     # ---- enqueue all new Cloud API messages & return fast ----
     saw_messages = False
     new_jobs = 0
-    now = time.time()
-
-    # TTL cleanup for dedupe cache (and optionally the message index if you want)
-    stale = [mid for mid, ts in message_cache.items() if now - ts >= MESSAGE_TTL_SECONDS]
-    for mid in stale:
-        try:
-            del message_cache[mid]
-        except KeyError:
-            pass
 
     try:
         for entry in (raw_data.get("entry") or []):
@@ -164,7 +153,7 @@ async def webhook(
                         continue
 
                     # Deduplicate retries
-                    if mid in message_cache:
+                    if message_cache.seen(mid):
                         continue
 
                     # Remember this exact inbound message for future reply hydration
@@ -174,15 +163,18 @@ async def webhook(
                     except Exception:
                         logger.exception("Failed to index inbound message wamid=%s", mid)
 
-                    # Mark seen and enqueue a compact job for your worker
-                    message_cache[mid] = now
-                    message_queue.append({
+                    # Enqueue a compact job for your worker (deduplicates retries)
+                    is_new = ingress_queue.enqueue(mid, {
                         "message_id": mid,
                         "phone_number_id": phone_number_id,
                         "raw": m,               # keep the single message dict
                         "timestamp": m.get("timestamp"),
                         "from": m.get("from"),
+                        "received_at": time.time(),  # webhook arrival: turn ledger queue_wait_ms
                     })
+                    message_cache.mark(mid)
+                    if not is_new:
+                        continue
                     new_jobs += 1
 
                 # 2) Optionally acknowledge "statuses" to avoid noisy logs (no enqueue)
@@ -1,5 +1,6 @@
 from dataclasses import dataclass
-from typing import Any
+from datetime import datetime
+from typing import Any, Optional
 from context.primitives.sender import SenderInfo
 from context.primitives.replies_info import ContentInfo
 from enum import Enum
@@ -18,4 +19,5 @@ class RawMessage:
     chat_id: str
     direction: MessageDirection
     message_data: Any
-    idempotency_key: str
\ No newline at end of file
+    idempotency_key: str
+    received_at: Optional[datetime] = None  # when the webhook delivered it (set by the worker)
\ No newline at end of file
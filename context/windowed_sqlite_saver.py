@@ -0,0 +1,163 @@
+# context/windowed_sqlite_saver.py
+"""
+Persistent, windowed LangGraph checkpointer for Tami conversations.
+
+- Persists to a local SQLite file (langgraph-checkpoint-sqlite's SqliteSaver),
+  so conversations and pending follow-up interrupts survive restarts/deploys.
+- Keeps only the last `keep_last` checkpoints per (thread, namespace) and
+  prunes older checkpoints and their pending writes on every put.
+- Holds the latest checkpoint of recently active threads in an LRU hot cache,
+  so `get_state` at the start of a turn doesn't hit SQLite.
+- Serves both `app.invoke` and `app.ainvoke`: the async methods run the sync
+  ones in a worker thread (SqliteSaver guards its connection with a lock).
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Optional
+
+from langgraph.checkpoint.base import CheckpointTuple, copy_checkpoint
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+
+class WindowedSqliteSaver(SqliteSaver):
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        keep_last: int = 20,
+        hot_cache_size: int = 1000,
+        **kwargs: Any,
+    ):
+        super().__init__(conn, **kwargs)
+        self.keep_last = keep_last
+        self.hot_cache_size = hot_cache_size
+        self._hot: "OrderedDict[tuple[str, str], CheckpointTuple]" = OrderedDict()
+        self._hot_lock = threading.Lock()
+
+    @classmethod
+    def from_path(cls, path: str, **kwargs: Any) -> "WindowedSqliteSaver":
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return cls(conn, **kwargs)
+
+    # ------------------------------------------------------------------
+    # hot cache
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _key(config: dict) -> tuple[str, str]:
+        conf = config.get("configurable", {})
+        return str(conf.get("thread_id")), conf.get("checkpoint_ns", "")
+
+    def _invalidate(self, config: dict) -> None:
+        with self._hot_lock:
+            self._hot.pop(self._key(config), None)
+
+    def get_tuple(self, config: dict) -> Optional[CheckpointTuple]:
+        if config.get("configurable", {}).get("checkpoint_id"):
+            return super().get_tuple(config)
+
+        key = self._key(config)
+        with self._hot_lock:
+            hit = self._hot.get(key)
+            if hit is not None:
+                self._hot.move_to_end(key)
+                # the pregel loop mutates channel_versions in place
+                return hit._replace(checkpoint=copy_checkpoint(hit.checkpoint))
+
+        tup = super().get_tuple(config)
+        if tup is not None:
+            with self._hot_lock:
+                self._hot[key] = tup
+                while len(self._hot) > self.hot_cache_size:
+                    self._hot.popitem(last=False)
+            tup = tup._replace(checkpoint=copy_checkpoint(tup.checkpoint))
+        return tup
+
+    # ------------------------------------------------------------------
+    # writes + pruning
+    # ------------------------------------------------------------------
+    def put(self, config: dict, *args: Any, **kwargs: Any) -> dict:
+        next_config = super().put(config, *args, **kwargs)
+        self._invalidate(config)
+        self._prune(next_config)
+        return next_config
+
+    def put_writes(self, config: dict, *args: Any, **kwargs: Any) -> None:
+        super().put_writes(config, *args, **kwargs)
+        self._invalidate(config)
+
+    def delete_thread(self, thread_id: str) -> None:
+        super().delete_thread(thread_id)
+        with self._hot_lock:
+            for key in [k for k in self._hot if k[0] == str(thread_id)]:
+                del self._hot[key]
+
+    def _prune(self, config: dict) -> None:
+        if not self.keep_last:
+            return
+        thread_id, ns = self._key(config)
+        keep = (
+            "SELECT checkpoint_id FROM checkpoints "
+            "WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT ?"
+        )
+        params = (thread_id, ns, thread_id, ns, self.keep_last)
+        with self.cursor() as cur:
+            cur.execute(
+                "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? "
+                f"AND checkpoint_id NOT IN ({keep})",
+                params,
+            )
+            cur.execute(
+                "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                f"AND checkpoint_id NOT IN ({keep})",
+                params,
+            )
+            if ns == "":
+                # subgraph namespaces are per-run ("tasks_agent:<uuid>"); drop
+                # the ones older than the oldest root checkpoint we still keep
+                # (checkpoint ids are time-ordered uuid6)
+                oldest = (
+                    "SELECT MIN(checkpoint_id) FROM checkpoints "
+                    "WHERE thread_id = ? AND checkpoint_ns = ''"
+                )
+                for table in ("writes", "checkpoints"):
+                    cur.execute(
+                        f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns != '' "
+                        f"AND checkpoint_id < ({oldest})",
+                        (thread_id, thread_id),
+                    )
+
+    # ------------------------------------------------------------------
+    # async API (app.ainvoke / app.aget_state)
+    # ------------------------------------------------------------------
+    async def aget_tuple(self, config: dict) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config: Optional[dict], **kwargs: Any) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(lambda: list(self.list(config, **kwargs)))
+        for item in items:
+            yield item
+
+    async def aput(self, config: dict, *args: Any, **kwargs: Any) -> dict:
+        return await asyncio.to_thread(self.put, config, *args, **kwargs)
+
+    async def aput_writes(self, config: dict, *args: Any, **kwargs: Any) -> None:
+        await asyncio.to_thread(self.put_writes, config, *args, **kwargs)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+def build_tami_checkpointer() -> WindowedSqliteSaver:
+    return WindowedSqliteSaver.from_path(
+        os.getenv("TAMI_CHECKPOINT_PATH", "tami_checkpoints.db"),
+        keep_last=int(os.getenv("TAMI_CHECKPOINT_KEEP_LAST", "20")),
+        hot_cache_size=int(os.getenv("TAMI_CHECKPOINT_HOT_CACHE", "1000")),
+    )
@@ -1,30 +1,139 @@
 # dedupe/cache.py
-from datetime import datetime, timedelta
+"""
+Shared TTL dedupe cache for all ingress paths (Cloud API webhook, Green API
+webhook, route/tami idempotency keys).
+
+Every key gets the same TTL, so insertion order is also expiry order: the
+entries live in an OrderedDict and expiry only ever pops from the front.
+That makes `seen`/`mark`/`check_and_mark` O(1) amortized no matter how many
+keys are inside the window. A hard `max_size` evicts the least recently
+marked keys first (LRU), bounding memory.
+
+Optional persistence (`persist_path`) writes marks to a local SQLite file and
+reloads the live window on startup.
+"""
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
 
 class IdempotencyCache:
-    def __init__(self, ttl_seconds: int = 3600):
-        self.ttl = timedelta(seconds=ttl_seconds)
-        self.store: dict[str, datetime] = {}
+    def __init__(
+        self,
+        ttl_seconds: int = 3600,
+        max_size: int = 500_000,
+        persist_path: Optional[str] = None,
+    ):
+        self.ttl = ttl_seconds
+        self.max_size = max_size
+        self.store: "OrderedDict[str, float]" = OrderedDict()  # key -> expires_at (unix)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.evictions = 0
+        if persist_path:
+            self._open_persistence(persist_path)
+
+    # ------------------------------------------------------------------
+    # persistence
+    # ------------------------------------------------------------------
+    def _open_persistence(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS dedupe (key TEXT PRIMARY KEY, expires_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS dedupe_exp_idx ON dedupe (expires_at)")
+        now = time.time()
+        conn.execute("DELETE FROM dedupe WHERE expires_at <= ?", (now,))
+        rows = conn.execute(
+            "SELECT key, expires_at FROM dedupe ORDER BY expires_at DESC LIMIT ?",
+            (self.max_size,),
+        ).fetchall()
+        for key, exp in reversed(rows):
+            self.store[key] = exp
+        self._conn = conn
+
+    # ------------------------------------------------------------------
+    # internals (call with lock held)
+    # ------------------------------------------------------------------
+    def _purge(self, now: float) -> None:
+        store = self.store
+        expired = 0
+        while store:
+            key, exp = next(iter(store.items()))
+            if exp > now:
+                break
+            store.popitem(last=False)
+            expired += 1
+        if expired and self._conn is not None:
+            self._conn.execute("DELETE FROM dedupe WHERE expires_at <= ?", (now,))
 
-    def _purge(self):
-        now = datetime.utcnow()
-        expired = [k for k, ts in self.store.items() if now - ts > self.ttl]
-        for k in expired:
-            del self.store[k]
+    def _insert(self, key: str, now: float) -> None:
+        exp = now + self.ttl
+        self.store[key] = exp
+        self.store.move_to_end(key)
+        while len(self.store) > self.max_size:
+            self.store.popitem(last=False)
+            self.evictions += 1
+        if self._conn is not None:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO dedupe (key, expires_at) VALUES (?, ?)", (key, exp)
+            )
 
+    def _live(self, key: str, now: float) -> bool:
+        exp = self.store.get(key)
+        return exp is not None and exp > now
+
+    # ------------------------------------------------------------------
+    # public API
+    # ------------------------------------------------------------------
     def seen(self, key: str) -> bool:
         """
         check ONLY. do not auto insert.
         """
-        self._purge()
-        return key in self.store
+        now = time.time()
+        with self._lock:
+            self._purge(now)
+            hit = self._live(key, now)
+            if hit:
+                self.hits += 1
+            return hit
 
     def mark(self, key: str):
         """
         manually mark as seen now.
         """
-        self._purge()
-        self.store[key] = datetime.utcnow()
+        now = time.time()
+        with self._lock:
+            self._purge(now)
+            self._insert(key, now)
+
+    def check_and_mark(self, key: str) -> bool:
+        """
+        atomic seen+mark. returns True if the key was already seen.
+        """
+        now = time.time()
+        with self._lock:
+            self._purge(now)
+            if self._live(key, now):
+                self.hits += 1
+                return True
+            self._insert(key, now)
+            return False
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def stats(self) -> dict:
+        return {"size": len(self.store), "hits": self.hits, "evictions": self.evictions}
 
 
 # global instance (for MVP)
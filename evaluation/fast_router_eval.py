@@ -0,0 +1,125 @@
+# evaluation/fast_router_eval.py
+"""
+Offline evaluation / training of the Tami fast-path router (agent/tami/fast_router.py).
+
+    python -m evaluation.fast_router_eval                # rules only
+    python -m evaluation.fast_router_eval --train        # + train the n-gram model
+    python -m evaluation.fast_router_eval --train --save # + write TAMI_FAST_ROUTER_MODEL
+
+Labels come from the Langfuse dataset: an explicit `target_agent` in the item
+input/expected_output, else the expected tool (process_task -> tasks, ...).
+Items whose tool does not pin an agent (get_items, no tool) are skipped.
+"""
+import argparse
+import json
+import random
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from langfuse import get_client
+
+from agent.tami.fast_router import (
+    AGENTS,
+    FAST_ROUTER_MODEL_PATH,
+    FAST_ROUTER_THRESHOLD,
+    NgramNB,
+    route_by_rules,
+)
+from evaluation.evaluators import _extract_tool_plan
+
+TOOL_TO_AGENT = {
+    "process_task": "tasks",
+    "process_event": "events",
+    "process_scheduled_message": "comms",
+    "search_chat_history": "comms",
+}
+
+
+def label_for(item) -> Optional[str]:
+    inp = getattr(item, "input", None) or {}
+    expected = getattr(item, "expected_output", None) or {}
+    for source in (expected, inp):
+        if isinstance(source, dict) and source.get("target_agent") in AGENTS:
+            return source["target_agent"]
+    if isinstance(expected, dict):
+        for entry in _extract_tool_plan(expected):
+            agent = TOOL_TO_AGENT.get(entry.get("tool"))
+            if agent:
+                return agent
+    return None
+
+
+def load_samples(dataset_name: str) -> List[Tuple[str, str]]:
+    dataset = get_client().get_dataset(dataset_name)
+    samples = []
+    for item in dataset.items:
+        text = ((item.input or {}).get("in") or {}).get("text")
+        label = label_for(item)
+        if text and label:
+            samples.append((text, label))
+    return samples
+
+
+def evaluate(name: str, predict, samples: List[Tuple[str, str]], threshold: float) -> Dict[str, Any]:
+    decided = correct = 0
+    start = time.perf_counter()
+    for text, label in samples:
+        decision = predict(text)
+        if decision is None or decision.confidence < threshold:
+            continue
+        decided += 1
+        correct += decision.agent == label
+    elapsed = time.perf_counter() - start
+    n = len(samples) or 1
+    return {
+        "classifier": name,
+        "samples": len(samples),
+        "coverage": round(decided / n, 3),
+        "fallback_rate": round(1 - decided / n, 3),
+        "accuracy_when_decided": round(correct / decided, 3) if decided else None,
+        "us_per_item": round(elapsed / n * 1e6, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dataset", default="linear_tami2")
+    parser.add_argument("--threshold", type=float, default=FAST_ROUTER_THRESHOLD)
+    parser.add_argument("--train", action="store_true", help="train the n-gram model (80/20 split)")
+    parser.add_argument("--save", action="store_true", help="retrain on all samples and save the model")
+    parser.add_argument("--out", default=FAST_ROUTER_MODEL_PATH)
+    args = parser.parse_args()
+
+    samples = load_samples(args.dataset)
+    print(f"{len(samples)} labeled items from {args.dataset}")
+
+    reports = [evaluate("rules", route_by_rules, samples, args.threshold)]
+
+    if args.train:
+        shuffled = samples[:]
+        random.Random(0).shuffle(shuffled)
+        cut = int(len(shuffled) * 0.8)
+        train, test = shuffled[:cut], shuffled[cut:]
+        model = NgramNB.train(train)
+        reports.append(evaluate("model (held-out 20%)", model.predict, test, args.threshold))
+
+        def combined(text):
+            decision = route_by_rules(text)
+            if decision is None or decision.confidence < args.threshold:
+                candidate = model.predict(text)
+                if decision is None or candidate.confidence > decision.confidence:
+                    decision = candidate
+            return decision
+
+        reports.append(evaluate("rules+model (held-out 20%)", combined, test, args.threshold))
+
+        if args.save:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump(NgramNB.train(samples).to_json(), f, ensure_ascii=False)
+            print(f"model saved to {args.out}")
+
+    print(json.dumps(reports, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+# evaluation/order_match_bench.py
+"""
+Offline benchmark: local shortlist (agent/order/shortlist.py) vs the
+full-catalog prompt for order entity matching.
+
+    python -m evaluation.order_match_bench                       # local only, synthetic spans
+    python -m evaluation.order_match_bench --cases cases.jsonl   # labeled spans
+    python -m evaluation.order_match_bench --llm 50              # + run the model both ways on 50 spans
+
+Cases are JSON lines {"entity_type": "customer" | "product", "span": ..., "expected": <catalog name>}.
+Without --cases, spans are generated from the catalogs with the noise seen in
+WhatsApp orders: dropped quotes / dashes, "4.6" for "4-6", added or missing
+vowel letters, one-letter typos and (customers) swapped word order.
+
+Reported per entity type:
+  - recall_at_k: expected name is in the shortlist (what the model can still pick)
+  - auto_rate / auto_accuracy: spans resolved locally, without a model call
+  - prompt tokens per match, full catalog vs shortlist (0 for auto matches)
+  - tokens_per_order: 1 customer match + --items-per-order product matches
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Any, Dict, List
+
+from agent.order.file_helper import CUSTOMERS_STRING, PRODUCTS_STRING
+from agent.order.match_agent import build_match_prompt, match_entity
+from agent.order.shortlist import SHORTLIST_K, catalog_index, list_text
+from shared.token_counter import count_text
+
+MATCH_MODEL = "gpt-5-mini"
+FULL_LISTS = {"customer": CUSTOMERS_STRING, "product": PRODUCTS_STRING}
+_VOWEL_LETTERS = "וי"
+
+
+def _typo(word: str, rng: random.Random) -> str:
+    if len(word) < 4 or not any("א" <= ch <= "ת" for ch in word):
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    op = rng.choice(("drop", "swap", "vowel"))
+    if op == "drop":
+        return word[:i] + word[i + 1:]
+    if op == "swap":
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    if word[i] in _VOWEL_LETTERS:
+        return word[:i] + word[i + 1:]
+    return word[:i] + rng.choice(_VOWEL_LETTERS) + word[i:]
+
+
+def perturb(name: str, entity_type: str, rng: random.Random) -> str:
+    text = name.replace('"', "").replace("'", "")
+    text = text.replace(" - ", " ").replace("-", rng.choice((" ", ".", "-")))
+    words = text.split()
+    if words:
+        j = rng.randrange(len(words))
+        words[j] = _typo(words[j], rng)
+    if entity_type == "customer" and len(words) >= 2 and rng.random() < 0.3:
+        words[0], words[1] = words[1], words[0]
+    return " ".join(words)
+
+
+def synthetic_cases(per_type: int, seed: int = 0) -> List[Dict[str, str]]:
+    rng = random.Random(seed)
+    cases = []
+    for entity_type in ("customer", "product"):
+        names = sorted(set(catalog_index(entity_type).names))
+        for name in rng.sample(names, min(per_type, len(names))):
+            cases.append({"entity_type": entity_type, "span": perturb(name, entity_type, rng), "expected": name})
+    return cases
+
+
+def load_cases(path: str) -> List[Dict[str, str]]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate_local(cases: List[Dict[str, str]], k: int) -> Dict[str, Dict[str, Any]]:
+    reports: Dict[str, Dict[str, Any]] = {}
+    for entity_type in ("customer", "product"):
+        subset = [c for c in cases if c["entity_type"] == entity_type]
+        if not subset:
+            continue
+        index = catalog_index(entity_type)
+        in_list = auto = auto_ok = 0
+        full_tokens = short_tokens = 0
+        start = time.perf_counter()
+        for case in subset:
+            candidates = index.shortlist(case["span"], k)
+            names = [c.name for c in candidates]
+            in_list += case["expected"] in names
+            decided = index.decide(case["span"])
+            full_tokens += count_text(build_match_prompt(entity_type, case["span"], FULL_LISTS[entity_type]), MATCH_MODEL)
+            if decided is not None:
+                auto += 1
+                auto_ok += decided.name == case["expected"]
+            else:
+                listing = list_text(candidates) if candidates else FULL_LISTS[entity_type]
+                short_tokens += count_text(build_match_prompt(entity_type, case["span"], listing), MATCH_MODEL)
+        elapsed = time.perf_counter() - start
+        n = len(subset)
+        reports[entity_type] = {
+            "cases": n,
+            "recall_at_k": round(in_list / n, 3),
+            "auto_rate": round(auto / n, 3),
+            "auto_accuracy": round(auto_ok / auto, 3) if auto else None,
+            "full_prompt_tokens_per_match": round(full_tokens / n, 1),
+            "shortlist_prompt_tokens_per_match": round(short_tokens / n, 1),
+            "ms_per_match_local": round(elapsed / n * 1000, 2),  # includes token counting
+        }
+    return reports
+
+
+async def evaluate_llm(cases: List[Dict[str, str]]) -> Dict[str, Dict[str, Any]]:
+    """Model accuracy with the full catalog vs with the shortlist (costs real API calls)."""
+    out: Dict[str, Dict[str, Any]] = {}
+    for mode, use_shortlist in (("full_catalog", False), ("shortlist", True)):
+        correct = 0
+        start = time.perf_counter()
+        for case in cases:
+            try:
+                result = await match_entity(
+                    case["entity_type"],
+                    case["span"],
+                    FULL_LISTS[case["entity_type"]],
+                    use_shortlist=use_shortlist,
+                    use_cache=False,
+                )
+            except Exception as e:
+                print(f"{mode}: {case['span']!r} failed: {e}")
+                continue
+            matched = result.get("matched_name") if isinstance(result, dict) else None
+            correct += matched == case["expected"]
+        out[mode] = {
+            "cases": len(cases),
+            "accuracy": round(correct / len(cases), 3) if cases else None,
+            "s_per_match": round((time.perf_counter() - start) / (len(cases) or 1), 2),
+        }
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cases", help="JSON lines of {entity_type, span, expected}")
+    parser.add_argument("--synthetic", type=int, default=300, help="synthetic spans per entity type")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--k", type=int, default=SHORTLIST_K)
+    parser.add_argument("--items-per-order", type=float, default=3.0)
+    parser.add_argument("--llm", type=int, default=0, help="also run the model both ways on N sampled cases")
+    args = parser.parse_args()
+
+    cases = load_cases(args.cases) if args.cases else synthetic_cases(args.synthetic, args.seed)
+    print(f"{len(cases)} cases")
+
+    reports: Dict[str, Any] = {"local": evaluate_local(cases, args.k)}
+    local = reports["local"]
+    if "customer" in local and "product" in local:
+        per_order = {}
+        for key, label in (("full_prompt_tokens_per_match", "full_catalog"), ("shortlist_prompt_tokens_per_match", "shortlist")):
+            per_order[label] = round(local["customer"][key] + args.items_per_order * local["product"][key], 1)
+        reports["tokens_per_order"] = per_order
+
+    if args.llm:
+        sample = random.Random(args.seed).sample(cases, min(args.llm, len(cases)))
+        reports["llm"] = asyncio.run(evaluate_llm(sample))
+
+    print(json.dumps(reports, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,7 @@
 from graph.state import TamiState
-from openai import OpenAI
 from dotenv import load_dotenv
 load_dotenv(".venv/.env")
-client = OpenAI()  # assumes OPENAI_API_KEY in env
+from shared.llm_gateway import gateway  # assumes OPENAI_API_KEY in env
 from graph.tools.build import TOOLS
 from typing import Dict, Any
 
@@ -12,8 +11,9 @@ def tami_llm_node(state: TamiState) -> TamiState:
     """
     messages = state.get("messages", [])
 
-    resp = client.chat.completions.create(
+    resp = gateway.chat(
         model="gpt-4o",
+        tag="tami_llm",
         messages=messages,
         tools=TOOLS,
         tool_choice="auto",
@@ -13,6 +13,7 @@ import asyncio
 from adapters.whatsapp.cloudapi.cloud_api_adapter import CloudAPIAdapter
 from green_api.groups import list_groups
 from store.user import UserStore
+from tools.contact_index import invalidate_contact_index
 from shared.user import create_user
 
 green_router = APIRouter()
@@ -246,8 +247,7 @@ async def refresh_contact(userId):
         # and list_groups returns a list[dict[str, Any]] with a "group_id" key
 
         await get_contacts(user.user_id)
-        user_store = UserStore(user.user_id)
-        user = user_store.load()
+        user = get_user(user.user_id)  # cache already holds the contacts just fetched
         new_groups = list_groups_as_dict(user.user_id)
         print(f"✅ Got {len(new_groups)} groups for {user.user_id}")
         # Extend, don't override
@@ -258,8 +258,8 @@ async def refresh_contact(userId):
                 user.runtime.contacts[name] = data
 
     
-        UserStore(user.user_id).save(user)
-        userContextDict[user.user_id] = user
+        userContextDict.save(user)  # writes only added/changed contact entries
+        invalidate_contact_index(user.user_id)
     except Exception as e:
         print(f"❌ Failed to get contacts for {user.user_id}: {e}")
 
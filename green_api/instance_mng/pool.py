@@ -50,8 +50,7 @@ def claim_instance(user_id: str):
             token=inst["apiTokenInstance"],
             id=inst["idInstance"],
         )
-        UserStore(user_id).save(user)
-        userContextDict[user_id] = user
+        userContextDict.save(user, "runtime.greenApiInstance")
         return inst
 
     return _claim(transaction)
@@ -74,7 +73,6 @@ def release_instance(user_id: str, inst: dict):
         user = get_user(user_id)
         if user and getattr(user, "runtime", None):
             user.runtime.greenApiInstance = None
-            UserStore(user_id).save(user)
-            userContextDict[user_id] = user
+            userContextDict.save(user, "runtime.greenApiInstance")
 
     return _release(transaction)
@@ -5,7 +5,6 @@ import logging
 from typing import Any, Dict, List, Optional, Union, Sequence
 
 from dotenv import load_dotenv
-from openai import AsyncOpenAI
 import httpx
 
 import asyncio
@@ -14,8 +13,9 @@ from shared.time import to_user_timezone
 
 load_dotenv(".venv/.env")
 
+from shared.llm_gateway import gateway
+
 logger = logging.getLogger(__name__)
-client = AsyncOpenAI()
 
 # ---- JSON Schema: object with "orders" (array) ----
 ORDERS_JSON_SCHEMA = {
@@ -211,9 +211,7 @@ import os, json, logging, asyncio
 from datetime import datetime
 from typing import Any, Dict, List
 
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
+from shared.google_sheets.order_sink import order_sink
 
 logger = logging.getLogger(__name__)
 
@@ -228,28 +226,6 @@ EXPECTED_HEADERS = [
 EXPECTED_HEADERS2 = [
     "טקסט","שם לקוח מטקסט","שם לקוח רשמי","מזהה לקוח","שם מוצר מטקסט","שם מוצר רשמי","מזהה מוצר","כמות מטקסט","כמות","מארז","סוג הובלה","יעד","הערות","נוצר ב","הוזן",
 ]
-SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
-
-# === AUTH: service account via file path or env var ===
-_svc = None
-def _sheets_service():
-    secrets_dir = os.getenv("SECRETS_DIR", ".secrets")
-    creds_path = os.path.join(secrets_dir, "sheets.json")
-    global _svc
-    if _svc:
-        return _svc
-    creds_json = os.getenv("GOOGLE_CREDENTIALS_JSON")
-    if creds_json:
-        info = json.loads(creds_json)
-        creds = Credentials.from_service_account_info(info, scopes=SCOPES)
-    else:
-        # falls back to GOOGLE_APPLICATION_CREDENTIALS file path
-        creds = Credentials.from_service_account_file(
-           creds_path, scopes=SCOPES
-        )
-    _svc = build("sheets", "v4", credentials=creds, cache_discovery=False)
-    return _svc
-
 def _orders_to_rows(payload: Dict[str, Any]) -> List[List[Any]]:
     """Map payload['orders'] -> rows in EXACT EXPECTED_HEADERS order with safe defaults."""
     orders = payload.get("orders") or []
@@ -355,89 +331,13 @@ def _orders_to_rows2(payload: dict) -> List[List[Any]]:
     return rows
 
 
-def _append_rows_sync(rows: List[List[Any]]) -> bool:
-    """Blocking Sheets API call (runs in thread)."""
-    if not rows:
-        logger.info("[sheets] no rows to write")
-        return True
-    svc = _sheets_service()
-    rng = f"{SHEET_NAME}!A1"   # append ignores start cell; header expected in row 1
-    body = {
-        "range": rng,
-        "majorDimension": "ROWS",
-        "values": rows,
-    }
-    try:
-        resp = (
-            svc.spreadsheets()
-            .values()
-            .append(
-                spreadsheetId=SPREADSHEET_ID,
-                range=rng,
-                valueInputOption="USER_ENTERED",   # respects checkbox/number formatting
-                insertDataOption="INSERT_ROWS",
-                includeValuesInResponse=False,
-                body=body,
-            )
-            .execute()
-        )
-        updates = ((resp or {}).get("updates") or {})
-        written = updates.get("updatedRows", 0)
-        logger.info("[sheets] appended rows=%s", written)
-        return bool(written)
-    except HttpError as e:
-        logger.exception("[sheets] HttpError: %s", getattr(e, "content", e))
-        return False
-    except Exception as e:
-        logger.exception("[sheets] unexpected error: %s", e)
-        return False
-
-
-
-def _append_rows_sync2(rows: List[List[Any]]) -> bool:
-    """Blocking Sheets API call (runs in thread)."""
-    if not rows:
-        logger.info("[sheets] no rows to write")
-        return True
-    svc = _sheets_service()
-    rng = f"{SHEET_NAME2}!A1"   # append ignores start cell; header expected in row 1
-    body = {
-        "range": rng,
-        "majorDimension": "ROWS",
-        "values": rows,
-    }
-    try:
-        resp = (
-            svc.spreadsheets()
-            .values()
-            .append(
-                spreadsheetId=SPREADSHEET_ID,
-                range=rng,
-                valueInputOption="USER_ENTERED",   # respects checkbox/number formatting
-                insertDataOption="INSERT_ROWS",
-                includeValuesInResponse=False,
-                body=body,
-            )
-            .execute()
-        )
-        updates = ((resp or {}).get("updates") or {})
-        written = updates.get("updatedRows", 0)
-        logger.info("[sheets] appended rows=%s", written)
-        return bool(written)
-    except HttpError as e:
-        logger.exception("[sheets] HttpError: %s", getattr(e, "content", e))
-        return False
-    except Exception as e:
-        logger.exception("[sheets] unexpected error: %s", e)
-        return False
-
 # === REPLACEMENT for your previous webhook POST ===
 async def _send_orders_async(payload: Dict[str, Any]) -> bool:
     """Append payload['orders'] to Google Sheet via Sheets API (service account)."""
     try:
         rows = _orders_to_rows(payload)
-        # run blocking client in a worker thread
-        return await asyncio.to_thread(_append_rows_sync, rows)
+        # spooled, batched and retried by the sink (see shared/google_sheets/order_sink.py)
+        return await order_sink(SPREADSHEET_ID, SHEET_NAME).submit(rows)
     except Exception as e:
         logger.exception("[sheets] send failed: %s", e)
         return False
@@ -446,9 +346,8 @@ async def _send_orders_async2(payload: Dict[str, Any]) -> bool:
     """Append payload['orders'] to Google Sheet via Sheets API (service account)."""
     try:
         rows = _orders_to_rows2(payload)
-        # run blocking client in a worker thread
         print("[sheets] appending rows=%s", rows)
-        return await asyncio.to_thread(_append_rows_sync2, rows)
+        return await order_sink(SPREADSHEET_ID, SHEET_NAME2).submit(rows)
     except Exception as e:
         logger.exception("[sheets] send failed: %s", e)
         return False
@@ -501,8 +400,9 @@ async def extract_ledger_from_message(
 
     # --- LLM call ---
     try:
-        resp = await client.chat.completions.create(
+        resp = await gateway.achat(
             model="gpt-5-mini",
+            tag="ledger.orders",
             messages=[
                 {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": text},
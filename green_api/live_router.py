@@ -12,6 +12,7 @@ from fastapi import APIRouter, Request
 from fastapi.responses import JSONResponse
 
 from db.base import db
+from dedupe.cache import IdempotencyCache
 from green_api.ledger_item import extract_ledger_from_message  # keep your path
 from agent.order.core import extract_orders_from_message
 
@@ -57,17 +58,10 @@ def save_text_message(
 # Deduping
 # -----------------------------------------------------------------------------
 DEDUPE_TTL = 24 * 3600
-_seen: Dict[str, float] = {}
+_seen = IdempotencyCache(ttl_seconds=DEDUPE_TTL, max_size=200_000)
 
 def _seen_before(key: str) -> bool:
-    now = time.time()
-    for k, exp in list(_seen.items())[:64]:
-        if exp <= now:
-            _seen.pop(k, None)
-    if key in _seen and _seen[key] > now:
-        return True
-    _seen[key] = now + DEDUPE_TTL
-    return False
+    return _seen.check_and_mark(key)
 
 def _dedupe_key(data: dict, message_id: Optional[str]) -> str:
     t = (data.get("typeWebhook") or data.get("event", {}).get("typeWebhook") or "").lower()
@@ -67,5 +67,7 @@ class User(BaseModel):
     config: UserConfig
     runtime: UserRuntime
 
-# TODO: Redis
-userContextDict: Dict[str, User] = {}
+# Session cache with dirty tracking (TTL/LRU, partial Firestore updates).
+# Still dict-like for reads/caching; persist changes with userContextDict.save(user, ...)
+from store.user_cache import UserSessionCache
+userContextDict = UserSessionCache()
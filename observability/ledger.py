@@ -0,0 +1,262 @@
+# observability/ledger.py
+"""
+Per-turn token / cost / latency ledger for Tami turns.
+
+handle_tami_turn opens a TurnLedger (contextvar) for the turn. While it is
+open:
+
+- every LLM call through shared.llm_gateway adds its tag (node), model,
+  prompt / cached / completion tokens, latency and queue wait (time spent
+  waiting for the per-model concurrency slot);
+- every `span_step(..., kind="node")` adds its wall time under the node name.
+
+At the end of the turn the summary is returned with the turn state
+(state["turn_ledger"]), appended as one JSON line to TURN_LEDGER_PATH and
+folded into in-process aggregates per user, agent and model
+(ledger_report(); per-user daily cost via user_daily_cost()).
+
+Stdlib only: imported from observability.obs and the gateway.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TURN_LEDGER_PATH = os.getenv("TURN_LEDGER_PATH", "turn_ledger.jsonl")
+
+# USD per 1M tokens: (input, cached input, output)
+MODEL_PRICES: Dict[str, tuple] = {
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+    "gpt-5": (1.25, 0.125, 10.00),
+    "gpt-5-mini": (0.25, 0.025, 2.00),
+}
+
+
+def call_cost(model: str, prompt_tokens: int, cached_tokens: int, completion_tokens: int) -> float:
+    """USD cost of one call (0.0 for models without a price entry)."""
+    price = MODEL_PRICES.get(model)
+    if price is None:
+        # dated snapshots: "gpt-4o-2024-08-06" -> "gpt-4o"
+        price = next((p for m, p in sorted(MODEL_PRICES.items(), key=lambda kv: -len(kv[0])) if model.startswith(m)), None)
+    if price is None:
+        return 0.0
+    inp, cached, out = price
+    uncached = max(0, prompt_tokens - cached_tokens)
+    return (uncached * inp + cached_tokens * cached + completion_tokens * out) / 1_000_000
+
+
+class TurnLedger:
+    def __init__(self, thread_id: str, user_id: Optional[str] = None, queue_wait_ms: float = 0.0):
+        self.thread_id = thread_id
+        self.user_id = user_id
+        self.queue_wait_ms = queue_wait_ms
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()  # tools / speculative planners record from other threads & tasks
+        self.llm_calls: List[Dict[str, Any]] = []
+        self.node_ms: Dict[str, float] = defaultdict(float)
+
+    def add_llm_call(
+        self,
+        tag: str,
+        model: str,
+        prompt_tokens: int,
+        cached_tokens: int,
+        completion_tokens: int,
+        latency_ms: float,
+        queue_ms: float,
+    ) -> None:
+        record = {
+            "tag": tag,
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "cached_tokens": cached_tokens,
+            "completion_tokens": completion_tokens,
+            "latency_ms": round(latency_ms, 1),
+            "queue_ms": round(queue_ms, 1),
+            "cost_usd": round(call_cost(model, prompt_tokens, cached_tokens, completion_tokens), 6),
+        }
+        with self._lock:
+            self.llm_calls.append(record)
+
+    def add_node_time(self, node: str, ms: float) -> None:
+        with self._lock:
+            self.node_ms[node] += ms
+
+    def summary(self, agent: Optional[str] = None, status: Optional[str] = None) -> Dict[str, Any]:
+        with self._lock:
+            calls = list(self.llm_calls)
+            nodes = {k: round(v, 1) for k, v in self.node_ms.items()}
+        return {
+            "ts": datetime.fromtimestamp(self.started_at, timezone.utc).isoformat(),
+            "thread_id": self.thread_id,
+            "user_id": self.user_id,
+            "agent": agent,
+            "status": status,
+            "wall_ms": round((time.perf_counter() - self._start) * 1000, 1),
+            "queue_wait_ms": round(self.queue_wait_ms, 1),
+            "prompt_tokens": sum(c["prompt_tokens"] for c in calls),
+            "cached_tokens": sum(c["cached_tokens"] for c in calls),
+            "completion_tokens": sum(c["completion_tokens"] for c in calls),
+            "cost_usd": round(sum(c["cost_usd"] for c in calls), 6),
+            "llm_calls": calls,
+            "node_ms": nodes,
+        }
+
+
+_current: ContextVar[Optional[TurnLedger]] = ContextVar("turn_ledger", default=None)
+
+
+def current_ledger() -> Optional[TurnLedger]:
+    return _current.get()
+
+
+@contextmanager
+def open_turn_ledger(thread_id: str, user_id: Optional[str] = None, queue_wait_ms: float = 0.0) -> Iterator[TurnLedger]:
+    ledger = TurnLedger(thread_id, user_id, queue_wait_ms)
+    token = _current.set(ledger)
+    try:
+        yield ledger
+    finally:
+        _current.reset(token)
+
+
+def record_llm_call(tag: str, model: str, resp: Any, latency_s: float, queue_s: float = 0.0) -> None:
+    """Add one chat completion to the open turn ledger (no-op outside a turn)."""
+    ledger = _current.get()
+    if ledger is None:
+        return
+    usage = getattr(resp, "usage", None)
+    details = getattr(usage, "prompt_tokens_details", None)
+    ledger.add_llm_call(
+        tag=tag,
+        model=model,
+        prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+        cached_tokens=getattr(details, "cached_tokens", 0) or 0,
+        completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+        latency_ms=latency_s * 1000,
+        queue_ms=queue_s * 1000,
+    )
+
+
+def record_node_time(node: str, seconds: float) -> None:
+    ledger = _current.get()
+    if ledger is not None:
+        ledger.add_node_time(node, seconds * 1000)
+
+
+# ----------------------------------------------------------------------
+# append-only store + aggregates
+# ----------------------------------------------------------------------
+_store_lock = threading.Lock()
+_agg_lock = threading.Lock()
+_agg_loaded = False
+
+
+def _empty() -> Dict[str, float]:
+    return {"turns": 0, "llm_calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0,
+            "cost_usd": 0.0, "wall_ms_total": 0.0}
+
+
+_by_user: Dict[str, Dict[str, float]] = defaultdict(_empty)
+_by_agent: Dict[str, Dict[str, float]] = defaultdict(_empty)
+_by_model: Dict[str, Dict[str, float]] = defaultdict(_empty)
+_by_user_day: Dict[tuple, float] = defaultdict(float)
+
+
+def _fold(entry: Dict[str, Any]) -> None:
+    for bucket in (_by_user[entry.get("user_id") or "unknown"], _by_agent[entry.get("agent") or "unknown"]):
+        bucket["turns"] += 1
+        bucket["llm_calls"] += len(entry.get("llm_calls") or [])
+        bucket["wall_ms_total"] += entry.get("wall_ms") or 0.0
+        for key in ("prompt_tokens", "cached_tokens", "completion_tokens", "cost_usd"):
+            bucket[key] += entry.get(key) or 0
+    for call in entry.get("llm_calls") or []:
+        bucket = _by_model[call.get("model") or "unknown"]
+        bucket["llm_calls"] += 1
+        bucket["wall_ms_total"] += call.get("latency_ms") or 0.0
+        for key in ("prompt_tokens", "cached_tokens", "completion_tokens", "cost_usd"):
+            bucket[key] += call.get(key) or 0
+    day = (entry.get("ts") or "")[:10]
+    _by_user_day[(entry.get("user_id") or "unknown", day)] += entry.get("cost_usd") or 0.0
+
+
+def _ensure_loaded(path: str = TURN_LEDGER_PATH) -> None:
+    """Rebuild the aggregates from the ledger file once per process."""
+    global _agg_loaded
+    if _agg_loaded:
+        return
+    with _agg_lock:
+        if _agg_loaded:
+            return
+        _agg_loaded = True
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        _fold(json.loads(line))
+        except Exception:
+            logger.exception("turn ledger: failed to load %s", path)
+
+
+def finish_turn(ledger: TurnLedger, agent: Optional[str], status: Optional[str], path: str = TURN_LEDGER_PATH) -> Dict[str, Any]:
+    """Summarize the turn, append it to the ledger file and update the aggregates."""
+    entry = ledger.summary(agent=agent, status=status)
+    _ensure_loaded(path)
+    try:
+        line = json.dumps(entry, ensure_ascii=False, default=str)
+        with _store_lock, open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    except Exception:
+        logger.exception("turn ledger: failed to append to %s", path)
+    with _agg_lock:
+        _fold(entry)
+    return entry
+
+
+def _rounded(groups: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    out = {}
+    for key, st in groups.items():
+        row = dict(st)
+        row["cost_usd"] = round(row["cost_usd"], 6)
+        if row["turns"]:
+            row["wall_ms_avg"] = round(row["wall_ms_total"] / row["turns"], 1)
+        elif row["llm_calls"]:
+            row["latency_ms_avg"] = round(row["wall_ms_total"] / row["llm_calls"], 1)
+        out[key] = row
+    return out
+
+
+def ledger_report() -> Dict[str, Any]:
+    _ensure_loaded()
+    with _agg_lock:
+        return {
+            "by_user": _rounded(_by_user),
+            "by_agent": _rounded(_by_agent),
+            "by_model": _rounded(_by_model),
+        }
+
+
+def user_daily_cost(user_id: str, day: Optional[str] = None) -> float:
+    """USD spent by `user_id` on `day` (YYYY-MM-DD, UTC; default today), for per-user budgets."""
+    _ensure_loaded()
+    day = day or datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    with _agg_lock:
+        return round(_by_user_day.get((user_id, day), 0.0), 6)
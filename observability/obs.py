@@ -281,9 +281,11 @@ def safe_update_current_span_io(*, input: Optional[Any] = None,
 from contextlib import contextmanager
 from observability.obs import span_attrs  # your file
 from observability.telemetry import mark_error
+from observability.ledger import record_node_time
 
 @contextmanager
 def span_step(name: str, *, kind: str, redact_input=False, **attrs):
+    start = time.perf_counter()
     with span_attrs(name, **attrs) as s:
         try:
             yield s
@@ -291,3 +293,7 @@ def span_step(name: str, *, kind: str, redact_input=False, **attrs):
             # single place to mark + rethrow
             mark_error(e, kind=kind, span=s)
             raise
+        finally:
+            if kind == "node":
+                # per-node wall time of the current turn (observability.ledger)
+                record_node_time(attrs.get("node") or name, time.perf_counter() - start)
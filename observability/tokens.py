@@ -1,3 +1,7 @@
+import threading
+from collections import defaultdict
+
+
 def aggregate_tokens_from_run(turn) -> tuple[int, int, int]:
     """
     Extract (input_tokens, output_tokens, total_tokens) from a RunResult.
@@ -24,3 +28,52 @@ def aggregate_tokens_from_run(turn) -> tuple[int, int, int]:
             total_total += int(tot)
 
     return input_total, output_total, total_total
+
+
+# ---------------------------------------------------------------------------
+# Prompt-cache accounting (chat completions usage.prompt_tokens_details)
+# ---------------------------------------------------------------------------
+_cache_lock = threading.Lock()
+_cache_stats: dict[str, dict[str, int]] = defaultdict(
+    lambda: {"calls": 0, "calls_with_hit": 0, "prompt_tokens": 0, "cached_tokens": 0}
+)
+
+
+def cached_prompt_tokens(usage) -> tuple[int, int]:
+    """(prompt_tokens, cached_tokens) from a chat completion `usage` (object or dict)."""
+    if usage is None:
+        return 0, 0
+    if isinstance(usage, dict):
+        prompt = usage.get("prompt_tokens") or 0
+        details = usage.get("prompt_tokens_details") or {}
+        cached = details.get("cached_tokens") if isinstance(details, dict) else 0
+    else:
+        prompt = getattr(usage, "prompt_tokens", 0) or 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", 0) if details is not None else 0
+    return int(prompt), int(cached or 0)
+
+
+def record_prompt_cache(tag: str, resp) -> tuple[int, int]:
+    """Accumulate prompt/cached tokens of one response under `tag` (e.g. 'tasks.planner')."""
+    prompt, cached = cached_prompt_tokens(getattr(resp, "usage", None))
+    with _cache_lock:
+        st = _cache_stats[tag]
+        st["calls"] += 1
+        st["prompt_tokens"] += prompt
+        st["cached_tokens"] += cached
+        if cached:
+            st["calls_with_hit"] += 1
+    return prompt, cached
+
+
+def prompt_cache_report() -> dict[str, dict]:
+    """Per-tag prompt-cache hit ratio (cached / prompt tokens)."""
+    with _cache_lock:
+        return {
+            tag: {
+                **st,
+                "hit_ratio": round(st["cached_tokens"] / st["prompt_tokens"], 3) if st["prompt_tokens"] else 0.0,
+            }
+            for tag, st in sorted(_cache_stats.items())
+        }
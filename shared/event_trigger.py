@@ -1,14 +1,27 @@
 from shared import time
-from datetime import timedelta
+from datetime import timedelta, datetime, timezone
 import asyncio
+import os
+import socket
 import uuid
+import zlib
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from time import monotonic as _monotonic
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+from google.cloud import firestore
 
 from adapters.whatsapp.cloudapi.cloud_api_adapter import CloudAPIAdapter
 
 from store.scheduled_messages_store import ScheduledMessageStore
 from store.delivery_mng_store import SendingStatusStore
+from shared.delivery_mng import SendingStatus
+from db.base import db
 from store.reminder_item_store import ReminderStore
 from store.user import UserStore
+from store.scheduler_state_store import SchedulerStateStore
 from shared.user import send_scheduled_message
 # + NEW import
 from store.task_item_store import TaskStore  # adjust path/name if different
@@ -45,38 +58,6 @@ def _iso(dt) -> str:
     except Exception:
         return str(dt)
 
-def _push_recent_outbound(user_id: str, entry: dict, kind: str):
-    """
-    Append `entry` to runtime.recent_outbound_messages (newest first, dedup by id),
-    cap to MAX_RECENT_OUTBOUND, and update mirrors:
-      - last_reminder_sent (for kind='reminder')
-      - last_scheduled_message_received (for kind='scheduled_message')
-    """
-    ustore = UserStore(user_id)
-    # Read current
-    try:
-        snap = ustore.doc_ref.get()
-        data = (snap.to_dict() or {})
-    except Exception:
-        data = {}
-    runtime = data.get("runtime", {}) or {}
-    existing = runtime.get("recent_outbound_messages") or []
-
-    # Dedup by id and prepend
-    filtered = [e for e in existing if e.get("id") != entry.get("id")]
-    new_list = [entry] + filtered
-    new_list = new_list[:MAX_RECENT_OUTBOUND]
-
-    # Build patch
-    patch = {"runtime": {"recent_outbound_messages": new_list}}
-    if kind == "reminder":
-        patch["runtime"]["last_reminder_sent"] = entry
-    elif kind == "scheduled_message":
-        patch["runtime"]["last_scheduled_message_received"] = entry
-
-    # Write (merge)
-    ustore.doc_ref.set(patch, merge=True)
-
 def _make_outbound_entry(*, kind: str, text: str, sent_at, related_type: str = "",
                         related_id: str = "", related_title: str = "",
                         target_chat_id: str, target_display_name: str = "",
@@ -95,246 +76,494 @@ def _make_outbound_entry(*, kind: str, text: str, sent_at, related_type: str = "
         },
     }
 
-async def trigger_events():
-    now = time.utcnow()
-    start = now - timedelta(minutes=10)
-    end = now
+# === Dispatcher: fetch -> send -> commit, overlapped ===
+SCHEDULER_CONCURRENCY = int(os.getenv("SCHEDULER_CONCURRENCY", "16"))
+RECIPIENT_MIN_INTERVAL = float(os.getenv("SCHEDULER_RECIPIENT_INTERVAL", "1.0"))  # seconds between sends to one chat
+BATCH_MAX_OPS = 400          # Firestore WriteBatch limit is 500
+COMMIT_INTERVAL = 0.5        # max seconds a finished item waits for its commit
+
+# === Claims / leases / watermarks (safe to run several replicas) ===
+LEASE_SECONDS = int(os.getenv("SCHEDULER_LEASE_SECONDS", "120"))
+WATERMARK_OVERLAP = timedelta(seconds=int(os.getenv("SCHEDULER_WATERMARK_OVERLAP", "60")))
+MAX_LOOKBACK = timedelta(minutes=10)   # items older than this are not retried (as before)
+SHARD_COUNT = max(1, int(os.getenv("SCHEDULER_SHARD_COUNT", "1")))
+SHARD_INDEX = int(os.getenv("SCHEDULER_SHARD_INDEX", "0")) % SHARD_COUNT
+WORKER_ID = os.getenv("SCHEDULER_WORKER_ID") or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+CLAIM_CHUNK = 100
+CLAIMABLE_STATUSES = {"pending", "failed", "open"}
+
+state_store = SchedulerStateStore(SHARD_INDEX, SHARD_COUNT)
+
+
+def _in_shard(user_id: str) -> bool:
+    # crc32, not hash(): must be stable across processes
+    return SHARD_COUNT == 1 or zlib.crc32(str(user_id).encode("utf-8")) % SHARD_COUNT == SHARD_INDEX
+
+
+@dataclass
+class _Dispatch:
+    item_type: str                      # "reminder" | "task" | "scheduled_message"
+    trig: dict
+    recipient: str                      # rate-limit key
+    item_ref: Any                       # item document (status field)
+    send: Callable[[], Awaitable[bool]]
+    span_name: str
+    metadata: dict
+    outbound: Optional[Callable[[], Tuple[str, dict]]] = None  # (kind, entry) on success
+    due_at: Any = None                  # trigger time (for the watermark)
+    success: bool = False
+
+    @property
+    def user_id(self) -> str:
+        return self.trig["user_id"]
+
+    @property
+    def item_id(self) -> str:
+        return self.trig["item_id"]
+
+    def status_ref(self):
+        return SendingStatusStore(self.user_id).collection.document(f"{self.item_type}_{self.item_id}")
+
+
+class _RecipientPacer:
+    """Serializes sends per recipient and spaces them by `min_interval` seconds."""
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._locks: dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._last: dict[str, float] = {}
+
+    @asynccontextmanager
+    async def slot(self, recipient: str):
+        async with self._locks[recipient]:
+            wait = self._last.get(recipient, 0.0) + self.min_interval - _monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                yield
+            finally:
+                self._last[recipient] = _monotonic()
+
+
+def _merge_recent_outbound(runtime: dict, entries: List[Tuple[str, dict]]) -> dict:
+    """Runtime patch prepending `entries` (oldest first) to recent_outbound_messages."""
+    current = runtime.get("recent_outbound_messages") or []
+    patch: dict = {}
+    for kind, entry in entries:
+        current = [entry] + [e for e in current if e.get("id") != entry.get("id")]
+        if kind == "reminder":
+            patch["last_reminder_sent"] = entry
+        elif kind == "scheduled_message":
+            patch["last_scheduled_message_received"] = entry
+    patch["recent_outbound_messages"] = current[:MAX_RECENT_OUTBOUND]
+    return patch
+
+
+def _claim(dispatches: List[_Dispatch]) -> Tuple[List[_Dispatch], List[_Dispatch]]:
+    """
+    Atomically lease items to this worker (lease_owner / lease_expires_at on the
+    item doc). Returns (claimed, held): held items are leased by another live
+    worker, or were already finished by one.
+    """
+    claimed: List[_Dispatch] = []
+    held: List[_Dispatch] = []
+
+    @firestore.transactional
+    def _claim_chunk(tx, chunk: List[_Dispatch]):
+        now = time.utcnow()
+        snaps = {snap.reference.path: snap for snap in tx.get_all([d.item_ref for d in chunk])}
+        won, lost = [], []
+        for d in chunk:
+            snap = snaps.get(d.item_ref.path)
+            data = (snap.to_dict() or {}) if snap is not None and snap.exists else None
+            if data is None or data.get("status") not in CLAIMABLE_STATUSES:
+                continue  # deleted, or finished by another worker
+            owner = data.get("lease_owner")
+            expires = data.get("lease_expires_at")
+            if owner and owner != WORKER_ID and expires and expires > now:
+                lost.append(d)
+                continue
+            tx.update(d.item_ref, {
+                "lease_owner": WORKER_ID,
+                "lease_expires_at": now + timedelta(seconds=LEASE_SECONDS),
+            })
+            won.append(d)
+        return won, lost
+
+    for i in range(0, len(dispatches), CLAIM_CHUNK):
+        won, lost = _claim_chunk(db.transaction(), dispatches[i:i + CLAIM_CHUNK])
+        claimed.extend(won)
+        held.extend(lost)
+    return claimed, held
+
+
+def _item_fields(d: _Dispatch, status: str) -> dict:
+    fields = {
+        "status": status,
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+        "lease_owner": firestore.DELETE_FIELD,
+        "lease_expires_at": firestore.DELETE_FIELD,
+    }
+    if d.item_type == "task" and status == "completed":
+        fields["completed"] = True
+    return fields
+
+
+def _mark_sending(dispatches: List[_Dispatch]) -> None:
+    """create_or_get + update(last_status='sending') for many items: one read, one batch."""
+    for i in range(0, len(dispatches), BATCH_MAX_OPS):
+        chunk = dispatches[i:i + BATCH_MAX_OPS]
+        refs = [d.status_ref() for d in chunk]
+        existing = {snap.reference.path for snap in db.get_all(refs) if snap.exists}
+        batch = db.batch()
+        now = time.utcnow()
+        for d, ref in zip(chunk, refs):
+            if ref.path in existing:
+                batch.set(ref, {"last_status": "sending", "last_attempt": now}, merge=True)
+            else:
+                status = SendingStatus(item_type=d.item_type, item_id=d.item_id, user_id=d.user_id).dict()
+                status.update(last_status="sending", last_attempt=now)
+                batch.set(ref, status)
+        batch.commit()
 
-    # --- Reminders handling (self) ---
-    reminder_store = ReminderStore()
-    reminder_triggerables = reminder_store.query_reminders(start, end)
 
-    if reminder_triggerables and len(reminder_triggerables) > 0:
-        print(
-            f"🔔 Found {len(reminder_triggerables)} reminders due between "
-            f"{start.isoformat()} and {end.isoformat()}"
+def _commit_results(dispatches: List[_Dispatch]) -> None:
+    """Status transitions + recent_outbound_messages for finished sends, in WriteBatches."""
+    now = time.utcnow()
+    ops: List[Tuple[str, Any, dict]] = []   # (op, ref, fields)
+    outbound: dict[str, List[Tuple[str, dict]]] = defaultdict(list)
+    for d in dispatches:
+        status_ref = d.status_ref()
+        if d.success:
+            ops.append(("set", status_ref, {"retry_count": 0, "last_status": "completed", "last_attempt": now}))
+            ops.append(("update", d.item_ref, _item_fields(d, "completed")))
+            if d.outbound:
+                kind, entry = d.outbound()
+                outbound[d.user_id].append((kind, entry))
+        else:
+            if d.item_type != "scheduled_message":
+                ops.append(("set", status_ref, {
+                    "retry_count": firestore.Increment(1),
+                    "last_status": "failed",
+                    "last_attempt": now,
+                }))
+            ops.append(("update", d.item_ref, _item_fields(d, "failed")))
+
+    if outbound:
+        user_refs = [UserStore(uid).doc_ref for uid in outbound]
+        for snap in db.get_all(user_refs):
+            runtime = ((snap.to_dict() or {}).get("runtime") or {}) if snap.exists else {}
+            patch = _merge_recent_outbound(runtime, outbound[snap.id])
+            ops.append(("set", snap.reference, {"runtime": patch}))
+
+    for i in range(0, len(ops), BATCH_MAX_OPS):
+        chunk = ops[i:i + BATCH_MAX_OPS]
+        batch = db.batch()
+        for op, ref, fields in chunk:
+            if op == "update":
+                batch.update(ref, fields)
+            else:
+                batch.set(ref, fields, merge=True)
+        try:
+            batch.commit()
+        except Exception as e:
+            # one missing/deleted item fails the whole batch; apply the rest one by one
+            print(f"⚠️ Scheduler batch commit failed ({e}); retrying {len(chunk)} writes individually")
+            for op, ref, fields in chunk:
+                try:
+                    if op == "update":
+                        ref.update(fields)
+                    else:
+                        ref.set(fields, merge=True)
+                except Exception as e2:
+                    print(f"❌ Scheduler write failed for {ref.path}: {e2}")
+
+
+# --- per-kind dispatch builders (same bodies/targets as before) ---
+def _reminder_dispatch(trig: dict, now, store: ReminderStore) -> _Dispatch:
+    title = (trig.get("title") or "").strip()
+    description = (trig.get("description") or "").strip()
+    body = title if not description else f"{title}\n{description}"
+
+    async def send() -> bool:
+        return await adapter.send_message(trig["user_id"], body)
+
+    def outbound():
+        return "reminder", _make_outbound_entry(
+            kind="reminder",
+            text=body,
+            sent_at=now,
+            related_type="reminder",
+            related_id=str(trig.get("item_id") or ""),
+            related_title=title,
+            target_chat_id=trig["user_id"],
+            target_display_name="",
+            owner_user_id=trig["user_id"],
         )
 
-    for trig in reminder_triggerables:
-        status_store = SendingStatusStore(trig["user_id"])
-        status_store.create_or_get(trig["item_id"], "reminder")
-        status_store.update(trig["item_id"], "reminder", last_status="sending")
-
-        title = (trig.get("title") or "").strip()
-        description = (trig.get("description") or "").strip()
-        body = title if not description else f"{title}\n{description}"
-
-        # ✅ Trace/span per reminder send
-        with span_attrs(
-            "scheduler.reminder.send",
-            kind="reminder",
-            user_id=str(trig["user_id"]),
-            item_id=str(trig["item_id"]),
-        ) as span:
-            try:
-                success = await adapter.send_message(trig["user_id"], body)
-            except Exception as e:
-                print(f"❌ Reminder send exception for {trig['item_id']}: {e}")
-                success = False
-                # mark as error at tracing level
-                mark_error(e, kind="SchedulerError.reminder_send", span=span)
-
-            # attach metadata about the attempt
-            span.update(
-                metadata={
-                    "success": bool(success),
-                    "target_chat_id": str(trig["user_id"]),
-                    "title": title,
-                    "has_description": bool(description),
-                    "body_len": len(body or ""),
+    return _Dispatch(
+        item_type="reminder",
+        trig=trig,
+        due_at=trig.get("datetime"),
+        recipient=trig["user_id"],
+        item_ref=store.collection.document(trig["item_id"]),
+        send=send,
+        span_name="scheduler.reminder.send",
+        metadata={
+            "target_chat_id": str(trig["user_id"]),
+            "title": title,
+            "has_description": bool(description),
+            "body_len": len(body or ""),
+        },
+        outbound=outbound,
+    )
+
+
+def _task_dispatch(trig: dict, now, store: TaskStore) -> _Dispatch:
+    title = (trig.get("title") or "").strip()
+    description = (trig.get("description") or "").strip()
+    body_lines = [f"✅ משימה לתשומת לבך: {title}"] if title else ["✅ משימה לתשומת לבך"]
+    if description:
+        body_lines.append(description)
+    id = trig["item_id"]
+    if id:
+        body_lines.append(f"ID: {id}")
+    due_iso = None
+    if trig.get("due"):
+        due_val = trig["due"]
+        due_iso = due_val.isoformat() if hasattr(due_val, "isoformat") else str(due_val)
+        body_lines.append(f"תאריך יעד: {due_iso}")
+    body = "\n".join(body_lines)
+
+    recipient_chat_id = (trig.get("assignee_chat_id") or trig["user_id"]).strip()
+    is_self = (recipient_chat_id == trig["user_id"])
+    kind = "reminder" if is_self else "scheduled_message"
+
+    async def send() -> bool:
+        success = await adapter.send_message(recipient_chat_id, body)
+        if success:
+            from agent.sessions import get_session
+
+            # Same session_id you use for normal runs:
+            session = get_session(trig["user_id"], trig["user_id"])
+
+            # Append an assistant message to the history
+            await session.add_items([
+                {
+                    "role": "assistant",
+                    "content": body,
                 }
-            )
-
-            if success:
-                status_store.reset_retry(trig["item_id"], "reminder")
-                status_store.update(trig["item_id"], "reminder", last_status="completed")
-                reminder_store.update_status(trig["user_id"], trig["item_id"], "completed")
-
-                entry = _make_outbound_entry(
-                    kind="reminder",
-                    text=body,
-                    sent_at=now,
-                    related_type="reminder",
-                    related_id=str(trig.get("item_id") or ""),
-                    related_title=title,
-                    target_chat_id=trig["user_id"],
-                    target_display_name="",
-                    owner_user_id=trig["user_id"],
-                )
-                _push_recent_outbound(trig["user_id"], entry, kind="reminder")
-            else:
-                retries = status_store.increment_retry(trig["item_id"], "reminder")
-                status_store.update(trig["item_id"], "reminder", last_status="failed")
-                reminder_store.update_status(trig["user_id"], trig["item_id"], "failed")
-
-            await asyncio.sleep(0.2)
-
+            ])
+        return success
+
+    def outbound():
+        return kind, _make_outbound_entry(
+            kind=kind,
+            text=body,
+            sent_at=now,
+            related_type="task",
+            related_id=str(trig.get("item_id") or ""),
+            related_title=title,
+            target_chat_id=recipient_chat_id,
+            target_display_name=(trig.get("assignee_name") or ""),
+            owner_user_id=trig["user_id"],
+        )
 
-    # --- Tasks (due) handling ---
-    task_store = TaskStore()
-    task_triggerables = task_store.query_tasks_due(start, end)
+    return _Dispatch(
+        item_type="task",
+        trig=trig,
+        due_at=trig.get("due"),
+        recipient=recipient_chat_id,
+        item_ref=store.collection.document(trig["item_id"]),
+        send=send,
+        span_name="scheduler.task.send",
+        metadata={
+            "target_chat_id": recipient_chat_id,
+            "is_self": is_self,
+            "title": title,
+            "has_description": bool(description),
+            "body_len": len(body or ""),
+            "due": due_iso,
+            "item_id": trig["item_id"],
+        },
+        outbound=outbound,
+    )
+
+
+def _scheduled_message_dispatch(trig: dict, now, store: ScheduledMessageStore) -> _Dispatch:
+    async def send() -> bool:
+        if trig["recipient_chat_id"] == trig["user_id"] + "@c.us":
+            return await adapter.send_message(trig["user_id"], trig.get("message"))
+        await send_scheduled_message(
+            trig["user_id"],
+            trig.get("message"),
+            trig["recipient_chat_id"],
+            trig.get("recipient_name"),
+            trig.get("sender_name"),
+        )
+        return True
 
-    if task_triggerables and len(task_triggerables) > 0:
-        print(
-            f"🔔 Found {len(task_triggerables)} tasks due between "
-            f"{start.isoformat()} and {end.isoformat()}"
+    def outbound():
+        return "scheduled_message", _make_outbound_entry(
+            kind="scheduled_message",
+            text=str(trig.get("message") or ""),
+            sent_at=now,
+            related_type="message",
+            related_id=str(trig.get("item_id") or ""),
+            related_title=str(trig.get("title") or ""),
+            target_chat_id=str(trig.get("recipient_chat_id") or ""),
+            target_display_name=str(trig.get("recipient_name") or ""),
+            owner_user_id=trig["user_id"],
         )
 
-    for trig in task_triggerables:
-        status_store = SendingStatusStore(trig["user_id"])
-        status_store.create_or_get(trig["item_id"], "task")
-        status_store.update(trig["item_id"], "task", last_status="sending")
-
-        title = (trig.get("title") or "").strip()
-        description = (trig.get("description") or "").strip()
-        body_lines = [f"✅ משימה לתשומת לבך: {title}"] if title else ["✅ משימה לתשומת לבך"]
-        if description:
-            body_lines.append(description)
-        id = trig["item_id"]
-        if id:
-            body_lines.append(f"ID: {id}")
-        if trig.get("due"):
-            due_val = trig["due"]
-            due_iso = due_val.isoformat() if hasattr(due_val, "isoformat") else str(due_val)
-            body_lines.append(f"תאריך יעד: {due_iso}")
-        body = "\n".join(body_lines)
-
-        recipient_chat_id = (trig.get("assignee_chat_id") or trig["user_id"]).strip()
-        is_self = (recipient_chat_id == trig["user_id"])
-        kind = "reminder" if is_self else "scheduled_message"
+    return _Dispatch(
+        item_type="scheduled_message",
+        trig=trig,
+        due_at=trig.get("scheduled_time"),
+        recipient=str(trig.get("recipient_chat_id") or trig["user_id"]),
+        item_ref=store.collection.document(trig["item_id"]),
+        send=send,
+        span_name="scheduler.scheduled_message.send",
+        metadata={
+            "target_chat_id": str(trig.get("recipient_chat_id") or ""),
+            "recipient_name": str(trig.get("recipient_name") or ""),
+            "message_len": len(str(trig.get("message") or "")),
+        },
+        outbound=outbound,
+    )
+
 
+async def _send_one(d: _Dispatch, pacer: _RecipientPacer) -> None:
+    async with pacer.slot(d.recipient):
         with span_attrs(
-            "scheduler.task.send",
-            kind="task",
-            user_id=str(trig["user_id"]),
-            item_id=str(trig["item_id"]),
+            d.span_name,
+            kind=d.item_type,
+            user_id=str(d.user_id),
+            item_id=str(d.item_id),
         ) as span:
             try:
-                success = await adapter.send_message(recipient_chat_id, body)
-                if success:
-                    from agent.sessions import get_session
-
-                    # Same session_id you use for normal runs:
-                    session = get_session(trig["user_id"], trig["user_id"])
-
-                    # Append an assistant message to the history
-                    await session.add_items([
-                        {
-                            "role": "assistant",
-                            "content": body,
-                        }
-                    ])
-
+                d.success = bool(await d.send())
             except Exception as e:
-                print(f"❌ Task send exception for {trig['item_id']}: {e}")
-                success = False
-                mark_error(e, kind="SchedulerError.task_send", span=span)
-
-            span.update(
-                metadata={
-                    "success": bool(success),
-                    "target_chat_id": recipient_chat_id,
-                    "is_self": is_self,
-                    "title": title,
-                    "has_description": bool(description),
-                    "body_len": len(body or ""),
-                    "due": due_iso if trig.get("due") else None,
-                    "item_id": trig["item_id"],
-                }
-            )
-
-            if success:
-                status_store.reset_retry(trig["item_id"], "task")
-                status_store.update(trig["item_id"], "task", last_status="completed")
-                task_store.update_status(trig["user_id"], trig["item_id"], "completed")
-
-                entry = _make_outbound_entry(
-                    kind=kind,
-                    text=body,
-                    sent_at=now,
-                    related_type="task",
-                    related_id=str(trig.get("item_id") or ""),
-                    related_title=title,
-                    target_chat_id=recipient_chat_id,
-                    target_display_name=(trig.get("assignee_name") or ""),
-                    owner_user_id=trig["user_id"],
-                )
-                _push_recent_outbound(trig["user_id"], entry, kind=kind)
-            else:
-                retries = status_store.increment_retry(trig["item_id"], "task")
-                status_store.update(trig["item_id"], "task", last_status="failed")
-                task_store.update_status(trig["user_id"], trig["item_id"], "failed")
+                print(f"❌ {d.item_type} send exception for {d.item_id}: {e}")
+                d.success = False
+                mark_error(e, kind=f"SchedulerError.{d.item_type}_send", span=span)
+            span.update(metadata={"success": d.success, **d.metadata})
+
+
+async def _committer(done: "asyncio.Queue[Optional[_Dispatch]]") -> None:
+    """Drains finished sends and commits them in batches while sending continues."""
+    finished = False
+    while not finished:
+        pending: List[_Dispatch] = []
+        item = await done.get()
+        if item is None:
+            finished = True
+        else:
+            pending.append(item)
+            deadline = _monotonic() + COMMIT_INTERVAL
+            while len(pending) < BATCH_MAX_OPS // 3:
+                timeout = deadline - _monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(done.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    finished = True
+                    break
+                pending.append(item)
+        if pending:
+            await asyncio.to_thread(_commit_results, pending)
+
+
+def _window_start(watermark, now):
+    """Scan from the watermark (minus a small overlap for late writes), never further back than MAX_LOOKBACK."""
+    floor = now - MAX_LOOKBACK
+    if not isinstance(watermark, datetime):
+        return floor
+    return max(floor, min(watermark, now - WATERMARK_OVERLAP))
+
+
+def _next_watermark(unfinished: List[_Dispatch], now):
+    """Low-water mark: the oldest item still to be (re)tried, else the end of this window."""
+    times = [d.due_at for d in unfinished if isinstance(d.due_at, datetime)]
+    return max(now - MAX_LOOKBACK, min(times + [now]))
 
-            await asyncio.sleep(0.2)
 
+async def trigger_events():
+    now = time.utcnow()
+    end = now
 
-    # --- ScheduledMessage handling (to contacts/groups) ---
+    reminder_store = ReminderStore()
+    task_store = TaskStore()
     sched_store = ScheduledMessageStore()
-    sched_triggerables = sched_store.query_scheduled_messages(start, end)
-    if sched_triggerables and len(sched_triggerables) > 0:
+
+    sources = [
+        ("reminder", "reminders", reminder_store.query_reminders,
+         lambda t: _reminder_dispatch(t, now, reminder_store)),
+        ("task", "tasks", task_store.query_tasks_due,
+         lambda t: _task_dispatch(t, now, task_store)),
+        ("scheduled_message", "scheduled messages", sched_store.query_scheduled_messages,
+         lambda t: _scheduled_message_dispatch(t, now, sched_store)),
+    ]
+    watermarks = await asyncio.to_thread(state_store.get_watermarks, [src[0] for src in sources])
+
+    todo: "asyncio.Queue[Optional[_Dispatch]]" = asyncio.Queue()
+    done: "asyncio.Queue[Optional[_Dispatch]]" = asyncio.Queue()
+    pacer = _RecipientPacer(RECIPIENT_MIN_INTERVAL)
+    tick: dict[str, Tuple[List[_Dispatch], List[_Dispatch]]] = {}  # kind -> (claimed, held)
+
+    async def fetch(kind, label, query, build):
+        # each source starts sending as soon as its own query + claim + 'sending' batch land
+        start = _window_start(watermarks.get(kind), now)
+        triggerables = await asyncio.to_thread(query, start, end)
+        triggerables = [t for t in triggerables or [] if _in_shard(t.get("user_id", ""))]
+        if not triggerables:
+            tick[kind] = ([], [])
+            return
         print(
-            f"🔔 Found {len(sched_triggerables)} scheduled messages due between "
+            f"🔔 Found {len(triggerables)} {label} due between "
             f"{start.isoformat()} and {end.isoformat()}"
         )
-
-    for trig in sched_triggerables:
-        status_store = SendingStatusStore(trig["user_id"])
-        status_store.create_or_get(trig["item_id"], "scheduled_message")
-        status_store.update(trig["item_id"], "scheduled_message", last_status="sending")
-
-        with span_attrs(
-            "scheduler.scheduled_message.send",
-            kind="scheduled_message",
-            user_id=str(trig["user_id"]),
-            item_id=str(trig["item_id"]),
-        ) as span:
+        claimed, held = await asyncio.to_thread(_claim, [build(t) for t in triggerables])
+        tick[kind] = (claimed, held)
+        if not claimed:
+            return
+        await asyncio.to_thread(_mark_sending, claimed)
+        for d in claimed:
+            todo.put_nowait(d)
+
+    async def sender():
+        while True:
+            d = await todo.get()
+            if d is None:
+                return
             try:
-                if trig["recipient_chat_id"] == trig["user_id"] + "@c.us":
-                    success = await adapter.send_message(trig["user_id"], trig.get("message"))
-                else:
-                    result = await send_scheduled_message(
-                        trig["user_id"],
-                        trig.get("message"),
-                        trig["recipient_chat_id"],
-                        trig.get("recipient_name"),
-                        trig.get("sender_name"),
-                    )
-                    success = True
+                await _send_one(d, pacer)
             except Exception as e:
-                print(f"❌ Echo fallback send failed for {trig['item_id']}: {e}")
-                success = False
-                mark_error(e, kind="SchedulerError.scheduled_message_send", span=span)
-
-            span.update(
-                metadata={
-                    "success": bool(success),
-                    "target_chat_id": str(trig.get("recipient_chat_id") or ""),
-                    "recipient_name": str(trig.get("recipient_name") or ""),
-                    "message_len": len(str(trig.get("message") or "")),
-                }
-            )
-
-            if success:
-                status_store.reset_retry(trig["item_id"], "scheduled_message")
-                status_store.update(trig["item_id"], "scheduled_message", last_status="completed")
-                sched_store.update_status(trig["item_id"], "completed")
-
-                entry = _make_outbound_entry(
-                    kind="scheduled_message",
-                    text=str(trig.get("message") or ""),
-                    sent_at=now,
-                    related_type="message",
-                    related_id=str(trig.get("item_id") or ""),
-                    related_title=str(trig.get("title") or ""),
-                    target_chat_id=str(trig.get("recipient_chat_id") or ""),
-                    target_display_name=str(trig.get("recipient_name") or ""),
-                    owner_user_id=trig["user_id"],
-                )
-                _push_recent_outbound(trig["user_id"], entry, kind="scheduled_message")
-            else:
-                sched_store.update_status(trig["item_id"], "failed")
+                print(f"❌ Scheduler dispatch error for {d.item_id}: {e}")
+            done.put_nowait(d)
 
-            await asyncio.sleep(0.2)
+    committer = asyncio.create_task(_committer(done))
+    senders = [asyncio.create_task(sender()) for _ in range(SCHEDULER_CONCURRENCY)]
+    try:
+        results = await asyncio.gather(*(fetch(*src) for src in sources), return_exceptions=True)
+        for (_, label, _, _), res in zip(sources, results):
+            if isinstance(res, Exception):
+                print(f"❌ Scheduler fetch failed for {label}: {res}")
+    finally:
+        for _ in senders:
+            todo.put_nowait(None)
+        await asyncio.gather(*senders, return_exceptions=True)
+        done.put_nowait(None)
+        await committer
+
+    # advance only kinds whose scan completed; failed and foreign-leased items hold it back
+    await asyncio.to_thread(state_store.set_watermarks, {
+        kind: _next_watermark([d for d in claimed if not d.success] + held, now)
+        for kind, (claimed, held) in tick.items()
+    })
 
 async def wait_or_stop(stop_event: asyncio.Event, timeout: float) -> None:
     if stop_event.is_set():
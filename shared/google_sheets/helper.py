@@ -5,7 +5,7 @@ from typing import Any, Dict, List
 
 from google.oauth2.service_account import Credentials
 from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
+from shared.google_sheets.order_sink import order_sink
 from shared.time import to_user_timezone
 logger = logging.getLogger(__name__)
 
@@ -69,50 +69,13 @@ def _orders_to_rows(payload: Dict[str, Any]) -> List[List[Any]]:
         rows.append(row)
     return rows
 
-def _append_rows_sync(rows: List[List[Any]]) -> bool:
-    """Blocking Sheets API call (runs in thread)."""
-    if not rows:
-        logger.info("[sheets] no rows to write")
-        return True
-    svc = _sheets_service()
-    rng = f"{SHEET_NAME}!A1"   # append ignores start cell; header expected in row 1
-    body = {
-        "range": rng,
-        "majorDimension": "ROWS",
-        "values": rows,
-    }
-    try:
-        resp = (
-            svc.spreadsheets()
-            .values()
-            .append(
-                spreadsheetId=SPREADSHEET_ID,
-                range=rng,
-                valueInputOption="USER_ENTERED",   # respects checkbox/number formatting
-                insertDataOption="INSERT_ROWS",
-                includeValuesInResponse=False,
-                body=body,
-            )
-            .execute()
-        )
-        updates = ((resp or {}).get("updates") or {})
-        written = updates.get("updatedRows", 0)
-        logger.info("[sheets] appended rows=%s", written)
-        return bool(written)
-    except HttpError as e:
-        logger.exception("[sheets] HttpError: %s", getattr(e, "content", e))
-        return False
-    except Exception as e:
-        logger.exception("[sheets] unexpected error: %s", e)
-        return False
-
 # === REPLACEMENT for your previous webhook POST ===
 async def _send_orders_async(payload: Dict[str, Any]) -> bool:
     """Append payload['orders'] to Google Sheet via Sheets API (service account)."""
     try:
         rows = _orders_to_rows(payload)
-        # run blocking client in a worker thread
-        return await asyncio.to_thread(_append_rows_sync, rows)
+        # spooled, batched and retried by the sink (see order_sink.py)
+        return await order_sink(SPREADSHEET_ID, SHEET_NAME).submit(rows)
     except Exception as e:
         logger.exception("[sheets] send failed: %s", e)
         return False
@@ -0,0 +1,457 @@
+# shared/google_sheets/order_sink.py
+"""
+Batched, retrying writer of extracted order rows to Google Sheets.
+
+_send_orders_async / _send_orders_async2 used to issue one
+spreadsheets().values().append per WhatsApp message and drop the rows on any
+HttpError. Rows now go through an OrderRowSink per (spreadsheet, tab):
+
+  submit(rows)  -> rows are committed to a local SQLite spool (WAL) first,
+                   so an accepted row survives errors, restarts and redeploys
+  flusher task  -> waits ORDER_SINK_WINDOW_S after the first pending row,
+                   then appends everything pending (up to ORDER_SINK_MAX_BATCH
+                   rows) in ONE append call; 429 / 5xx / network errors are
+                   retried with exponential backoff + full jitter (honouring
+                   Retry-After); rows leave the spool only once the append
+                   succeeded
+  401/403/404   -> a configuration problem (access revoked, sheet or tab
+                   gone): every row would fail, so all rows stay pending and
+                   the sink pauses with a growing backoff (ORDER_SINK_CONFIG_
+                   BACKOFF_*) instead of spending quota on them
+  other 4xx     -> the batch is bisected; rows are declared bad (moved to the
+                   dead state, kept in the spool, counted in the stats) only
+                   once another part of the batch was accepted. If both halves
+                   are rejected as well, or a single pending row is, the error
+                   is treated as a configuration problem too
+
+Rows still spooled at startup (crash, shutdown during an outage) are sent by
+start_order_sinks(); close_order_sinks() lets an append already running in its
+thread settle and makes a last flush attempt at shutdown. A retried append whose first attempt actually landed can write a
+row twice; the Sheets append API has no idempotency key.
+
+Backlog, delivery and flush latency: order_sink_stats().
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ORDER_SINK_WINDOW_S = float(os.getenv("ORDER_SINK_WINDOW_S", "1.0"))
+ORDER_SINK_MAX_BATCH = int(os.getenv("ORDER_SINK_MAX_BATCH", "500"))
+ORDER_SINK_MAX_ATTEMPTS = int(os.getenv("ORDER_SINK_MAX_ATTEMPTS", "6"))  # per flush; then wait for the next one
+ORDER_SINK_BACKOFF_BASE_S = 1.0
+ORDER_SINK_BACKOFF_MAX_S = 60.0
+ORDER_SINK_RETRY_IDLE_S = 30.0  # how soon rows left by a failed flush are tried again
+ORDER_SINK_CONFIG_BACKOFF_BASE_S = 60.0
+ORDER_SINK_CONFIG_BACKOFF_MAX_S = 1800.0
+ORDER_SINK_SPOOL_PATH = os.getenv("ORDER_SINK_SPOOL_PATH", "order_sink.sqlite3")
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+CONFIG_FAILURE_STATUS = {401, 403, 404}  # no row of the batch can succeed
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rows (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    target      TEXT NOT NULL,               -- "<spreadsheet id>|<tab>"
+    row         TEXT NOT NULL,
+    enqueued_at REAL NOT NULL,
+    state       TEXT NOT NULL DEFAULT 'pending',   -- pending | dead
+    last_error  TEXT
+);
+CREATE INDEX IF NOT EXISTS rows_pending_idx ON rows (target, state, id);
+"""
+
+
+class RowSpool:
+    """Durable FIFO of sheet rows per target in a local SQLite file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def add(self, target: str, rows: List[List[Any]]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO rows (target, row, enqueued_at) VALUES (?, ?, ?)",
+                    [(target, json.dumps(r, ensure_ascii=False, default=str), now) for r in rows],
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def pending(self, target: str, limit: int) -> List[Tuple[int, List[Any], float]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, row, enqueued_at FROM rows WHERE target = ? AND state = 'pending' ORDER BY id LIMIT ?",
+                (target, limit),
+            ).fetchall()
+        return [(r[0], json.loads(r[1]), r[2]) for r in rows]
+
+    def delete(self, ids: List[int]) -> None:
+        with self._lock:
+            self._conn.executemany("DELETE FROM rows WHERE id = ?", [(i,) for i in ids])
+
+    def mark_dead(self, ids: List[int], error: str) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE rows SET state = 'dead', last_error = ? WHERE id = ?", [(error, i) for i in ids]
+            )
+
+    def targets(self) -> List[str]:
+        with self._lock:
+            return [r[0] for r in self._conn.execute("SELECT DISTINCT target FROM rows WHERE state = 'pending'")]
+
+    def stats(self, target: str) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._conn.execute(
+                "SELECT state, COUNT(*) FROM rows WHERE target = ? GROUP BY state", (target,)
+            ).fetchall())
+            (oldest,) = self._conn.execute(
+                "SELECT MIN(enqueued_at) FROM rows WHERE target = ? AND state = 'pending'", (target,)
+            ).fetchone()
+        return {
+            "backlog": counts.get("pending", 0),
+            "dead_rows": counts.get("dead", 0),
+            "oldest_pending_s": round(time.time() - oldest, 1) if oldest else 0.0,
+        }
+
+
+def _http_status(e: Exception) -> Optional[int]:
+    status = getattr(e, "status_code", None) or getattr(getattr(e, "resp", None), "status", None)
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _retry_after(e: Exception) -> Optional[float]:
+    resp = getattr(e, "resp", None)
+    value = resp.get("retry-after") if hasattr(resp, "get") else None
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff(attempt: int) -> float:
+    return random.uniform(0, min(ORDER_SINK_BACKOFF_MAX_S, ORDER_SINK_BACKOFF_BASE_S * 2 ** attempt))
+
+
+def _error_text(e: Exception) -> str:
+    return str(getattr(e, "content", e))[:500]
+
+
+class _Rejected(Exception):
+    """A batch refused with a non-retryable status that may be caused by its rows."""
+
+    def __init__(self, error: Exception):
+        super().__init__(str(error))
+        self.error = error
+
+
+class OrderRowSink:
+    def __init__(self, spreadsheet_id: str, sheet_name: str, spool: RowSpool,
+                 append_fn: Optional[Callable[[str, str, List[List[Any]]], int]] = None):
+        self.spreadsheet_id = spreadsheet_id
+        self.sheet_name = sheet_name
+        self.target = f"{spreadsheet_id}|{sheet_name}"
+        self.spool = spool
+        self.append_fn = append_fn or _append_rows
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._paused_until = 0.0  # monotonic; set by configuration failures
+        self._config_failures = 0  # consecutive
+        self.last_error: Optional[str] = None
+        self._stats: Dict[str, float] = {
+            "submitted_rows": 0,
+            "rows_sent": 0,
+            "batches": 0,
+            "retries": 0,
+            "failed_flushes": 0,
+            "config_failures": 0,
+            "dead_rows_marked": 0,
+            "flush_ms_total": 0.0,
+            "flush_ms_max": 0.0,
+            "delivery_ms_total": 0.0,
+        }
+
+    # -- producer side --------------------------------------------------
+    async def submit(self, rows: List[List[Any]]) -> bool:
+        """Durably accept rows for delivery. False only if they could not even be spooled."""
+        if not rows:
+            logger.info("[sheets] no rows to write")
+            return True
+        try:
+            await asyncio.to_thread(self.spool.add, self.target, rows)
+        except Exception as e:
+            logger.exception("[sheets] spooling %d rows failed: %s", len(rows), e)
+            return False
+        self._stats["submitted_rows"] += len(rows)
+        self.ensure_flusher()
+        self._wake.set()
+        return True
+
+    def ensure_flusher(self) -> None:
+        """Start the flusher task on the running loop (again, if an earlier loop went away)."""
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._task.get_loop() is loop:
+            return
+        self._wake = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = loop.create_task(self._run(), name=f"order_sink:{self.sheet_name}")
+        self._wake.set()  # rows may already be waiting in the spool
+
+    # -- flusher --------------------------------------------------------
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=ORDER_SINK_RETRY_IDLE_S)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await asyncio.sleep(ORDER_SINK_WINDOW_S)  # micro-batch window: let the burst arrive
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("[sheets] flush of %s failed", self.sheet_name)
+
+    async def flush(self) -> int:
+        """Send everything pending; returns the number of rows delivered."""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        sent = 0
+        async with self._flush_lock:
+            while True:
+                if time.monotonic() < self._paused_until:
+                    return sent  # configuration failure: rows wait for the backoff
+                batch = await asyncio.to_thread(self.spool.pending, self.target, ORDER_SINK_MAX_BATCH)
+                if not batch:
+                    return sent
+                delivered = await self._send(batch)
+                if delivered is None:
+                    self._stats["failed_flushes"] += 1
+                    return sent  # rows stay spooled; the flusher tries again later
+                sent += delivered
+
+    async def _send(self, batch: List[Tuple[int, List[Any], float]]) -> Optional[int]:
+        """Deliver a batch; None when rows were left pending (retries exhausted, configuration failure)."""
+        try:
+            return await self._deliver(batch)
+        except _Rejected as r:
+            return await self._isolate(batch, r.error)
+
+    async def _deliver(self, batch: List[Tuple[int, List[Any], float]]) -> Optional[int]:
+        """One batch with retries. Raises _Rejected on a non-retryable, possibly row-caused 4xx."""
+        ids = [b[0] for b in batch]
+        rows = [b[1] for b in batch]
+        start = time.perf_counter()
+        for attempt in range(ORDER_SINK_MAX_ATTEMPTS):
+            try:
+                await self._append(ids, rows)
+            except Exception as e:
+                status = _http_status(e)
+                if status in CONFIG_FAILURE_STATUS:
+                    return self._config_failure(e)
+                if status is not None and status not in RETRYABLE_STATUS:
+                    raise _Rejected(e)
+                delay = _retry_after(e) or _backoff(attempt)
+                self._stats["retries"] += 1
+                logger.warning("[sheets] append of %d rows failed (%s, status=%s); retry in %.1fs",
+                               len(rows), type(e).__name__, status, delay)
+                await asyncio.sleep(delay)
+                continue
+            # synchronous (a local WAL write): a cancellation here must not
+            # leave delivered rows pending for the shutdown flush
+            self.spool.delete(ids)
+            self._config_failures = 0
+            self._record_delivery(batch, (time.perf_counter() - start) * 1000)
+            logger.info("[sheets] appended rows=%s to %s", len(rows), self.sheet_name)
+            return len(rows)
+        logger.error("[sheets] append of %d rows to %s still failing after %d attempts; kept in spool",
+                     len(rows), self.sheet_name, ORDER_SINK_MAX_ATTEMPTS)
+        return None
+
+    async def _append(self, ids: List[int], rows: List[List[Any]]) -> None:
+        append = asyncio.ensure_future(
+            asyncio.to_thread(self.append_fn, self.spreadsheet_id, self.sheet_name, rows)
+        )
+        try:
+            await asyncio.shield(append)
+        except asyncio.CancelledError:
+            # shutdown: the append keeps running in its thread. Settle it while
+            # still holding the flush lock, so close_order_sinks' final flush
+            # does not send rows that already landed.
+            await asyncio.wait({append})
+            if append.exception() is None:
+                await asyncio.to_thread(self.spool.delete, ids)
+            raise
+
+    async def _isolate(self, batch: List[Tuple[int, List[Any], float]], error: Exception) -> Optional[int]:
+        """A rejected batch: bisect, but only blame rows once part of the batch was accepted."""
+        if len(batch) == 1:
+            return self._config_failure(error)  # nothing to compare the row with
+        mid = len(batch) // 2
+        delivered = 0
+        rejected = []
+        for half in (batch[:mid], batch[mid:]):
+            try:
+                n = await self._deliver(half)
+            except _Rejected as r:
+                rejected.append((half, r.error))
+                continue
+            if n is None:
+                return None
+            delivered += n
+        if len(rejected) == 2:
+            return self._config_failure(error)  # batch-wide (e.g. a renamed tab), not a bad row
+        for half, half_error in rejected:
+            n = await self._narrow(half, half_error)
+            if n is None:
+                return None
+            delivered += n
+        return delivered
+
+    async def _narrow(self, batch: List[Tuple[int, List[Any], float]], error: Exception) -> Optional[int]:
+        """Bisect a rejected part of a batch whose other rows were accepted down to the bad rows."""
+        if len(batch) == 1:
+            await asyncio.to_thread(self.spool.mark_dead, [batch[0][0]], _error_text(error))
+            self._stats["dead_rows_marked"] += 1
+            logger.error("[sheets] row rejected by the API, moved to dead: %s", _error_text(error))
+            return 0
+        mid = len(batch) // 2
+        delivered = 0
+        for half in (batch[:mid], batch[mid:]):
+            try:
+                n = await self._deliver(half)
+            except _Rejected as r:
+                n = await self._narrow(half, r.error)
+            if n is None:
+                return None
+            delivered += n
+        return delivered
+
+    def _config_failure(self, error: Exception) -> Optional[int]:
+        """Keep every row pending and pause the sink: retrying or bisecting would only burn quota."""
+        delay = min(ORDER_SINK_CONFIG_BACKOFF_MAX_S, ORDER_SINK_CONFIG_BACKOFF_BASE_S * 2 ** self._config_failures)
+        self._config_failures += 1
+        self._stats["config_failures"] += 1
+        self._paused_until = time.monotonic() + delay
+        self.last_error = _error_text(error)
+        logger.error("[sheets] %s rejected the append (status=%s): %s; rows kept, next attempt in %.0fs",
+                     self.sheet_name, _http_status(error), self.last_error, delay)
+        return None
+
+    def _record_delivery(self, batch: List[Tuple[int, List[Any], float]], flush_ms: float) -> None:
+        now = time.time()
+        st = self._stats
+        st["batches"] += 1
+        st["rows_sent"] += len(batch)
+        st["flush_ms_total"] += flush_ms
+        st["flush_ms_max"] = max(st["flush_ms_max"], flush_ms)
+        st["delivery_ms_total"] += sum((now - b[2]) * 1000 for b in batch)
+
+    def stats(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = dict(self._stats)
+        out.update(self.spool.stats(self.target))
+        out["paused_for_s"] = round(max(0.0, self._paused_until - time.monotonic()), 1)
+        out["last_error"] = self.last_error
+        if out["batches"]:
+            out["flush_ms_avg"] = round(out["flush_ms_total"] / out["batches"], 1)
+            out["rows_per_batch_avg"] = round(out["rows_sent"] / out["batches"], 1)
+        if out["rows_sent"]:
+            # submit -> row in the sheet, including the batching window and retries
+            out["delivery_ms_avg"] = round(out["delivery_ms_total"] / out["rows_sent"], 1)
+        return out
+
+
+def _append_rows(spreadsheet_id: str, sheet_name: str, rows: List[List[Any]]) -> int:
+    """Blocking Sheets API append (runs in a worker thread); raises on failure."""
+    from shared.google_sheets.helper import _sheets_service
+
+    rng = f"{sheet_name}!A1"   # append ignores start cell; header expected in row 1
+    resp = (
+        _sheets_service().spreadsheets()
+        .values()
+        .append(
+            spreadsheetId=spreadsheet_id,
+            range=rng,
+            valueInputOption="USER_ENTERED",   # respects checkbox/number formatting
+            insertDataOption="INSERT_ROWS",
+            includeValuesInResponse=False,
+            body={"range": rng, "majorDimension": "ROWS", "values": rows},
+        )
+        .execute()
+    )
+    return ((resp or {}).get("updates") or {}).get("updatedRows", 0)
+
+
+# ----------------------------------------------------------------------
+# registry
+# ----------------------------------------------------------------------
+_spool: Optional[RowSpool] = None
+_sinks: Dict[str, OrderRowSink] = {}
+_registry_lock = threading.Lock()
+
+
+def order_sink(spreadsheet_id: str, sheet_name: str) -> OrderRowSink:
+    global _spool
+    target = f"{spreadsheet_id}|{sheet_name}"
+    with _registry_lock:
+        sink = _sinks.get(target)
+        if sink is None:
+            if _spool is None:
+                _spool = RowSpool(ORDER_SINK_SPOOL_PATH)
+            sink = _sinks[target] = OrderRowSink(spreadsheet_id, sheet_name, _spool)
+        return sink
+
+
+async def start_order_sinks() -> None:
+    """Resume delivery of rows left in the spool by a previous process."""
+    global _spool
+    if _spool is None:
+        _spool = RowSpool(ORDER_SINK_SPOOL_PATH)
+    for target in await asyncio.to_thread(_spool.targets):
+        spreadsheet_id, _, sheet_name = target.partition("|")
+        order_sink(spreadsheet_id, sheet_name).ensure_flusher()
+
+
+async def close_order_sinks(timeout: float = 5.0) -> None:
+    """Last flush at shutdown; whatever does not make it stays spooled for the next start."""
+    sinks = list(_sinks.values())
+    tasks = [s._task for s in sinks if s._task is not None]
+    for task in tasks:
+        task.cancel()  # an append in flight settles first (see OrderRowSink._append)
+    try:
+        await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), timeout)
+    except asyncio.TimeoutError:
+        logger.warning("[sheets] in-flight append still running at shutdown; its rows stay in %s",
+                       ORDER_SINK_SPOOL_PATH)
+        return
+    try:
+        await asyncio.wait_for(asyncio.gather(*(s.flush() for s in sinks), return_exceptions=True), timeout)
+    except asyncio.TimeoutError:
+        logger.warning("[sheets] shutdown flush timed out; rows stay in %s", ORDER_SINK_SPOOL_PATH)
+
+
+def order_sink_stats() -> Dict[str, Any]:
+    return {sink.sheet_name: sink.stats() for sink in list(_sinks.values())}
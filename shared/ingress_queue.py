@@ -0,0 +1,389 @@
+# shared/ingress_queue.py
+"""
+Durable ingress queue for incoming WhatsApp Cloud API messages.
+
+The webhook enqueues one job per message id; the worker pool claims jobs,
+and acks them when the turn is done or nacks them on failure. Jobs that keep
+failing are moved to a dead-letter table.
+
+A turn has side effects (the "on it" ack, tool calls, the reply), so a job is
+attempted once by default (INGRESS_MAX_ATTEMPTS). Jobs that run again anyway
+(claimed by a process that died) carry the steps recorded with `mark()` in
+`QueuedJob.progress`, and the worker skips the steps already done.
+
+Backends:
+  - SQLiteIngressQueue (default): WAL journal, survives restarts/redeploys.
+    Acked jobs stay in the log until the dedupe window expires, so Meta's
+    retries of an already processed `mid` are rejected after a restart too.
+  - InMemoryIngressQueue: the old deque/dict behaviour (tests, local runs).
+
+Select with INGRESS_QUEUE_BACKEND=sqlite|memory and INGRESS_QUEUE_PATH.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from dedupe.cache import IdempotencyCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEDUPE_TTL_SECONDS = 48 * 3600
+DEFAULT_VISIBILITY_TIMEOUT = 300.0
+DEFAULT_MAX_ATTEMPTS = 1  # turns are not idempotent; see module docstring
+
+
+@dataclass
+class QueuedJob:
+    id: int
+    key: str
+    payload: Dict[str, Any]
+    attempts: int
+    progress: Dict[str, Any] = field(default_factory=dict)
+
+
+class IngressQueue:
+    """Interface shared by all backends."""
+
+    def enqueue(self, key: str, payload: Dict[str, Any]) -> bool:
+        """Append a job. Returns False if `key` was already seen (duplicate)."""
+        raise NotImplementedError
+
+    def claim(self, limit: int = 32) -> List[QueuedJob]:
+        """Claim up to `limit` visible jobs in FIFO order (hidden for visibility_timeout)."""
+        raise NotImplementedError
+
+    def ack(self, job_id: int) -> None:
+        raise NotImplementedError
+
+    def nack(self, job_id: int, error: str = "", delay: float = 5.0) -> None:
+        """Release a job for retry, or dead-letter it after max_attempts."""
+        raise NotImplementedError
+
+    def mark(self, job_id: int, progress: Dict[str, Any]) -> None:
+        """Record finished steps of a claimed job (merged into its progress)."""
+        raise NotImplementedError
+
+    def recover(self) -> int:
+        """Make jobs claimed by a previous (dead) process visible again."""
+        return 0
+
+    def flush(self) -> None:
+        """Force buffered writes to disk."""
+
+    def maybe_flush(self) -> None:
+        """Flush if the batching interval elapsed."""
+
+    def prune(self) -> int:
+        """Drop acked jobs older than the dedupe window."""
+        return 0
+
+    def stats(self) -> Dict[str, int]:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+# -----------------------------------------------------------------------------
+# In-memory backend (non-durable)
+# -----------------------------------------------------------------------------
+class InMemoryIngressQueue(IngressQueue):
+    def __init__(
+        self,
+        dedupe_ttl_seconds: int = DEFAULT_DEDUPE_TTL_SECONDS,
+        visibility_timeout: float = DEFAULT_VISIBILITY_TIMEOUT,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    ):
+        self.dedupe_ttl = dedupe_ttl_seconds
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._ready: deque[QueuedJob] = deque()
+        self._inflight: Dict[int, tuple[QueuedJob, float]] = {}
+        self._delayed: List[tuple[float, QueuedJob]] = []
+        self._seen = IdempotencyCache(ttl_seconds=dedupe_ttl_seconds)
+        self.dead_letters: List[Dict[str, Any]] = []
+
+    def enqueue(self, key: str, payload: Dict[str, Any]) -> bool:
+        with self._lock:
+            if self._seen.check_and_mark(key):
+                return False
+            self._ready.append(QueuedJob(self._next_id, key, payload, 0))
+            self._next_id += 1
+            return True
+
+    def _requeue_expired(self, now: float) -> None:
+        for job_id, (job, deadline) in list(self._inflight.items()):
+            if deadline <= now:
+                del self._inflight[job_id]
+                self._ready.append(job)
+        due = [j for at, j in self._delayed if at <= now]
+        if due:
+            self._delayed = [(at, j) for at, j in self._delayed if at > now]
+            self._ready.extend(due)
+
+    def claim(self, limit: int = 32) -> List[QueuedJob]:
+        now = time.time()
+        out: List[QueuedJob] = []
+        with self._lock:
+            self._requeue_expired(now)
+            while self._ready and len(out) < limit:
+                job = self._ready.popleft()
+                job.attempts += 1
+                self._inflight[job.id] = (job, now + self.visibility_timeout)
+                out.append(job)
+        return out
+
+    def ack(self, job_id: int) -> None:
+        with self._lock:
+            self._inflight.pop(job_id, None)
+
+    def nack(self, job_id: int, error: str = "", delay: float = 5.0) -> None:
+        with self._lock:
+            entry = self._inflight.pop(job_id, None)
+            if entry is None:
+                return
+            job = entry[0]
+            if job.attempts >= self.max_attempts:
+                self.dead_letters.append({
+                    "key": job.key, "payload": job.payload,
+                    "attempts": job.attempts, "error": error, "failed_at": time.time(),
+                })
+            else:
+                self._delayed.append((time.time() + delay, job))
+
+    def mark(self, job_id: int, progress: Dict[str, Any]) -> None:
+        with self._lock:
+            entry = self._inflight.get(job_id)
+            if entry is not None:
+                entry[0].progress.update(progress)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "ready": len(self._ready) + len(self._delayed),
+                "inflight": len(self._inflight),
+                "dead_letters": len(self.dead_letters),
+            }
+
+
+# -----------------------------------------------------------------------------
+# SQLite / WAL backend (durable)
+# -----------------------------------------------------------------------------
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    dedupe_key  TEXT NOT NULL UNIQUE,
+    payload     TEXT NOT NULL,
+    enqueued_at REAL NOT NULL,
+    visible_at  REAL NOT NULL,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    state       TEXT NOT NULL DEFAULT 'ready',   -- ready | claimed | done | dead
+    last_error  TEXT,
+    progress    TEXT NOT NULL DEFAULT '{}'      -- steps done by earlier attempts
+);
+CREATE INDEX IF NOT EXISTS jobs_ready_idx ON jobs (state, visible_at, id);
+CREATE INDEX IF NOT EXISTS jobs_done_idx ON jobs (state, enqueued_at);
+
+CREATE TABLE IF NOT EXISTS dead_letters (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id     INTEGER NOT NULL,
+    dedupe_key TEXT NOT NULL,
+    payload    TEXT NOT NULL,
+    attempts   INTEGER NOT NULL,
+    error      TEXT,
+    failed_at  REAL NOT NULL
+);
+"""
+
+
+class SQLiteIngressQueue(IngressQueue):
+    """
+    Append-only job log in a local SQLite file.
+
+    The journal runs in WAL mode with synchronous=NORMAL: a commit is an
+    append to the WAL without fsync, and the WAL is fsynced when it is
+    checkpointed. `flush()` checkpoints, and is called by the worker every
+    `fsync_interval` seconds, so fsyncs are batched across many enqueues
+    instead of paid per webhook request. Committed jobs always survive a
+    process crash/redeploy; at most `fsync_interval` of jobs can be lost on
+    a power failure.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        dedupe_ttl_seconds: int = DEFAULT_DEDUPE_TTL_SECONDS,
+        visibility_timeout: float = DEFAULT_VISIBILITY_TIMEOUT,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        fsync_interval: float = 1.0,
+    ):
+        self.path = path
+        self.dedupe_ttl = dedupe_ttl_seconds
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.fsync_interval = fsync_interval
+        self._last_flush = time.time()
+        self._lock = threading.Lock()
+
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA wal_autocheckpoint=0")  # we checkpoint in flush()
+        self._conn.executescript(_SCHEMA)
+        columns = {r[1] for r in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "progress" not in columns:  # queue files created before progress tracking
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN progress TEXT NOT NULL DEFAULT '{}'")
+
+    def enqueue(self, key: str, payload: Dict[str, Any]) -> bool:
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT OR IGNORE INTO jobs (dedupe_key, payload, enqueued_at, visible_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(payload, ensure_ascii=False), now, now),
+            )
+            return cur.rowcount == 1
+
+    def claim(self, limit: int = 32) -> List[QueuedJob]:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # 'claimed' rows whose visibility expired are eligible again
+                rows = self._conn.execute(
+                    "SELECT id, dedupe_key, payload, attempts, progress FROM jobs "
+                    "WHERE state IN ('ready', 'claimed') AND visible_at <= ? "
+                    "ORDER BY id LIMIT ?",
+                    (now, limit),
+                ).fetchall()
+                if rows:
+                    self._conn.executemany(
+                        "UPDATE jobs SET state = 'claimed', attempts = attempts + 1, visible_at = ? "
+                        "WHERE id = ?",
+                        [(now + self.visibility_timeout, r[0]) for r in rows],
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [QueuedJob(r[0], r[1], json.loads(r[2]), r[3] + 1, json.loads(r[4] or "{}")) for r in rows]
+
+    def ack(self, job_id: int) -> None:
+        with self._lock:
+            # keep the row (state=done) so the key stays deduped until pruned
+            self._conn.execute(
+                "UPDATE jobs SET state = 'done', payload = '{}' WHERE id = ?", (job_id,)
+            )
+
+    def nack(self, job_id: int, error: str = "", delay: float = 5.0) -> None:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT dedupe_key, payload, attempts FROM jobs WHERE id = ? AND state = 'claimed'",
+                (job_id,),
+            ).fetchone()
+            if row is None:
+                return
+            key, payload, attempts = row
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if attempts >= self.max_attempts:
+                    self._conn.execute(
+                        "INSERT INTO dead_letters (job_id, dedupe_key, payload, attempts, error, failed_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (job_id, key, payload, attempts, error, now),
+                    )
+                    self._conn.execute(
+                        "UPDATE jobs SET state = 'dead', last_error = ? WHERE id = ?", (error, job_id)
+                    )
+                else:
+                    self._conn.execute(
+                        "UPDATE jobs SET state = 'ready', visible_at = ?, last_error = ? WHERE id = ?",
+                        (now + delay, error, job_id),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def mark(self, job_id: int, progress: Dict[str, Any]) -> None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT progress FROM jobs WHERE id = ? AND state = 'claimed'", (job_id,)
+            ).fetchone()
+            if row is None:
+                return
+            merged = {**json.loads(row[0] or "{}"), **progress}
+            self._conn.execute(
+                "UPDATE jobs SET progress = ? WHERE id = ?",
+                (json.dumps(merged, ensure_ascii=False), job_id),
+            )
+
+    def recover(self) -> int:
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE jobs SET state = 'ready', visible_at = ? WHERE state = 'claimed'", (now,)
+            )
+            return cur.rowcount
+
+    def flush(self) -> None:
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+            self._last_flush = time.time()
+
+    def maybe_flush(self) -> None:
+        if time.time() - self._last_flush >= self.fsync_interval:
+            self.flush()
+
+    def prune(self) -> int:
+        cutoff = time.time() - self.dedupe_ttl
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM jobs WHERE state IN ('done', 'dead') AND enqueued_at < ?", (cutoff,)
+            )
+            return cur.rowcount
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counts = dict(self._conn.execute(
+                "SELECT state, COUNT(*) FROM jobs WHERE state IN ('ready', 'claimed') GROUP BY state"
+            ).fetchall())
+            dead = self._conn.execute("SELECT COUNT(*) FROM dead_letters").fetchone()[0]
+        return {
+            "ready": counts.get("ready", 0),
+            "inflight": counts.get("claimed", 0),
+            "dead_letters": dead,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            try:
+                self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            finally:
+                self._conn.close()
+
+
+def create_ingress_queue(backend: Optional[str] = None, path: Optional[str] = None) -> IngressQueue:
+    backend = (backend or os.getenv("INGRESS_QUEUE_BACKEND", "sqlite")).lower()
+    if backend == "memory":
+        return InMemoryIngressQueue()
+    if backend == "sqlite":
+        return SQLiteIngressQueue(
+            path or os.getenv("INGRESS_QUEUE_PATH", "ingress_queue.db"),
+            max_attempts=int(os.getenv("INGRESS_MAX_ATTEMPTS", str(DEFAULT_MAX_ATTEMPTS))),
+        )
+    raise ValueError(f"Unknown INGRESS_QUEUE_BACKEND: {backend}")
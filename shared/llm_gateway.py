@@ -0,0 +1,371 @@
+# shared/llm_gateway.py
+"""
+Process-wide gateway for OpenAI chat completions.
+
+Every LLM call site goes through `gateway.chat(...)` / `await gateway.achat(...)`
+(same kwargs as `client.chat.completions.create`) instead of building its own
+client, so the whole process shares:
+
+- one pooled HTTP client per mode (sync / async);
+- a timeout / retry policy per call site (CALL_POLICIES, keyed by tag;
+  untagged and unlisted tags get LLM_TIMEOUT / LLM_MAX_RETRIES);
+- a per-model concurrency cap (semaphores), so a burst can't open hundreds of
+  sockets to one model;
+- hedging (async only, opt-in per tag via LLM_HEDGE_TAGS): if a call is still
+  running after the observed p95 latency of its tag, a second identical
+  request is sent and the first answer wins;
+- a per-model circuit breaker: after `failure_threshold` consecutive failures
+  the model is skipped for `cooldown` seconds and calls go to its cheaper
+  fallback (FALLBACK_MODELS); one trial call is let through after the cooldown.
+  Rejected requests (400) are the caller's fault and don't count.
+
+`json_schema_format(Model, name)` builds (once) the structured-output
+response_format for a pydantic model.
+
+Callers may pass `tag="<agent>.<node>"`: it is used as the OpenAI
+`prompt_cache_key` (requests sharing a static prefix land on the same cache)
+and every response's cached prompt tokens are recorded under it
+(observability.tokens.prompt_cache_report). Inside a Tami turn each call is
+also added to the turn ledger (observability.ledger) with its latency and the
+time it queued for the model's concurrency slot.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Deque, Dict, FrozenSet, Iterable, Optional, Type
+
+import httpx
+from openai import AsyncOpenAI, BadRequestError, OpenAI
+from pydantic import BaseModel
+
+from observability.ledger import record_llm_call
+from observability.tokens import record_prompt_cache
+
+logger = logging.getLogger(__name__)
+
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "10"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "1"))
+LLM_MODEL_CONCURRENCY = int(os.getenv("LLM_MODEL_CONCURRENCY", "16"))
+LLM_HEDGE_TAGS = frozenset(t.strip() for t in os.getenv("LLM_HEDGE_TAGS", "").split(",") if t.strip())
+
+
+@dataclass(frozen=True)
+class CallPolicy:
+    timeout: float
+    max_retries: int
+
+
+# OpenAI SDK defaults: what these call sites ran with before the gateway
+# (gpt-5-mini reasoning calls regularly take longer than LLM_TIMEOUT)
+SDK_DEFAULT_POLICY = CallPolicy(600.0, 2)
+CALL_POLICIES: Dict[str, CallPolicy] = {
+    "order.match": SDK_DEFAULT_POLICY,
+    "order.formatter": SDK_DEFAULT_POLICY,
+    "ledger.orders": SDK_DEFAULT_POLICY,
+    "router": SDK_DEFAULT_POLICY,
+    "tami_llm": SDK_DEFAULT_POLICY,
+}
+
+# cheaper model used while a model's breaker is open
+FALLBACK_MODELS: Dict[str, str] = {
+    "gpt-4o": "gpt-4o-mini",
+    "gpt-4.1": "gpt-4.1-mini",
+    "gpt-4.1-mini": "gpt-4o-mini",
+    "gpt-5": "gpt-5-mini",
+    "gpt-5-mini": "gpt-4.1-mini",
+}
+
+
+@lru_cache(maxsize=None)
+def json_schema_format(model_cls: Type[BaseModel], name: Optional[str] = None, strict: bool = False) -> Dict[str, Any]:
+    """Structured-output response_format for `model_cls` (schema generated once per process)."""
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": name or model_cls.__name__,
+            "schema": model_cls.model_json_schema(),
+            "strict": strict,
+        },
+    }
+
+
+class _ModelStats:
+    """Circuit breaker state for one model."""
+
+    def __init__(self):
+        self.failures = 0
+        self.open_until = 0.0
+        self.trial_in_flight = False
+        self.calls = 0
+        self.fallbacks = 0
+
+
+class _TagStats:
+    """Latency window + hedge counters for one call site (tag)."""
+
+    def __init__(self, window: int = 200):
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def p95(self) -> Optional[float]:
+        if len(self.latencies) < 20:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+
+class LLMGateway:
+    def __init__(
+        self,
+        timeout: float = LLM_TIMEOUT,
+        max_retries: int = LLM_MAX_RETRIES,
+        model_concurrency: int = LLM_MODEL_CONCURRENCY,
+        hedge_tags: Iterable[str] = LLM_HEDGE_TAGS,
+        policies: Optional[Dict[str, CallPolicy]] = None,
+        hedge_min_delay: float = 1.0,
+        hedge_default_delay: float = 4.0,
+        failure_threshold: int = 5,
+        cooldown: float = 30.0,
+    ):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.model_concurrency = model_concurrency
+        self.hedge_tags: FrozenSet[str] = frozenset(hedge_tags)
+        self.policies = CALL_POLICIES if policies is None else policies
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_default_delay = hedge_default_delay
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+
+        self._client: Optional[OpenAI] = None
+        self._async_client: Optional[AsyncOpenAI] = None
+        self._lock = threading.Lock()
+        self._stats: Dict[str, _ModelStats] = defaultdict(_ModelStats)
+        self._tag_stats: Dict[str, _TagStats] = defaultdict(_TagStats)
+        self._policy_clients: Dict[tuple, Any] = {}
+        self._sync_sems: Dict[str, threading.BoundedSemaphore] = {}
+        self._async_sems: Dict[str, asyncio.Semaphore] = {}
+
+    # ------------------------------------------------------------------
+    # clients (lazy: importing a node must not need OPENAI_API_KEY)
+    # ------------------------------------------------------------------
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=60.0)
+
+    @property
+    def client(self) -> OpenAI:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = OpenAI(
+                        timeout=self.timeout,
+                        max_retries=self.max_retries,
+                        http_client=httpx.Client(limits=self._limits()),
+                    )
+        return self._client
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        if self._async_client is None:
+            with self._lock:
+                if self._async_client is None:
+                    self._async_client = AsyncOpenAI(
+                        timeout=self.timeout,
+                        max_retries=self.max_retries,
+                        http_client=httpx.AsyncClient(limits=self._limits()),
+                    )
+        return self._async_client
+
+    def _policy(self, tag: str) -> CallPolicy:
+        return self.policies.get(tag) or CallPolicy(self.timeout, self.max_retries)
+
+    def _client_for(self, tag: str, asynchronous: bool):
+        """The shared client, re-optioned (same connection pool) for the tag's policy."""
+        policy = self._policy(tag)
+        base = self.async_client if asynchronous else self.client
+        if policy == CallPolicy(self.timeout, self.max_retries):
+            return base
+        key = (asynchronous, policy)
+        client = self._policy_clients.get(key)
+        if client is None:
+            client = base.with_options(timeout=policy.timeout, max_retries=policy.max_retries)
+            with self._lock:
+                client = self._policy_clients.setdefault(key, client)
+        return client
+
+    # ------------------------------------------------------------------
+    # breaker / routing
+    # ------------------------------------------------------------------
+    def _pick_model(self, model: str) -> str:
+        """`model`, or its fallback while model's breaker is open."""
+        fallback = FALLBACK_MODELS.get(model)
+        with self._lock:
+            st = self._stats[model]
+            st.calls += 1
+            if st.failures < self.failure_threshold or fallback is None:
+                return model
+            if time.monotonic() >= st.open_until and not st.trial_in_flight:
+                st.trial_in_flight = True  # half-open: let one call probe the model
+                return model
+            self._stats[fallback].fallbacks += 1
+        return fallback
+
+    def _record(self, model: str, ok: bool, tag: Optional[str] = None, latency: Optional[float] = None) -> None:
+        with self._lock:
+            st = self._stats[model]
+            st.trial_in_flight = False
+            if ok:
+                st.failures = 0
+                if tag is not None and latency is not None:
+                    ts = self._tag_stats[tag]
+                    ts.calls += 1
+                    ts.latencies.append(latency)
+            else:
+                st.failures += 1
+                if st.failures >= self.failure_threshold:
+                    st.open_until = time.monotonic() + self.cooldown
+                    logger.warning("LLM breaker open for %s (%d consecutive failures)", model, st.failures)
+
+    def _record_error(self, model: str, error: Exception) -> None:
+        if isinstance(error, BadRequestError):
+            # malformed request: it would fail on the fallback model too
+            with self._lock:
+                self._stats[model].trial_in_flight = False
+            return
+        self._record(model, ok=False)
+
+    def _hedge_delay(self, tag: str) -> float:
+        p95 = self._tag_stats[tag].p95()
+        return self.hedge_default_delay if p95 is None else max(self.hedge_min_delay, p95)
+
+    def _sync_sem(self, model: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if model not in self._sync_sems:
+                self._sync_sems[model] = threading.BoundedSemaphore(self.model_concurrency)
+            return self._sync_sems[model]
+
+    def _async_sem(self, model: str) -> asyncio.Semaphore:
+        with self._lock:
+            if model not in self._async_sems:
+                self._async_sems[model] = asyncio.Semaphore(self.model_concurrency)
+            return self._async_sems[model]
+
+    # ------------------------------------------------------------------
+    # public API
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _prepare(kwargs: Dict[str, Any]) -> str:
+        tag = kwargs.pop("tag", None)
+        if tag:
+            extra = dict(kwargs.get("extra_body") or {})
+            extra.setdefault("prompt_cache_key", tag)
+            kwargs["extra_body"] = extra
+        return tag or kwargs["model"]
+
+    def chat(self, **kwargs: Any):
+        """Sync chat completion (no hedging: it would need a thread per call)."""
+        tag = self._prepare(kwargs)
+        model = self._pick_model(kwargs["model"])
+        kwargs["model"] = model
+        queued = time.monotonic()
+        with self._sync_sem(model):
+            start = time.monotonic()
+            try:
+                resp = self._client_for(tag, asynchronous=False).chat.completions.create(**kwargs)
+            except Exception as e:
+                self._record_error(model, e)
+                raise
+        latency = time.monotonic() - start
+        self._record(model, ok=True, tag=tag, latency=latency)
+        record_prompt_cache(tag, resp)
+        record_llm_call(tag, model, resp, latency, start - queued)
+        return resp
+
+    async def achat(self, **kwargs: Any):
+        tag = self._prepare(kwargs)
+        resp = await self._ahedged(kwargs, tag)
+        record_prompt_cache(tag, resp)
+        return resp
+
+    async def _ahedged(self, kwargs: Dict[str, Any], tag: str):
+        model = self._pick_model(kwargs["model"])
+        kwargs["model"] = model
+        if tag not in self.hedge_tags:
+            return await self._acall(model, kwargs, tag)
+
+        primary = asyncio.create_task(self._acall(model, kwargs, tag))
+        done, _ = await asyncio.wait({primary}, timeout=self._hedge_delay(tag))
+        if done:
+            return primary.result()
+
+        with self._lock:
+            self._tag_stats[tag].hedges += 1
+        hedge = asyncio.create_task(self._acall(model, kwargs, tag))
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            with self._lock:
+                                self._tag_stats[tag].hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error  # both failed
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _acall(self, model: str, kwargs: Dict[str, Any], tag: str):
+        queued = time.monotonic()
+        async with self._async_sem(model):
+            start = time.monotonic()
+            try:
+                resp = await self._client_for(tag, asynchronous=True).chat.completions.create(**kwargs)
+            except asyncio.CancelledError:
+                raise  # lost a hedge race: not a model failure
+            except Exception as e:
+                self._record_error(model, e)
+                raise
+        latency = time.monotonic() - start
+        self._record(model, ok=True, tag=tag, latency=latency)
+        record_llm_call(tag, model, resp, latency, start - queued)
+        return resp
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            models = {
+                model: {
+                    "calls": st.calls,
+                    "failures": st.failures,
+                    "breaker_open": st.failures >= self.failure_threshold and time.monotonic() < st.open_until,
+                    "fallbacks": st.fallbacks,
+                }
+                for model, st in self._stats.items()
+            }
+            tags = {
+                tag: {
+                    "calls": ts.calls,
+                    "p95": ts.p95(),
+                    "timeout": self._policy(tag).timeout,
+                    "hedged": tag in self.hedge_tags,
+                    "hedges": ts.hedges,
+                    "hedge_wins": ts.hedge_wins,
+                }
+                for tag, ts in self._tag_stats.items()
+            }
+        return {"models": models, "tags": tags}
+
+
+gateway = LLMGateway()
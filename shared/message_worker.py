@@ -1,16 +1,20 @@
-import asyncio, logging, time
+import asyncio, logging, os, time
+from datetime import datetime, timezone
 from collections import deque
 from adapters.whatsapp.cloudapi.cloud_api_adapter import CloudAPIAdapter
 from shared.user import get_user, create_user, userContextDict
 from agent.main import handleUserInput
-from store.user import UserStore
 from store.new_waiting_users_store import save_user_chat_id, get_user_chat_id
+from shared.ingress_queue import create_ingress_queue, QueuedJob
+from dedupe.cache import IdempotencyCache
 
 logger = logging.getLogger(__name__)
 
-message_cache: dict[str, float] = {}   # { message_id: first_seen_unix }
-message_queue: deque[dict] = deque()   # FIFO queue of jobs
+# Durable FIFO of jobs, deduped by WhatsApp message id (see shared/ingress_queue.py)
+ingress_queue = create_ingress_queue()
 MESSAGE_TTL_SECONDS = 48 * 3600
+# hot in-memory front of the queue's dedupe: drops retries without touching disk
+message_cache = IdempotencyCache(ttl_seconds=MESSAGE_TTL_SECONDS, max_size=500_000)
 
 def _wrap_single_message(phone_number_id: str | None, message_obj: dict) -> dict:
     return {
@@ -28,9 +32,6 @@ def _wrap_single_message(phone_number_id: str | None, message_obj: dict) -> dict
         }]
     }
 
-import asyncio
-
-import asyncio
 
 newUserMessage = """ 
 היי 👋
@@ -51,111 +52,276 @@ async def wait_or_stop(stop_event: asyncio.Event, timeout: float) -> None:
         pass
 
 
-async def _queue_worker(stop_event: asyncio.Event):
-    adapter = CloudAPIAdapter()  # reuse per worker
+async def _process_job(adapter: CloudAPIAdapter, job: dict, progress: dict | None = None, mark=None) -> None:
+    # progress: steps recorded by an earlier attempt of this job (see ingress_queue.mark)
+    progress = progress or {}
+    mark = mark or (lambda step: None)
+    mid = job.get("message_id")
+    phone_number_id = job.get("phone_number_id")
+    single_body = _wrap_single_message(phone_number_id, job.get("raw") or {})
+
+    m = job.get("raw") or {}
+    msg_type = m.get("type")
+    text = (m.get("text") or {}).get("body")
+    caption = ((m.get("image") or {}).get("caption")
+            or (m.get("video") or {}).get("caption")
+            or (m.get("document") or {}).get("caption"))
+    interactive_type = (m.get("interactive") or {}).get("type")
+    button_text = (m.get("button") or {}).get("text")
+
+    logger.info(
+        "WRK in mid=%s from=%s type=%s text=%s caption=%s interactive=%s button=%s",
+        job.get("message_id"), job.get("from"), msg_type,
+        (text[:120] if text else None),
+        (caption[:120] if caption else None),
+        interactive_type, button_text
+    )
+
+    rawMessage = await adapter.parse_incoming(single_body)
+
+    # suppose your normalized object is rawMessage with .content fields
+    try:
+        c = getattr(rawMessage, "content", None)
+        norm_text = getattr(c, "text", None) if c else None
+        norm_kind = getattr(c, "kind", None) if c else None
+
+        if not norm_text:
+            logger.warning(
+                "WRK empty_text mid=%s norm_kind=%s src_type=%s interactive=%s",
+                job.get("message_id"), norm_kind, msg_type, interactive_type
+            )
+    except Exception as e:
+        logger.exception("WRK post-parse logging failed: %s", e)
+
+    if not rawMessage:
+        logger.info("Worker: message %s ignored.", mid)
+        return
+    if job.get("received_at"):
+        rawMessage.received_at = datetime.fromtimestamp(job["received_at"], tz=timezone.utc)
+
+    # Firestore reads/writes are blocking; keep them off the event loop
+    user = await asyncio.to_thread(get_user, rawMessage.chat_id)
+    if user is None:
+        # replied yes to new user message
+        if rawMessage.content.button_reply:
+            br = rawMessage.content.button_reply
+            if br.text == "כן":
+                await asyncio.to_thread(save_user_chat_id, rawMessage.chat_id)
+                await adapter.send_message(rawMessage.chat_id, "תודה רבה! אני אשמח לעזור לך בקרוב מאוד")
+            else:
+                await adapter.send_message(rawMessage.chat_id, "תודה ושלום :)")
+            return
+        else:
+            waitingUser = await asyncio.to_thread(get_user_chat_id, rawMessage.chat_id)
+            if waitingUser:
+                await adapter.send_message(rawMessage.chat_id, "אין לך כבר סבלנות לחכות? אני אשמח לעזור לך בקרוב מאוד")
+            else:
+                # new user first time
+                await adapter.send_message(rawMessage.chat_id, newUserMessage)
+            return
+
+        #TODO change to template message 
+        #user = create_user(rawMessage.chat_id, rawMessage.content.text, rawMessage.sender.name)
+        #userContextDict[rawMessage.chat_id] = user
+
+    # Acknowledge receipt
+    if not progress.get("acked"):
+        if mid:
+            await adapter.send_message(rawMessage.chat_id, "אני על זה!", reply_to=mid)
+        else:
+            await adapter.send_message(rawMessage.chat_id, "אני על זה!")
+        mark({"acked": True})
+
+    if "result" in progress:
+        # the turn (and its tool side effects) already ran; only the reply is missing
+        result = progress["result"]
+    else:
+        # Process (awaited on the loop; sync graph nodes run in the executor, see handleUserInput)
+        result = await handleUserInput(rawMessage, user)
+        # only the fields changed during the turn are written (coalesced, flushed in background)
+        userContextDict.save(user)
+        mark({"result": result})
+
+    # Respond with result
+    await adapter.send_message(rawMessage.chat_id, result)
+
+
+# -----------------------------------------------------------------------------
+# Worker pool: strict FIFO per chat, different chats in parallel
+# -----------------------------------------------------------------------------
+MESSAGE_WORKERS = int(os.getenv("MESSAGE_WORKERS", "8"))
+
+
+class WorkerPoolStats:
+    def __init__(self):
+        self.started_at: float = time.time()
+        self.num_workers: int = 0
+        self.busy_workers: int = 0
+        self.busy_seconds: float = 0.0
+        self.processed: int = 0
+        self.failed: int = 0
+
+    def utilization(self) -> float:
+        capacity = (time.time() - self.started_at) * max(self.num_workers, 1)
+        return round(self.busy_seconds / capacity, 4) if capacity > 0 else 0.0
+
+
+class ChatLanes:
+    """
+    Per-chat FIFO lanes. A chat is handed to at most one worker at a time,
+    so messages of the same chat are processed in arrival order while
+    different chats are processed concurrently.
+    """
+
+    def __init__(self):
+        self.pending: dict[str, deque[QueuedJob]] = {}
+        self.scheduled: set[str] = set()
+        self.ready: asyncio.Queue[str] = asyncio.Queue()
+
+    @staticmethod
+    def lane_key(job: QueuedJob) -> str:
+        return job.payload.get("from") or job.key or "<unknown>"
+
+    def push(self, job: QueuedJob) -> None:
+        key = self.lane_key(job)
+        self.pending.setdefault(key, deque()).append(job)
+        if key not in self.scheduled:
+            self.scheduled.add(key)
+            self.ready.put_nowait(key)
+
+    def pop(self, key: str) -> QueuedJob | None:
+        lane = self.pending.get(key)
+        if lane:
+            return lane.popleft()
+        # lane drained: release it (no await between check and release)
+        self.pending.pop(key, None)
+        self.scheduled.discard(key)
+        return None
+
+    def backlog(self) -> dict[str, int]:
+        return {k: len(v) for k, v in self.pending.items() if v}
 
+
+chat_lanes = ChatLanes()
+pool_stats = WorkerPoolStats()
+_inflight_ids: set[int] = set()  # claimed by this process and not yet acked/nacked
+
+
+def worker_metrics() -> dict:
+    backlog = chat_lanes.backlog()
+    queue_stats = ingress_queue.stats()
+    return {
+        "queue_depth": queue_stats.get("ready", 0),
+        "queue_inflight": queue_stats.get("inflight", 0),
+        "dead_letters": queue_stats.get("dead_letters", 0),
+        "lanes_backlog": sum(backlog.values()),
+        "per_chat_backlog": backlog,
+        "workers": pool_stats.num_workers,
+        "busy_workers": pool_stats.busy_workers,
+        "utilization": pool_stats.utilization(),
+        "processed": pool_stats.processed,
+        "failed": pool_stats.failed,
+    }
+
+
+PRUNE_INTERVAL_SECONDS = 600
+
+
+async def _dispatcher(stop_event: asyncio.Event, max_backlog: int):
+    """Claims jobs from the ingress queue into per-chat lanes."""
+    recovered = ingress_queue.recover()
+    if recovered:
+        logger.info("Ingress queue: re-queued %d jobs claimed before restart", recovered)
+
+    last_prune = 0.0
     while not stop_event.is_set():
         try:
-            if not message_queue:
+            now = time.time()
+            if now - last_prune >= PRUNE_INTERVAL_SECONDS:
+                ingress_queue.prune()
+                last_prune = now
+            ingress_queue.maybe_flush()
+
+            room = max_backlog - len(_inflight_ids)
+            jobs = ingress_queue.claim(limit=room) if room > 0 else []
+            # a job still sitting in a local lane may become visible again
+            # after its visibility timeout; never hand it out twice
+            jobs = [j for j in jobs if j.id not in _inflight_ids]
+            if not jobs:
                 await wait_or_stop(stop_event, 0.05)  # idle wait; interruptible
                 continue
+            for job in jobs:
+                _inflight_ids.add(job.id)
+                chat_lanes.push(job)
+        except asyncio.CancelledError:
+            logger.info("Queue dispatcher cancelled; shutting down.")
+            break
+        except Exception:
+            logger.exception("Dispatcher loop error")
+            await wait_or_stop(stop_event, 2)  # brief, interruptible backoff
 
+
+async def _lane_worker(stop_event: asyncio.Event, adapter: CloudAPIAdapter, worker_id: int):
+    while not stop_event.is_set():
+        try:
             try:
-                job = message_queue.popleft()
-            except IndexError:
-                # Race: queue became empty between check and pop
-                await wait_or_stop(stop_event, 0.01)
+                key = await asyncio.wait_for(chat_lanes.ready.get(), timeout=0.5)
+            except asyncio.TimeoutError:
                 continue
 
-            mid = job.get("message_id")
-            phone_number_id = job.get("phone_number_id")
-            single_body = _wrap_single_message(phone_number_id, job.get("raw") or {})
-
+            pool_stats.busy_workers += 1
             try:
-                m = job.get("raw") or {}
-                msg_type = m.get("type")
-                text = (m.get("text") or {}).get("body")
-                caption = ((m.get("image") or {}).get("caption")
-                        or (m.get("video") or {}).get("caption")
-                        or (m.get("document") or {}).get("caption"))
-                interactive_type = (m.get("interactive") or {}).get("type")
-                button_text = (m.get("button") or {}).get("text")
-
-                logger.info(
-                    "WRK in mid=%s from=%s type=%s text=%s caption=%s interactive=%s button=%s",
-                    job.get("message_id"), job.get("from"), msg_type,
-                    (text[:120] if text else None),
-                    (caption[:120] if caption else None),
-                    interactive_type, button_text
-                )
-
-                rawMessage = await adapter.parse_incoming(single_body)
-
-                # suppose your normalized object is rawMessage with .content fields
-                try:
-                    c = getattr(rawMessage, "content", None)
-                    norm_text = getattr(c, "text", None) if c else None
-                    norm_kind = getattr(c, "kind", None) if c else None
-
-                    if not norm_text:
-                        logger.warning(
-                            "WRK empty_text mid=%s norm_kind=%s src_type=%s interactive=%s",
-                            job.get("message_id"), norm_kind, msg_type, interactive_type
+                while (job := chat_lanes.pop(key)) is not None:
+                    mid = job.payload.get("message_id")
+                    t0 = time.perf_counter()
+                    try:
+                        await _process_job(
+                            adapter, job.payload, job.progress,
+                            mark=lambda step, job_id=job.id: ingress_queue.mark(job_id, step),
                         )
-                except Exception as e:
-                    logger.exception("WRK post-parse logging failed: %s", e)
-
-                if not rawMessage:
-                    logger.info("Worker: message %s ignored.", mid)
-                    continue
-
-                user = get_user(rawMessage.chat_id)
-                if user is None:
-                    # replied yes to new user message
-                    if rawMessage.content.button_reply:
-                        br = rawMessage.content.button_reply
-                        if br.text == "כן":
-                            save_user_chat_id(rawMessage.chat_id)
-                            await adapter.send_message(rawMessage.chat_id, "תודה רבה! אני אשמח לעזור לך בקרוב מאוד")
-                        else:
-                            await adapter.send_message(rawMessage.chat_id, "תודה ושלום :)")
-                        continue
-                    else:
-                        waitingUser = get_user_chat_id(rawMessage.chat_id)
-                        if waitingUser:
-                            await adapter.send_message(rawMessage.chat_id, "אין לך כבר סבלנות לחכות? אני אשמח לעזור לך בקרוב מאוד")
-                        else:
-                            # new user first time
-                            await adapter.send_message(rawMessage.chat_id, newUserMessage)
-                        continue
-
-                    #TODO change to template message 
-                    #user = create_user(rawMessage.chat_id, rawMessage.content.text, rawMessage.sender.name)
-                    #userContextDict[rawMessage.chat_id] = user
-
-                # Acknowledge receipt
-                if mid:
-                    await adapter.send_message(rawMessage.chat_id, "אני על זה!", reply_to=mid)
-                else:
-                    await adapter.send_message(rawMessage.chat_id, "אני על זה!")
-
-                # Process
-                result = await handleUserInput(rawMessage, user)
-                UserStore(user.user_id).save(user)
-
-                # Respond with result
-                await adapter.send_message(rawMessage.chat_id, result)
-
-            except asyncio.CancelledError:
-                raise  # let shutdown propagate cleanly
-            except Exception:
-                logger.exception("Worker: failed processing message %s", mid or "<unknown>")
-                # TODO: send to DLQ if/when available
-                continue
+                        ingress_queue.ack(job.id)
+                        pool_stats.processed += 1
+                    except asyncio.CancelledError:
+                        raise  # let shutdown propagate cleanly; job is redelivered on restart
+                    except Exception as e:
+                        pool_stats.failed += 1
+                        logger.exception("Worker %d: failed processing message %s", worker_id, mid or "<unknown>")
+                        # dead-lettered (default: one attempt), or retried without the steps already done
+                        ingress_queue.nack(job.id, error=f"{type(e).__name__}: {e}")
+                    finally:
+                        _inflight_ids.discard(job.id)
+                        pool_stats.busy_seconds += time.perf_counter() - t0
+            finally:
+                pool_stats.busy_workers -= 1
 
         except asyncio.CancelledError:
-            logger.info("Queue worker cancelled; shutting down.")
+            logger.info("Queue worker %d cancelled; shutting down.", worker_id)
             break
         except Exception:
             logger.exception("Worker loop error")
             await wait_or_stop(stop_event, 2)  # brief, interruptible backoff
+
+
+async def _queue_worker(stop_event: asyncio.Event, num_workers: int | None = None):
+    adapter = CloudAPIAdapter()  # shared by all workers
+    num_workers = num_workers or MESSAGE_WORKERS
+
+    pool_stats.started_at = time.time()
+    pool_stats.num_workers = num_workers
+
+    tasks = [asyncio.create_task(_dispatcher(stop_event, max_backlog=num_workers * 4), name="queue_dispatcher")]
+    tasks += [
+        asyncio.create_task(_lane_worker(stop_event, adapter, i), name=f"queue_worker_{i}")
+        for i in range(num_workers)
+    ]
+    logger.info("Queue worker pool started with %d workers", num_workers)
+
+    try:
+        await asyncio.gather(*tasks)
+    except asyncio.CancelledError:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        logger.info("Queue worker pool cancelled; shutting down.")
+    finally:
+        ingress_queue.flush()
@@ -0,0 +1,189 @@
+# shared/token_counter.py
+"""
+Tokenizer-backed token counting for prompt / memory budgets.
+
+Counts use the model's real BPE (tiktoken; o200k_base for gpt-4o, gpt-4.1 and
+gpt-5 families), so Hebrew text, which takes far more tokens per character
+than English, is budgeted correctly. Everything runs offline once the
+encoding file is in TIKTOKEN_CACHE_DIR (default: .tiktoken_cache next to the
+repo root; fill it once with `python -m shared.token_counter --warm`). Without
+tiktoken or the encoding file, counting falls back to a script-aware estimate
+and logs that once.
+
+Counts are memoized per (encoding, text hash) in a bounded LRU, so the same
+history / system prompt is not re-tokenized every turn. Batch API:
+count_batch(texts) encodes only the misses, in one encode_batch call.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+os.environ.setdefault(
+    "TIKTOKEN_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".tiktoken_cache"),
+)
+
+DEFAULT_MODEL = "gpt-4o"
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "50000"))
+
+# model prefix -> encoding (longest prefix wins)
+MODEL_ENCODINGS: Dict[str, str] = {
+    "gpt-4o": "o200k_base",
+    "gpt-4.1": "o200k_base",
+    "gpt-5": "o200k_base",
+    "o1": "o200k_base",
+    "o3": "o200k_base",
+    "o4": "o200k_base",
+    "gpt-4": "cl100k_base",
+    "gpt-3.5": "cl100k_base",
+}
+
+# chat format overhead (OpenAI cookbook): per message, and for the reply priming
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_NAME = 1
+REPLY_PRIMING = 3
+
+
+def encoding_name(model: str = DEFAULT_MODEL) -> str:
+    for prefix in sorted(MODEL_ENCODINGS, key=len, reverse=True):
+        if model.startswith(prefix):
+            return MODEL_ENCODINGS[prefix]
+    return "o200k_base"
+
+
+@lru_cache(maxsize=None)
+def _encoding(name: str):
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding(name)
+    except Exception as e:  # not installed, or no cached encoding file while offline
+        logger.warning("token counter: tiktoken encoding %s unavailable (%s); using estimates", name, e)
+        return None
+
+
+def _estimate(text: str) -> int:
+    """Fallback: ~4 chars/token for ASCII, ~2 for other scripts (Hebrew)."""
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return math.ceil(ascii_chars / 4 + (len(text) - ascii_chars) / 2)
+
+
+# ----------------------------------------------------------------------
+# memoized counts
+# ----------------------------------------------------------------------
+_lock = threading.Lock()
+_cache: "OrderedDict[tuple, int]" = OrderedDict()
+_stats = {"hits": 0, "misses": 0}
+
+
+def _key(enc_name: str, text: str) -> tuple:
+    # short strings key on themselves; long ones on a digest (bounded memory)
+    if len(text) <= 64:
+        return enc_name, text
+    return enc_name, hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def _lookup(key: tuple) -> Optional[int]:
+    with _lock:
+        n = _cache.get(key)
+        if n is None:
+            _stats["misses"] += 1
+            return None
+        _cache.move_to_end(key)
+        _stats["hits"] += 1
+        return n
+
+
+def _store(key: tuple, n: int) -> None:
+    with _lock:
+        _cache[key] = n
+        _cache.move_to_end(key)
+        while len(_cache) > TOKEN_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def count_batch(texts: Iterable[str], model: str = DEFAULT_MODEL) -> List[int]:
+    """Token counts of `texts`; only uncached texts are encoded (in one batch)."""
+    texts = [t or "" for t in texts]
+    name = encoding_name(model)
+    keys = [_key(name, t) for t in texts]
+    counts: List[Optional[int]] = [_lookup(k) for k in keys]
+
+    # first index of each distinct uncached text
+    missing: Dict[tuple, int] = {}
+    for i, n in enumerate(counts):
+        if n is None:
+            missing.setdefault(keys[i], i)
+    if missing:
+        enc = _encoding(name)
+        todo = [texts[i] for i in missing.values()]
+        if enc is None:
+            fresh = [_estimate(t) for t in todo]
+        else:
+            fresh = [len(ids) for ids in enc.encode_batch(todo, disallowed_special=())]
+        done = dict(zip(missing.keys(), fresh))
+        for key, n in done.items():
+            _store(key, n)
+        counts = [done[k] if n is None else n for k, n in zip(keys, counts)]
+    return counts  # type: ignore[return-value]
+
+
+def count_text(text: str, model: str = DEFAULT_MODEL) -> int:
+    return count_batch([text], model)[0]
+
+
+def count_json(payload: Any, model: str = DEFAULT_MODEL) -> int:
+    """Tokens of `payload` as the JSON text sent to the model."""
+    text = payload if isinstance(payload, str) else json.dumps(payload, ensure_ascii=False, default=str)
+    return count_text(text, model)
+
+
+def _content_text(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):  # multi-part content: count the text parts
+        return "".join(p.get("text", "") for p in content if isinstance(p, dict))
+    return "" if content is None else str(content)
+
+
+def count_messages(messages: List[Dict[str, Any]], model: str = DEFAULT_MODEL) -> int:
+    """Prompt tokens of a chat completion request with these messages."""
+    contents = count_batch([_content_text(m.get("content")) for m in messages], model)
+    total = REPLY_PRIMING
+    for msg, n in zip(messages, contents):
+        total += TOKENS_PER_MESSAGE + n + (TOKENS_PER_NAME if msg.get("name") else 0)
+    return total
+
+
+def token_counter_for(model: str = DEFAULT_MODEL):
+    """Callable[[str], int] for MiniMemoryManager(token_counter=...)."""
+    return lambda text: count_text(text, model)
+
+
+def token_counter_stats() -> Dict[str, Any]:
+    with _lock:
+        out = dict(_stats, size=len(_cache))
+    lookups = out["hits"] + out["misses"]
+    out["hit_rate"] = round(out["hits"] / lookups, 3) if lookups else 0.0
+    out["backend"] = "tiktoken" if _encoding(encoding_name(DEFAULT_MODEL)) is not None else "estimate"
+    return out
+
+
+if __name__ == "__main__":
+    import sys
+
+    if "--warm" in sys.argv:
+        # download the encodings into TIKTOKEN_CACHE_DIR once, for offline use
+        for name in sorted(set(MODEL_ENCODINGS.values())):
+            print(name, "ok" if _encoding(name) is not None else "FAILED")
+        print("cache dir:", os.environ["TIKTOKEN_CACHE_DIR"])
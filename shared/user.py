@@ -5,15 +5,8 @@ adapter = CloudAPIAdapter()
 from green_api.send import send_message
 from observability.obs import span_attrs, mark_error  # NEW
 def get_user(user_id: str) -> User | None:
-    user = userContextDict.get(user_id)
-    if user is None:
-        user_store = UserStore(user_id)
-        user = user_store.load()
-
-    if user is None:
-        return None
-    
-    return user
+    # cached (TTL/LRU); Firestore read only on miss
+    return userContextDict.load(user_id)
 
 def create_user(user_id: str, message: str, sender_name: str) -> User | None:
     user = get_user(user_id)
@@ -37,8 +30,7 @@ def create_user(user_id: str, message: str, sender_name: str) -> User | None:
         config=userConfig,
         runtime=runtime
     )
-    user_store = UserStore(user_id)
-    user_store.save(user)
+    userContextDict.save(user)  # first save of a new user writes the full document
 
     return user
 
@@ -1,6 +1,8 @@
 from typing import Optional, Dict
 from shared.user import get_user, create_user
 from store.user import UserStore
+from models.user import userContextDict
+from tools.contact_index import invalidate_contact_index
 
 def save_contacts_to_runtime(user_id: str, by_name: Dict[str, Dict[str, Optional[str]]]) -> int:
     user = get_user(user_id)
@@ -34,14 +36,9 @@ def save_contacts_to_runtime(user_id: str, by_name: Dict[str, Dict[str, Optional
     print("save_contacts_to_runtime: total=", total)
 
     try:
-        data = user.model_dump()
-        print("about to save user data:", list(data.keys()))
-        rc = data.get("runtime", {}).get("contacts", {})
-        sample = dict(list(rc.items())[:3]) if isinstance(rc, dict) else {}
-        print("runtime.contacts sample:", sample)
-
-        store = UserStore(user_id)
-        store.doc_ref.set(data, merge=True)
+        # partial update: only contact entries that changed are written
+        userContextDict.save(user)
+        invalidate_contact_index(user_id)
         print("Firestore save succeeded for user:", user_id)
     except Exception as e:
         import traceback
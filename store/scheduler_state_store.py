@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+from db.base import db
+from shared import time
+
+
+class SchedulerStateStore:
+    """
+    Per-kind scan watermarks for the scheduler (collection 'scheduler_state').
+
+    One document per (kind, shard): {"watermark": <datetime>, "updated_at": <datetime>}.
+    The watermark is the low-water mark of the next scan window: every item of
+    that kind/shard with a trigger time before it is done (or too old to retry).
+    """
+
+    def __init__(self, shard_index: int = 0, shard_count: int = 1):
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        self.collection = db.collection("scheduler_state")
+
+    def _doc_id(self, kind: str) -> str:
+        return f"{kind}.{self.shard_index}of{self.shard_count}"
+
+    def get_watermarks(self, kinds: Iterable[str]) -> Dict[str, Optional[datetime]]:
+        kinds = list(kinds)
+        refs = [self.collection.document(self._doc_id(k)) for k in kinds]
+        out: Dict[str, Optional[datetime]] = {k: None for k in kinds}
+        by_id = {self._doc_id(k): k for k in kinds}
+        for snap in db.get_all(refs):
+            if snap.exists:
+                out[by_id[snap.id]] = (snap.to_dict() or {}).get("watermark")
+        return out
+
+    def set_watermarks(self, watermarks: Dict[str, datetime]) -> None:
+        if not watermarks:
+            return
+        batch = db.batch()
+        now = time.utcnow()
+        for kind, wm in watermarks.items():
+            batch.set(
+                self.collection.document(self._doc_id(kind)),
+                {"watermark": wm, "updated_at": now},
+                merge=True,
+            )
+        batch.commit()
@@ -1,14 +1,55 @@
+from typing import Iterable, Tuple, Union
+from google.api_core.exceptions import NotFound
+from google.cloud.firestore_v1.field_path import FieldPath
+from firebase_admin import firestore
 from models.user import User
 from db.base import db
 
+_MISSING = object()
+
+def _get_path(data: dict, path: Tuple[str, ...]):
+    cur = data
+    for p in path:
+        if not isinstance(cur, dict) or p not in cur:
+            return _MISSING
+        cur = cur[p]
+    return cur
+
+def _data(user: Union[User, dict]) -> dict:
+    # a dict is an already dumped snapshot (see store/user_cache.py)
+    return user if isinstance(user, dict) else user.model_dump(exclude={"runtime": {"chatIndexStore"}})
+
 class UserStore:
     def __init__(self, user_id: str):
         self.user_id = user_id
         self.db = db
         self.doc_ref = self.db.collection("users").document(user_id)
 
-    def save(self, user: User):
-        self.doc_ref.set(user.model_dump(exclude={"runtime": {"chatIndexStore"}}), merge=True)
+    def save(self, user: Union[User, dict]):
+        self.doc_ref.set(_data(user), merge=True)
+
+    def update_fields(self, user: Union[User, dict], paths: Iterable[Tuple[str, ...]]) -> int:
+        """
+        Partial update: write only the given field paths of `user`
+        (e.g. ("runtime", "contacts", "<name>")). Missing values are deleted.
+        Returns the number of field paths written.
+        """
+        paths = set(paths)
+        # Firestore rejects overlapping paths; a parent path covers its children
+        paths = {p for p in paths if not any(p[:i] in paths for i in range(1, len(p)))}
+        if not paths:
+            return 0
+
+        data = _data(user)
+        updates = {}
+        for path in paths:
+            value = _get_path(data, path)
+            updates[FieldPath(*path).to_api_repr()] = firestore.DELETE_FIELD if value is _MISSING else value
+        try:
+            self.doc_ref.update(updates)
+        except NotFound:
+            self.save(data)
+        return len(updates)
 
     def load(self) -> User | None:
         doc = self.doc_ref.get()
@@ -17,4 +58,4 @@ class UserStore:
         return None
 
     def delete(self):
-        self.doc_ref.delete()
\ No newline at end of file
+        self.doc_ref.delete()
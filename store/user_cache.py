@@ -0,0 +1,251 @@
+# store/user_cache.py
+"""
+Write-through user session cache with per-field dirty tracking.
+
+- get/load: TTL + LRU cache in front of UserStore.load (Firestore read only on miss).
+- save(user, *paths): update the cached user and mark field paths dirty.
+  The changed paths are found by diffing per-field fingerprints against the
+  last saved state (explicit paths are written in addition, e.g. for values
+  the diff cannot see); runtime.contacts and runtime.prefered_contacts are
+  tracked per contact name, so one changed contact writes one map entry
+  instead of the whole contacts map.
+- flush(): coalesces all dirty paths per user into a single partial
+  `doc_ref.update({...field paths...})`, written from the snapshot taken by
+  the last save() (lane workers keep mutating the live User objects). While `flush_loop` runs in the
+  background saves are flushed asynchronously; otherwise (CLI scripts,
+  tests) save() flushes synchronously.
+
+Dict-style access (`cache[user_id] = user`, `cache.get(user_id)`) is kept so
+it can stand in for the old `userContextDict`.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, Iterable, Optional, Set, Tuple, Union
+
+if TYPE_CHECKING:
+    from models.user import User
+
+logger = logging.getLogger(__name__)
+
+FieldPathT = Tuple[str, ...]
+
+# runtime maps tracked per key instead of as one blob
+_KEYED_MAPS = {("runtime", "contacts"), ("runtime", "prefered_contacts")}
+_EXCLUDE = {"runtime": {"chatIndexStore"}}
+
+
+def _fp(value) -> str:
+    raw = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=12).hexdigest()
+
+
+def _fingerprints(data: dict) -> Dict[FieldPathT, str]:
+    out: Dict[FieldPathT, str] = {}
+    for section in ("config", "runtime"):
+        for field, value in (data.get(section) or {}).items():
+            path = (section, field)
+            if path in _KEYED_MAPS and isinstance(value, dict):
+                out[path] = "__map__"
+                for key, entry in value.items():
+                    out[path + (key,)] = _fp(entry)
+            else:
+                out[path] = _fp(value)
+    return out
+
+
+class _Entry:
+    __slots__ = ("user", "loaded_at", "baseline", "dirty", "snapshot")
+
+    def __init__(self, user: "User", baseline: Dict[FieldPathT, str], snapshot: Optional[dict] = None):
+        self.user = user
+        self.loaded_at = time.time()
+        self.baseline = baseline
+        self.dirty: Set[FieldPathT] = set()
+        self.snapshot = snapshot  # dumped user as of the last save(); what flush writes
+
+
+class UserSessionCache:
+    def __init__(self, ttl_seconds: int = 1800, max_size: int = 5000, flush_interval: float = 0.5):
+        self.ttl = ttl_seconds
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._flusher_running = False
+        self.stats = {"hits": 0, "misses": 0, "flushes": 0, "fields_written": 0, "full_writes": 0}
+
+    # ------------------------------------------------------------------
+    # dict-style compatibility (old userContextDict)
+    # ------------------------------------------------------------------
+    def get(self, user_id: str, default=None) -> Optional["User"]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or self._expired(entry):
+                return default
+            self._entries.move_to_end(user_id)
+            self.stats["hits"] += 1
+            return entry.user
+
+    def __getitem__(self, user_id: str) -> "User":
+        user = self.get(user_id)
+        if user is None:
+            raise KeyError(user_id)
+        return user
+
+    def __setitem__(self, user_id: str, user: "User") -> None:
+        """Cache `user` as-is (it is assumed to be persisted already)."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry.user is user:
+                self._entries.move_to_end(user_id)
+                return
+            data = self._dump(user)
+            self._entries[user_id] = _Entry(user, _fingerprints(data), data)
+            self._entries.move_to_end(user_id)
+            self._evict()
+
+    def __contains__(self, user_id: str) -> bool:
+        return self.get(user_id) is not None
+
+    def pop(self, user_id: str, default=None):
+        with self._lock:
+            entry = self._entries.pop(user_id, None)
+        return entry.user if entry else default
+
+    # ------------------------------------------------------------------
+    # load / save
+    # ------------------------------------------------------------------
+    def load(self, user_id: str) -> Optional["User"]:
+        user = self.get(user_id)
+        if user is not None:
+            return user
+        self.stats["misses"] += 1
+        from store.user import UserStore
+        user = UserStore(user_id).load()
+        if user is not None:
+            self[user_id] = user
+        return user
+
+    def save(self, user: "User", *paths: Union[str, FieldPathT]) -> None:
+        """
+        Mark `user` changed. `paths` are dotted strings ("runtime.last_tasks_listing")
+        or tuples (("runtime", "contacts", name)) written in addition to the paths
+        detected by diffing against the last saved state.
+        """
+        user_id = user.user_id
+        with self._lock:
+            entry = self._entries.get(user_id)
+            data = self._dump(user)
+            new_fps = _fingerprints(data)
+            if entry is None:
+                # never seen: write the whole document once
+                entry = _Entry(user, {})
+                entry.dirty.add(())
+                self._entries[user_id] = entry
+            else:
+                entry.user = user
+                # always diff: the baseline moves to new_fps for every path, so a
+                # change outside `paths` would otherwise never be written
+                entry.dirty.update(self._diff(entry.baseline, new_fps))
+                entry.dirty.update(
+                    tuple(p.split(".")) if isinstance(p, str) else tuple(p) for p in paths
+                )
+            entry.baseline = new_fps
+            entry.snapshot = data
+            self._entries.move_to_end(user_id)
+            has_dirty = bool(entry.dirty)
+            self._evict()
+
+        if has_dirty and not self._flusher_running:
+            self.flush_user(user_id)
+
+    @staticmethod
+    def _diff(old: Dict[FieldPathT, str], new: Dict[FieldPathT, str]) -> Iterable[FieldPathT]:
+        changed = [p for p, h in new.items() if old.get(p) != h]
+        removed = [p for p in old if p not in new]
+        return changed + removed
+
+    @staticmethod
+    def _dump(user: "User") -> dict:
+        return user.model_dump(exclude=_EXCLUDE)
+
+    # ------------------------------------------------------------------
+    # flushing
+    # ------------------------------------------------------------------
+    def _take_dirty(self, user_id: str):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or not entry.dirty:
+                return None, None
+            dirty, entry.dirty = entry.dirty, set()
+            if entry.snapshot is None:
+                entry.snapshot = self._dump(entry.user)
+            return entry.snapshot, dirty
+
+    def flush_user(self, user_id: str) -> int:
+        # `data` is the snapshot of the last save(), never the live User a
+        # lane worker may be mutating while this runs in a worker thread
+        data, dirty = self._take_dirty(user_id)
+        if not dirty:
+            return 0
+        from store.user import UserStore
+        store = UserStore(user_id)
+        try:
+            if () in dirty:
+                store.save(data)
+                self.stats["full_writes"] += 1
+                written = 1
+            else:
+                written = store.update_fields(data, dirty)
+                self.stats["fields_written"] += written
+            self.stats["flushes"] += 1
+            return written
+        except Exception:
+            # put the paths back so the next flush retries them
+            with self._lock:
+                entry = self._entries.get(user_id)
+                if entry is not None:
+                    entry.dirty |= dirty
+            logger.exception("UserSessionCache: flush failed for %s", user_id)
+            return 0
+
+    def flush(self) -> int:
+        with self._lock:
+            user_ids = [uid for uid, e in self._entries.items() if e.dirty]
+        return sum(self.flush_user(uid) for uid in user_ids)
+
+    async def flush_loop(self, stop_event: asyncio.Event) -> None:
+        self._flusher_running = True
+        try:
+            while not stop_event.is_set():
+                try:
+                    await asyncio.wait_for(stop_event.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                await asyncio.to_thread(self.flush)
+        finally:
+            self._flusher_running = False
+            await asyncio.to_thread(self.flush)
+
+    # ------------------------------------------------------------------
+    # eviction
+    # ------------------------------------------------------------------
+    def _expired(self, entry: _Entry) -> bool:
+        return not entry.dirty and time.time() - entry.loaded_at > self.ttl
+
+    def _evict(self) -> None:
+        if len(self._entries) <= self.max_size:
+            return
+        # least recently used first; dirty entries stay until flushed
+        for uid in list(self._entries):
+            if len(self._entries) <= self.max_size:
+                break
+            if not self._entries[uid].dirty:
+                del self._entries[uid]
@@ -0,0 +1,162 @@
+# tools/contact_index.py
+"""
+Per-user contact-name index for recipient resolution.
+
+Built once from user.runtime.contacts and reused across planner calls until
+invalidated (refresh_contact, format_shared_contact, or any other place that
+edits contacts calls `invalidate_contact_index(user_id)`). As a safety net the
+index is also rebuilt when the contacts dict object or its size changes.
+
+Holds:
+  - pre-normalized names (NFC + strip + casefold) and pre-derived ids
+  - exact map: normalized name -> first entry (dict order, like the old scan)
+  - trigram postings for the substring tier (short queries scan the
+    pre-normalized list instead)
+  - the resolvable subset for the fuzzy tier, scored in one batched
+    rapidfuzz.process.extract call
+"""
+from __future__ import annotations
+
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from rapidfuzz import fuzz, process
+
+
+def _normalize_name(name: str) -> str:
+    # NFC + strip + casefold (handles Latin; harmless for Hebrew)
+    return unicodedata.normalize("NFC", (name or "").strip()).casefold()
+
+
+def _best_chat_id(phone: str | None) -> str | None:
+    phone = (phone or "").strip()
+    if not phone:
+        return None
+    return phone if phone.endswith("@c.us") else f"{phone}@c.us"
+
+
+def _rec_kind_and_ids(rec: dict[str, str]) -> tuple[str, str | None, str | None, str | None]:
+    """
+    Return (kind, chat_id, phone, email)
+      kind: 'group' | 'contact'
+      chat_id: JID for group (@g.us) or person (@c.us) if derivable
+    """
+    phone = (rec.get("phone") or "").strip()
+    email = (rec.get("email") or "").strip().lower() or None
+
+    # Prefer explicit group signals
+    group_id = (rec.get("group_id") or rec.get("groupId") or rec.get("chat_id") or "").strip()
+    if group_id.endswith("@g.us"):
+        return "group", group_id, None, None
+
+    # Some stores keep group_name + group_id without 'chat_id'
+    if group_id and "@g.us" in group_id:
+        return "group", group_id, None, None
+
+    # Person
+    chat_id = _best_chat_id(phone) if phone else None
+    return "contact", chat_id, (phone or None), email
+
+
+def _trigrams(s: str) -> set[str]:
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+class ContactIndex:
+    def __init__(self, contacts: Dict[str, Dict[str, Any]]):
+        self.source_id = id(contacts)
+        self.source_len = len(contacts)
+
+        self.names: List[str] = []
+        self.norms: List[str] = []
+        self.ids: List[Tuple[str, Optional[str], Optional[str], Optional[str]]] = []
+        self.exact: Dict[str, int] = {}
+        self.grams: Dict[str, set[int]] = {}
+
+        for i, (display_name, rec) in enumerate(contacts.items()):
+            norm = _normalize_name(display_name)
+            self.names.append(display_name)
+            self.norms.append(norm)
+            self.ids.append(_rec_kind_and_ids(rec or {}))
+            self.exact.setdefault(norm, i)
+            for g in _trigrams(norm):
+                self.grams.setdefault(g, set()).add(i)
+
+        # fuzzy tier skips totally unresolved entries (no phone, no group id)
+        self.resolvable: List[int] = [
+            i for i, (_, chat_id, phone, _) in enumerate(self.ids) if chat_id or phone
+        ]
+        self.resolvable_norms: List[str] = [self.norms[i] for i in self.resolvable]
+
+    def is_stale(self, contacts: Dict[str, Dict[str, Any]]) -> bool:
+        return id(contacts) != self.source_id or len(contacts) != self.source_len
+
+    def candidate(self, i: int, score: float) -> dict:
+        kind, chat_id, phone, email = self.ids[i]
+        base = {
+            "display_name": self.names[i],
+            "score": round(score, 3),
+            "type": kind,
+            "chat_id": chat_id,   # for groups: the @g.us JID; for people: @c.us if phone exists
+            "phone": phone,
+            "email": email,
+        }
+        if kind == "group":
+            # convenience alias; some callers prefer 'group_id'
+            base["group_id"] = chat_id
+        return base
+
+    def exact_match(self, norm_query: str) -> Optional[int]:
+        return self.exact.get(norm_query)
+
+    def substring_matches(self, norm_query: str) -> List[int]:
+        """Indices whose normalized name contains norm_query, in contacts order."""
+        grams = _trigrams(norm_query)
+        if not grams:
+            return [i for i, n in enumerate(self.norms) if norm_query in n]
+        postings = sorted((self.grams.get(g, set()) for g in grams), key=len)
+        if not postings[0]:
+            return []
+        pool = set.intersection(*postings)
+        return [i for i in sorted(pool) if norm_query in self.norms[i]]
+
+    def fuzzy_scores(self, norm_query: str) -> List[Tuple[int, float]]:
+        """(index, score 0..1) for resolvable entries with score > 0, in contacts order."""
+        hits = process.extract(
+            norm_query,
+            self.resolvable_norms,
+            scorer=fuzz.token_sort_ratio,  # works fine for Hebrew too
+            processor=None,
+            limit=None,
+        )
+        scored = [(self.resolvable[pos], score / 100.0) for _, score, pos in hits if score > 0]
+        scored.sort(key=lambda t: t[0])
+        return scored
+
+
+_MAX_USERS = 512
+_indexes: "OrderedDict[str, ContactIndex]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_contact_index(user_id: str, contacts: Dict[str, Dict[str, Any]]) -> ContactIndex:
+    with _lock:
+        idx = _indexes.get(user_id)
+        if idx is not None and not idx.is_stale(contacts):
+            _indexes.move_to_end(user_id)
+            return idx
+
+    idx = ContactIndex(contacts)
+    with _lock:
+        _indexes[user_id] = idx
+        _indexes.move_to_end(user_id)
+        while len(_indexes) > _MAX_USERS:
+            _indexes.popitem(last=False)
+    return idx
+
+
+def invalidate_contact_index(user_id: str) -> None:
+    with _lock:
+        _indexes.pop(user_id, None)
@@ -85,8 +85,7 @@ def _get_items(
             user = get_user(user_id)
             if user and getattr(user, "runtime", None):
                 user.runtime.last_tasks_listing = last_tasks_listing
-                UserStore(user_id).save(user)
-                userContextDict[user_id] = user
+                userContextDict.save(user, "runtime.last_tasks_listing")
             
             items = formatted_text
         elif item_type == "scheduled_messages":
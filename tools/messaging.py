@@ -8,6 +8,7 @@ from models.scheduled_message import ScheduledMessageItem
 from shared.time import _parse_iso8601, _to_utc, _user_tz
 from store.user import UserStore
 from shared.user import userContextDict, normalize_recipient_id
+from tools.contact_index import invalidate_contact_index
 from observability.obs import instrument_io
 
 def _process_scheduled_message(
@@ -43,8 +44,8 @@ def _process_scheduled_message(
                 contact["phone"] = action.recipient_chat_id.split("@")[0]
                 user.runtime.contacts[name] = contact
 
-                UserStore(user_id).save(user)
-                userContextDict[user_id] = user
+                userContextDict.save(user, ("runtime", "contacts", name))
+                invalidate_contact_index(user_id)
 
             return _ok({"item_id": item_id})
 
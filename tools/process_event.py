@@ -10,6 +10,8 @@ from shared.google_calendar.util import _iso_to_rfc5545_z, _normalize_byday, _FR
 from models.app_context import AppCtx
 from shared.time import DEFAULT_TZ
 from shared.user import get_user
+from models.user import userContextDict
+from tools.contact_index import invalidate_contact_index
 
 def _to_rfc3339(dt_in: str | datetime, *, default_tz: ZoneInfo = DEFAULT_TZ) -> str:
     """
@@ -379,7 +381,8 @@ def _process_event(user_id: str, event: EventItem) -> dict:
                         if email:
                             contact["email"] = email
                         print("runtime.contacts process event", runtime.contacts[name])
-                    UserStore(user_id).save(user)
+                    userContextDict.save(user)  # writes only the touched contacts
+                    invalidate_contact_index(user_id)
 
         # ----- DELETE ---------------------------------------------------------
         delete_scope = (getattr(event, "delete_scope", "single") or "single").lower()